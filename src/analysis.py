@@ -0,0 +1,48 @@
+# analysis.py
+import numpy as np
+from src.preprocess import preprocess_face
+from src.landmarks import landmark_features
+
+
+class FrameAnalysis:
+    """Kết quả phân tích một khung hình (khuôn mặt, landmark, ảnh mặt cắt), tính một lần và dùng chung"""
+
+    def __init__(self, frame_id, gray, faces, landmarks, track_ids=None):
+        self.frame_id = frame_id
+        self.gray = gray
+        self.faces = faces
+        self.landmarks = landmarks
+        # Mã định danh ổn định của từng khuôn mặt khi bật chế độ bám (None nếu không bám)
+        self.track_ids = track_ids
+        self._emotion_inputs = {}
+        self._features = None
+
+    def __len__(self):
+        return len(self.faces)
+
+    def emotion_input(self, index=0):
+        """Tensor (1, 48, 48, 1) của khuôn mặt thứ index cho mô hình cảm xúc (có lưu đệm)"""
+        if index >= len(self.faces):
+            return None
+        if index not in self._emotion_inputs:
+            self._emotion_inputs[index] = preprocess_face(self.gray, self.faces[index])
+        return self._emotion_inputs[index]
+
+    def features(self):
+        """Vector landmark đã chuẩn hóa (N, 136) của mọi khuôn mặt, tính một lần cho cả lô"""
+        if self._features is None:
+            self._features = landmark_features(self.landmarks)
+        return self._features
+
+    def emotion_batch(self):
+        """Lô ảnh mặt (M, 48, 48, 1) của mọi khuôn mặt cắt được, kèm chỉ số khuôn mặt tương ứng"""
+        indices = []
+        inputs = []
+        for index in range(len(self.faces)):
+            face_input = self.emotion_input(index)
+            if face_input is not None:
+                indices.append(index)
+                inputs.append(face_input[0])
+        if not inputs:
+            return indices, np.empty((0, 48, 48, 1))
+        return indices, np.stack(inputs)
@@ -0,0 +1,121 @@
+# benchmark_detection.py
+import sys
+import glob
+import json
+import time
+import argparse
+import numpy as np
+import cv2
+import dlib
+from src.face_detection import FaceDetector, DETECTOR_BACKENDS
+from src.face_tracking import overlap
+
+
+def load_frames(recording=None, images=None, limit=100):
+    """Nạp ảnh xám từ bản ghi (ReplayCamera) hoặc từ danh sách file ảnh"""
+    frames = []
+    if recording:
+        from src.recording import ReplayCamera
+        camera = ReplayCamera(recording, mode='fast')
+        while len(frames) < limit:
+            ret, color_image, _ = camera.get_frames()
+            if not ret:
+                break
+            frames.append(cv2.cvtColor(color_image, cv2.COLOR_BGR2GRAY))
+        camera.release()
+    else:
+        for path in sorted(glob.glob(images))[:limit]:
+            image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            if image is not None:
+                frames.append(image)
+    return frames
+
+
+def count_matches(reference, detected, threshold=0.5):
+    """Đếm số khuôn mặt tham chiếu được phát hiện lại với IoU >= threshold"""
+    return sum(1 for ref in reference if any(overlap(ref, det) >= threshold for det in detected))
+
+
+def load_labels(path):
+    """Nạp nhãn khuôn mặt: danh sách theo từng khung, mỗi phần tử là [[left, top, right, bottom], ...]"""
+    with open(path, 'r') as f:
+        labels = json.load(f)
+    reference = []
+    for boxes in labels:
+        rects = dlib.rectangles()
+        for left, top, right, bottom in boxes:
+            rects.append(dlib.rectangle(int(left), int(top), int(right), int(bottom)))
+        reference.append(rects)
+    return reference
+
+
+def run_benchmark(frames, backends, scales, upsample=0, repeats=1, reference=None):
+    """Đo thời gian và recall của từng bộ phát hiện theo từng hệ số thu nhỏ.
+
+    Nếu không có nhãn, kết quả của HOG trên ảnh gốc (upsample=1) được dùng làm tham chiếu.
+    """
+    if reference is None:
+        reference_detector = FaceDetector(scale=1.0, upsample=1, backend='hog')
+        reference = [reference_detector.detect(gray) for gray in frames]
+    total_reference = sum(len(r) for r in reference)
+    results = []
+    for backend in backends:
+        try:
+            detector = FaceDetector(upsample=upsample, backend=backend)
+        except Exception as e:
+            print(f"Bỏ qua bộ phát hiện {backend}: {e}")
+            continue
+        for scale in scales:
+            detector.scale = scale
+            timings = []
+            matched = 0
+            found = 0
+            for gray, ref in zip(frames, reference):
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    faces = detector.detect(gray)
+                    timings.append((time.perf_counter() - start) * 1000)
+                found += len(faces)
+                matched += count_matches(ref, faces)
+            timings = np.array(timings)
+            results.append({
+                'backend': backend,
+                'scale': scale,
+                'mean_ms': float(timings.mean()),
+                'p95_ms': float(np.percentile(timings, 95)),
+                'faces': found,
+                'recall': matched / total_reference if total_reference else float('nan'),
+            })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Đo độ trễ và recall phát hiện khuôn mặt theo bộ phát hiện và hệ số thu nhỏ")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--recording', help="Thư mục bản ghi của src.recording")
+    source.add_argument('--images', help="Mẫu đường dẫn ảnh, ví dụ 'data/users/*/*.png'")
+    parser.add_argument('--backends', nargs='+', default=['hog'], choices=list(DETECTOR_BACKENDS))
+    parser.add_argument('--scales', type=float, nargs='+', default=[1.0, 0.75, 0.5, 0.35, 0.25])
+    parser.add_argument('--labels', help="File JSON nhãn khuôn mặt theo từng khung (mặc định lấy HOG ảnh gốc làm tham chiếu)")
+    parser.add_argument('--upsample', type=int, default=0)
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--repeats', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    frames = load_frames(args.recording, args.images, args.frames)
+    if not frames:
+        print("Không có khung hình nào để đo")
+        return 1
+    reference = load_labels(args.labels)[:len(frames)] if args.labels else None
+    height, width = frames[0].shape[:2]
+    print(f"{len(frames)} khung hình {width}x{height}, upsample={args.upsample}")
+    print(f"{'backend':>8} {'scale':>6} {'kích thước':>12} {'ms/khung':>9} {'p95 ms':>8} {'số mặt':>7} {'recall':>7}")
+    for r in run_benchmark(frames, args.backends, args.scales, args.upsample, args.repeats, reference):
+        size = f"{int(width * r['scale'])}x{int(height * r['scale'])}"
+        print(f"{r['backend']:>8} {r['scale']:>6.2f} {size:>12} {r['mean_ms']:>9.1f} {r['p95_ms']:>8.1f} "
+              f"{r['faces']:>7d} {r['recall']:>7.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+# benchmark_identity.py
+import sys
+import time
+import argparse
+import numpy as np
+from sklearn import neighbors
+from sklearn.svm import SVC
+from src.feature_store import FeatureStore
+from src.identity_index import IdentityIndex
+
+
+def split_store(store, test_every=5):
+    """Chia vector của mỗi người dùng: cứ test_every mẫu lấy một mẫu làm dữ liệu kiểm tra"""
+    train, test = {}, {}
+    for label in store.users():
+        features = np.asarray(store.features(label))
+        mask = np.arange(len(features)) % test_every == test_every - 1
+        if mask.all() or not mask.any():
+            continue
+        train[label] = features[~mask]
+        test[label] = features[mask]
+    return train, test
+
+
+def stack(groups, exclude=None):
+    X = [features for label, features in groups.items() if label != exclude]
+    y = [label for label, features in groups.items() if label != exclude for _ in range(len(features))]
+    return np.concatenate(X), np.array(y)
+
+
+class PairClassifier:
+    """Cách nhận diện cũ: KNN (k=3) và SVM tuyến tính phải cho cùng kết quả"""
+
+    def __init__(self, X, y):
+        self.knn = neighbors.KNeighborsClassifier(n_neighbors=min(3, len(X))).fit(X, y)
+        self.svm = SVC(kernel='linear', probability=True).fit(X, y)
+
+    def query(self, X):
+        knn = self.knn.predict(X)
+        svm = self.svm.predict(X)
+        return [k if k == s else None for k, s in zip(knn, svm)]
+
+
+def time_queries(method, X, repeats=3):
+    """Độ trễ (ms) của một truy vấn đơn lẻ và của cả lô"""
+    single = []
+    for _ in range(repeats):
+        for row in X[:200]:
+            start = time.perf_counter()
+            method(row[None])
+            single.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        method(X)
+    batch = (time.perf_counter() - start) * 1000 / repeats
+    return float(np.mean(single)), batch
+
+
+def evaluate(train, test, unknown_users=5):
+    X_train, y_train = stack(train)
+    X_test, y_test = stack(test)
+    pair = PairClassifier(X_train, y_train)
+    index = IdentityIndex.from_features(X_train, y_train)
+    methods = {
+        'knn+svm': pair.query,
+        'index': lambda X: index.query(X)[0],
+    }
+    results = {}
+    for name, method in methods.items():
+        predictions = method(X_test)
+        correct = sum(p == t for p, t in zip(predictions, y_test))
+        rejected = sum(p is None for p in predictions)
+        single_ms, batch_ms = time_queries(method, X_test)
+        results[name] = {
+            'accuracy': correct / len(y_test),
+            'rejected_known': rejected / len(y_test),
+            'single_ms': single_ms,
+            'batch_ms': batch_ms,
+        }
+
+    # Tập mở: bỏ lần lượt từng người dùng khỏi dữ liệu huấn luyện rồi xem mẫu của họ có bị từ chối không
+    strangers = {'knn+svm': [0, 0], 'index': [0, 0]}
+    for label in list(train)[:unknown_users]:
+        if len(train) < 3:
+            break
+        X_known, y_known = stack(train, exclude=label)
+        open_methods = {
+            'knn+svm': PairClassifier(X_known, y_known).query,
+            'index': lambda X, i=IdentityIndex.from_features(X_known, y_known): i.query(X)[0],
+        }
+        for name, method in open_methods.items():
+            predictions = method(test[label])
+            strangers[name][0] += sum(p is None for p in predictions)
+            strangers[name][1] += len(predictions)
+    for name, (rejected, total) in strangers.items():
+        results[name]['rejected_unknown'] = rejected / total if total else float('nan')
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="So sánh chỉ mục nhận diện với cặp KNN + SVM (độ trễ, độ chính xác, từ chối người lạ)")
+    parser.add_argument('--model-dir', default='models')
+    parser.add_argument('--test-every', type=int, default=5)
+    parser.add_argument('--unknown-users', type=int, default=5, help="Số người dùng lần lượt được coi là người lạ")
+    args = parser.parse_args(argv)
+
+    store = FeatureStore(args.model_dir)
+    train, test = split_store(store, args.test_every)
+    if len(train) < 2:
+        print("Cần ít nhất 2 người dùng trong kho đặc trưng để đo")
+        return 1
+    print(f"{len(train)} người dùng, {sum(len(f) for f in train.values())} mẫu huấn luyện, "
+          f"{sum(len(f) for f in test.values())} mẫu kiểm tra")
+    print(f"{'cách':>8} {'chính xác':>10} {'từ chối quen':>13} {'từ chối lạ':>11} {'ms/truy vấn':>12} {'ms/lô':>8}")
+    for name, r in evaluate(train, test, args.unknown_users).items():
+        print(f"{name:>8} {r['accuracy']:>10.3f} {r['rejected_known']:>13.3f} {r['rejected_unknown']:>11.3f} "
+              f"{r['single_ms']:>12.3f} {r['batch_ms']:>8.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,57 +1,130 @@
-import pyrealsense2 as rs
+import os
 import numpy as np
 import cv2
 
 # camera.py
-import pyrealsense2 as rs
+try:
+    import pyrealsense2 as rs
+except ImportError:
+    # Cho phép chạy với ReplayCamera trên máy không có RealSense SDK
+    rs = None
+
+# Biến môi trường chỉ tới thư mục bản ghi để phát lại thay cho camera thật
+REPLAY_ENV = 'CAMERA_REPLAY'
+REPLAY_MODE_ENV = 'CAMERA_REPLAY_MODE'
+
+# Chế độ hiệu chỉnh màu: áp dụng cho cả phân tích, chỉ khi hiển thị, hoặc tắt
+COLOR_CORRECTION_ENV = 'COLOR_CORRECTION'
+COLOR_CORRECTION_MODES = ('analysis', 'display', 'off')
+
+
+class ColorCorrection:
+    """Tăng độ sáng/độ tương phản bằng bảng tra 256 phần tử, ghi thẳng vào bộ đệm có sẵn"""
+
+    def __init__(self, alpha=1.2, beta=30, mode=None):
+        if mode is None:
+            mode = os.environ.get(COLOR_CORRECTION_ENV, 'analysis')
+        if mode not in COLOR_CORRECTION_MODES:
+            raise ValueError(f"Chế độ hiệu chỉnh màu không hợp lệ: {mode}")
+        self.mode = mode
+        # Cho kết quả giống hệt cv2.convertScaleAbs(image, alpha, beta)
+        values = np.abs(np.arange(256, dtype=np.float64) * alpha + beta)
+        self.lut = np.clip(np.rint(values), 0, 255).astype(np.uint8)
+
+    def process(self, src, dst):
+        """Chép khung hình từ camera vào dst, hiệu chỉnh luôn nếu ở chế độ phân tích"""
+        if self.mode == 'analysis':
+            cv2.LUT(src, self.lut, dst=dst)
+        else:
+            np.copyto(dst, src)
+        return dst
+
+    def for_display(self, image):
+        """Hiệu chỉnh tại chỗ ảnh sắp hiển thị khi ở chế độ chỉ hiển thị"""
+        if self.mode == 'display':
+            cv2.LUT(image, self.lut, dst=image)
+        return image
+
 
 class RealSenseCamera:
-    def __init__(self):
+    WIDTH = 640
+    HEIGHT = 480
+    FPS = 30
+    # Số bộ đệm ảnh màu dùng xoay vòng; phải lớn hơn số khung FrameHub giữ lại
+    BUFFER_COUNT = 5
+    # Căn chỉnh ảnh độ sâu theo ảnh màu: hai cảm biến có góc nhìn khác nhau và lệch nhau một khoảng,
+    # nên chỉ sau khi căn chỉnh thì cùng một tọa độ mới là cùng một điểm trên hai ảnh
+    ALIGN_DEPTH = True
+
+    def __init__(self, color_correction=None, serial=None, width=None, height=None, fps=None):
+        # Mỗi camera có thể chọn thiết bị theo số serial và cấu hình luồng riêng
+        self.serial = serial
+        self.width = width or self.WIDTH
+        self.height = height or self.HEIGHT
+        self.fps = fps or self.FPS
+        self.color_correction = color_correction or ColorCorrection()
+        self.buffers = [np.empty((self.height, self.width, 3), dtype=np.uint8)
+                        for _ in range(self.BUFFER_COUNT)]
+        self.buffer_index = 0
+
         self.pipeline = rs.pipeline()
         self.config = rs.config()
-        self.config.enable_stream(rs.stream.color, 640, 480, rs.format.bgr8, 30)
-        self.config.enable_stream(rs.stream.depth, 640, 480, rs.format.z16, 30)
-        self.pipeline.start(self.config)
+        if serial:
+            self.config.enable_device(serial)
+        self.config.enable_stream(rs.stream.color, self.width, self.height, rs.format.bgr8, self.fps)
+        self.config.enable_stream(rs.stream.depth, self.width, self.height, rs.format.z16, self.fps)
+        profile = self.pipeline.start(self.config)
+        self.depth_scale = profile.get_device().first_depth_sensor().get_depth_scale()
+        # Tiêu cự ngang của camera màu (pixel), dùng để ước lượng kích thước khuôn mặt theo khoảng cách
+        intrinsics = profile.get_stream(rs.stream.color).as_video_stream_profile().get_intrinsics()
+        self.focal_px = intrinsics.fx
+        self.align = rs.align(rs.stream.color) if self.ALIGN_DEPTH else None
 
     def get_frames(self):
         frames = self.pipeline.wait_for_frames()
+        if self.align is not None:
+            frames = self.align.process(frames)
         color_frame = frames.get_color_frame()
         depth_frame = frames.get_depth_frame()
         if not color_frame or not depth_frame:
             return False, None, None
-        color_image = np.asanyarray(color_frame.get_data())
         depth_image = np.asanyarray(depth_frame.get_data())
 
-        # Tăng độ sáng và độ tương phản cho color_image (nếu cần)
-        color_image = cv2.convertScaleAbs(color_image, alpha=1.2, beta=30)  # Điều chỉnh độ tương phản và sáng
+        # Ghi dữ liệu rs.frame vào bộ đệm kế tiếp (không cấp phát ảnh mới mỗi khung)
+        color_image = self.buffers[self.buffer_index]
+        self.buffer_index = (self.buffer_index + 1) % len(self.buffers)
+        self.color_correction.process(np.asanyarray(color_frame.get_data()), color_image)
 
         return True, color_image, depth_image
-    
 
     def release(self):
         self.pipeline.stop()
 
-class RealSenseCameraNew:
-    def __init__(self):
-        self.pipeline = rs.pipeline()
-        self.config = rs.config()
-        self.config.enable_stream(rs.stream.color, 1280, 720, rs.format.bgr8, 30)
-        self.config.enable_stream(rs.stream.depth, 1280, 720, rs.format.z16, 30)
-        self.pipeline.start(self.config)
+class RealSenseCameraNew(RealSenseCamera):
+    WIDTH = 1280
+    HEIGHT = 720
 
-    def get_frames(self):
-        frames = self.pipeline.wait_for_frames()
-        color_frame = frames.get_color_frame()
-        depth_frame = frames.get_depth_frame()
-        if not color_frame or not depth_frame:
-            return False, None, None
-        color_image = np.asanyarray(color_frame.get_data())
-        depth_image = np.asanyarray(depth_frame.get_data())
 
-        # Tăng độ sáng và độ tương phản cho color_image (nếu cần)
-        color_image = cv2.convertScaleAbs(color_image, alpha=1.2, beta=30)  # Điều chỉnh độ tương phản và sáng
+def list_devices():
+    """Liệt kê các camera RealSense đang kết nối: [{'serial', 'name'}]"""
+    if rs is None:
+        return []
+    devices = []
+    for device in rs.context().query_devices():
+        devices.append({
+            'serial': device.get_info(rs.camera_info.serial_number),
+            'name': device.get_info(rs.camera_info.name),
+        })
+    return devices
 
-        return True, color_image, depth_image
 
-    def release(self):
-        self.pipeline.stop()
+def create_camera(camera_class=RealSenseCamera, **kwargs):
+    """Tạo camera; phát lại bản ghi nếu biến môi trường CAMERA_REPLAY được đặt"""
+    replay_path = os.environ.get(REPLAY_ENV)
+    if replay_path:
+        from src.recording import ReplayCamera
+        mode = os.environ.get(REPLAY_MODE_ENV, 'realtime')
+        return ReplayCamera(replay_path, mode=mode, loop=True)
+    if rs is None:
+        raise RuntimeError("Chưa cài đặt pyrealsense2")
+    return camera_class(**kwargs)
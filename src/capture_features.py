@@ -0,0 +1,133 @@
+# capture_features.py
+import os
+import queue
+import threading
+import numpy as np
+import cv2
+
+# Lưu gì ra đĩa khi thu thập: không lưu, ảnh xám cả khung, hoặc chỉ vùng khuôn mặt
+SAVE_MODES = (None, 'frames', 'crops')
+
+
+class CaptureQualityGate:
+    """Chỉ giữ khung hình có ích cho huấn luyện: có khuôn mặt, đủ nét và khác các khung đã nhận.
+
+    Độ nét là phương sai Laplacian của vùng khuôn mặt; độ khác biệt là khoảng cách trung bình của
+    68 điểm landmark đã chuẩn hóa tới khung gần nhất đã nhận (tính một lần cho mọi khung đã nhận).
+    """
+
+    def __init__(self, min_sharpness=60.0, min_distance=0.01):
+        self.min_sharpness = min_sharpness
+        self.min_distance = min_distance
+        self.accepted = np.empty((0, 68, 2), dtype=np.float32)
+        self.rejected = {'no_face': 0, 'blurry': 0, 'duplicate': 0}
+
+    @staticmethod
+    def sharpness(gray, face):
+        top, left = max(face.top(), 0), max(face.left(), 0)
+        crop = gray[top:face.bottom(), left:face.right()]
+        if crop.size == 0:
+            return 0.0
+        return float(cv2.Laplacian(crop, cv2.CV_32F).var())
+
+    def distance(self, features):
+        """Khoảng cách trong không gian landmark tới khung gần nhất đã nhận"""
+        if len(self.accepted) == 0:
+            return float('inf')
+        delta = self.accepted - np.asarray(features, dtype=np.float32).reshape(1, 68, 2)
+        return float(np.linalg.norm(delta, axis=2).mean(axis=1).min())
+
+    def check(self, analysis):
+        """Trả về vector đặc trưng nếu khung đạt yêu cầu, ngược lại None (và ghi nhận lý do loại)"""
+        if len(analysis) == 0:
+            self.rejected['no_face'] += 1
+            return None
+        if self.sharpness(analysis.gray, analysis.faces[0]) < self.min_sharpness:
+            self.rejected['blurry'] += 1
+            return None
+        features = analysis.features()[0]
+        if self.distance(features) < self.min_distance:
+            self.rejected['duplicate'] += 1
+            return None
+        self.accepted = np.concatenate([self.accepted, features.reshape(1, 68, 2).astype(np.float32)])
+        return features
+
+    @property
+    def accepted_count(self):
+        return len(self.accepted)
+
+    @property
+    def rejected_count(self):
+        return sum(self.rejected.values())
+
+
+class FeatureExtractionStage:
+    """Trích vector landmark đã chuẩn hóa từ khung hình ngay trong lúc thu thập, trên một luồng riêng.
+
+    Vòng thu thập chỉ đưa khung hình vào hàng đợi; nếu luồng trích chưa theo kịp thì khung bị bỏ qua.
+    Khung hình chỉ được giữ khi qua được gate (CaptureQualityGate).
+    """
+
+    def __init__(self, processor, save_dir=None, save_mode=None, queue_size=4, gate=None):
+        if save_mode not in SAVE_MODES:
+            raise ValueError(f"Chế độ lưu không hợp lệ: {save_mode}")
+        self.processor = processor
+        self.gate = gate if gate is not None else CaptureQualityGate()
+        self.save_dir = save_dir
+        self.save_mode = save_mode if save_dir else None
+        self.features = []
+        self.received = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        if self.save_mode:
+            os.makedirs(save_dir, exist_ok=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def push(self, color, depth=None):
+        """Đưa một khung hình vào hàng đợi trích đặc trưng; trả về False nếu khung bị bỏ qua"""
+        self.received += 1
+        try:
+            self._queue.put_nowait((color, depth))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            color, depth = item
+            try:
+                self._process(color, depth)
+            except Exception as e:
+                print(f"Lỗi khi trích đặc trưng: {e}")
+
+    def _process(self, color, depth):
+        analysis = self.processor.analyze(color, depth)
+        features = self.gate.check(analysis)
+        if features is None:
+            return
+        index = len(self.features)
+        self.features.append(features.astype(np.float32))
+        if self.save_mode == 'frames':
+            cv2.imwrite(os.path.join(self.save_dir, f'frame_{index}.png'), analysis.gray)
+        elif self.save_mode == 'crops':
+            face = analysis.faces[0]
+            top, left = max(face.top(), 0), max(face.left(), 0)
+            crop = analysis.gray[top:face.bottom(), left:face.right()]
+            if crop.size:
+                cv2.imwrite(os.path.join(self.save_dir, f'face_{index}.png'), crop)
+
+    def finish(self, timeout=None):
+        """Chờ trích xong các khung còn trong hàng đợi; trả về mảng (N, 136)"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+        if not self.features:
+            return np.empty((0, 136), dtype=np.float32)
+        return np.stack(self.features)
@@ -3,10 +3,11 @@ import time
 import tkinter as tk
 from tkinter import Label, Entry, Button, Frame
 from PIL import Image, ImageTk
-import cv2
 from threading import Thread
 from src.camera import RealSenseCameraNew
-from src.processor import EmotionRecognitionProcessor
+from src.renderer import FrameRenderer
+from src.router import ScreenRouter
+from src.capture_features import FeatureExtractionStage, CaptureQualityGate
 
 class UserDataCollectionApp:
     # Định nghĩa các hằng số màu và thiết kế
@@ -29,14 +30,35 @@ class UserDataCollectionApp:
     
     # Thời gian thu thập dữ liệu (giây)
     CAPTURE_DURATION = 5
+    # Lưu thêm ảnh khi thu thập: None (chỉ lưu vector đặc trưng), 'frames' hoặc 'crops'
+    SAVE_CAPTURE = None
+    # Ngưỡng chất lượng khung hình thu thập: độ nét (phương sai Laplacian vùng mặt)
+    # và khoảng cách landmark tối thiểu tới các khung đã nhận (loại khung gần như trùng lặp)
+    MIN_SHARPNESS = 60.0
+    MIN_LANDMARK_DISTANCE = 0.01
+    # Số khung đạt yêu cầu tối thiểu để đăng ký (đủ để hiệu chỉnh ngưỡng nhận diện của người dùng)
+    MIN_ENROLL_SAMPLES = 10
+
+    # Chiều rộng tối đa của ảnh dùng để phát hiện khuôn mặt (camera 1280x720)
+    DETECTION_MAX_WIDTH = 640
+    # Dải khoảng cách (mét) để tìm khuôn mặt theo ảnh độ sâu; None để tìm trên toàn khung hình
+    DEPTH_RANGE_M = None
+    # Số khung hình hiển thị mỗi giây, độc lập với nhịp xử lý
+    RENDER_FPS = 15
     
-    def __init__(self, root):
+    def __init__(self, root, context=None):
         """Khởi tạo ứng dụng thu thập dữ liệu người dùng"""
         self.root = root
+        # Bộ điều hướng giữ camera và bộ xử lý dùng chung giữa các màn hình
+        self.context = context if context is not None else ScreenRouter(root)
+        self.context.screen = self
         self.root.title("Thu Thập Dữ Liệu")
         
         # Khởi tạo biến thành viên
+        self.active = True
         self.camera = None
+        self.preview_source = None
+        self.capture_source = None
         self.processor = None
         self.capturing = False
         
@@ -135,6 +157,8 @@ class UserDataCollectionApp:
         
         self.video_frame = Label(self.video_container, bg="black")
         self.video_frame.pack(fill=tk.BOTH, expand=True, padx=1, pady=1)
+        # Kích thước mặc định 16:9 khi Label chưa được bố trí
+        self.renderer = FrameRenderer(self.video_frame, fps=self.RENDER_FPS, default_size=(800, 450))
     
     def _create_user_info_frame(self):
         """Tạo khung nhập thông tin người dùng"""
@@ -292,8 +316,13 @@ class UserDataCollectionApp:
     def _initialize_camera_system(self):
         """Khởi tạo camera và bộ xử lý video"""
         try:
-            self.camera = RealSenseCameraNew()
-            self.processor = EmotionRecognitionProcessor()
+            self.camera = self.context.camera(RealSenseCameraNew)
+            self.preview_source = self.camera.subscribe("preview")
+            self.capture_source = self.camera.subscribe("capture")
+            self.renderer.color_correction = self.camera.color_correction
+            self.processor = self.context.processor(
+                detection_max_width=self.DETECTION_MAX_WIDTH, depth_range=self.DEPTH_RANGE_M,
+                **self.camera.depth_settings())
         except Exception as e:
             print(f"Lỗi khởi tạo camera: {e}")
             self.show_message(f"Không thể khởi tạo camera: {str(e)}", self.ERROR_COLOR)
@@ -304,39 +333,25 @@ class UserDataCollectionApp:
         """Cập nhật hiển thị video từ camera"""
         if not self.capturing and self.camera and self.processor:
             try:
-                ret, color_image, depth_image = self.camera.get_frames()
+                ret, color_image, depth_image = self.preview_source.get_frames()
                 if ret:
                     # Xử lý và hiển thị khung hình
-                    self._process_and_display_frame(color_image)
+                    self._process_and_display_frame(color_image, depth_image)
             except Exception as e:
                 print(f"Lỗi khi cập nhật video: {e}")
                 
         # Lên lịch cập nhật tiếp theo
         self.root.after(50, self.update_video)
         
-    def _process_and_display_frame(self, color_image):
+    def _process_and_display_frame(self, color_image, depth_image=None):
         """Xử lý và hiển thị khung hình từ camera"""
+        # Khung hình xem trước chỉ dùng để hiển thị nên bỏ qua khi chưa đến lượt vẽ
+        if not self.renderer.due():
+            return
         try:
             # Xử lý khung hình
-            frame_with_landmarks, _, _ = self.processor.process_frame(color_image)
-            cv2image = cv2.cvtColor(frame_with_landmarks, cv2.COLOR_BGR2RGBA)
-            img = Image.fromarray(cv2image)
-            
-            # Lấy kích thước hiện tại của frame
-            video_width = self.video_frame.winfo_width()
-            video_height = self.video_frame.winfo_height()
-            
-            # Resize ảnh theo tỉ lệ 16:9
-            if video_width > 10 and video_height > 10:
-                img = img.resize((video_width, video_height), Image.LANCZOS)
-            else:
-                # Kích thước mặc định 16:9
-                img = img.resize((800, 450), Image.LANCZOS)
-                
-            # Hiển thị ảnh
-            imgtk = ImageTk.PhotoImage(image=img)
-            self.video_frame.imgtk = imgtk
-            self.video_frame.configure(image=imgtk)
+            frame_with_landmarks, _, _ = self.processor.process_frame(color_image, depth_image)
+            self.renderer.render(frame_with_landmarks, force=True)
         except Exception as e:
             print(f"Lỗi khi xử lý khung hình: {e}")
 
@@ -353,21 +368,19 @@ class UserDataCollectionApp:
         self.capturing = True
         self.capture_button.config(state="disabled")
         
-        # Tạo thư mục lưu dữ liệu
+        # Thư mục lưu ảnh (chỉ được tạo khi SAVE_CAPTURE bật); tên thư mục là nhãn người dùng
         user_folder = f'{name}_{age}'
         user_data_dir = os.path.join('data', 'users', user_folder)
         
         try:
-            os.makedirs(user_data_dir, exist_ok=True)
-            
             # Hiển thị thông báo và bắt đầu thu thập
             self.show_message("Đang thu thập dữ liệu khuôn mặt...", self.LABEL_BG)
             capture_thread = Thread(target=self._capture_video_thread, args=(user_data_dir,))
             capture_thread.daemon = True  # Đảm bảo thread kết thúc khi chương trình tắt
             capture_thread.start()
         except Exception as e:
-            print(f"Lỗi khi tạo thư mục lưu dữ liệu: {e}")
-            self.show_message(f"Không thể tạo thư mục lưu dữ liệu: {str(e)}", self.ERROR_COLOR)
+            print(f"Lỗi khi bắt đầu thu thập dữ liệu: {e}")
+            self.show_message(f"Không thể bắt đầu thu thập dữ liệu: {str(e)}", self.ERROR_COLOR)
             self.reset_capture()
             
     def _validate_user_input(self, name, age):
@@ -390,58 +403,70 @@ class UserDataCollectionApp:
         try:
             start_time = time.time()
             frame_count = 0
+            # Landmark được trích ngay trong lúc thu thập trên một luồng riêng, không ghi/đọc lại PNG
+            gate = CaptureQualityGate(self.MIN_SHARPNESS, self.MIN_LANDMARK_DISTANCE)
+            stage = FeatureExtractionStage(self.processor, user_data_dir, self.SAVE_CAPTURE, gate=gate).start()
             # Thu thập dữ liệu trong khoảng thời gian xác định
-            while time.time() - start_time < self.CAPTURE_DURATION:
-                ret, color_image, depth_image = self.camera.get_frames()
+            while self.active and time.time() - start_time < self.CAPTURE_DURATION:
+                ret, color_image, depth_image = self.capture_source.get_frames(timeout=1.0)
                 if ret:
-                    # Lưu khung hình xám để huấn luyện
-                    gray_frame = cv2.cvtColor(color_image, cv2.COLOR_BGR2GRAY)
-                    frame_path = os.path.join(user_data_dir, f'frame_{frame_count}.png')
-                    cv2.imwrite(frame_path, gray_frame)
+                    stage.push(color_image, depth_image)
                     frame_count += 1
                     
-                    # Cập nhật thông báo tiến trình
+                    # Cập nhật thông báo tiến trình kèm số khung được nhận/bị loại
                     progress = int(((time.time() - start_time) / self.CAPTURE_DURATION) * 100)
                     self.root.after(0, lambda p=progress: self.show_message(
-                        f"Đang thu thập dữ liệu: {p}%", self.LABEL_BG))
-                    
-                    # Ngừng chốc lát để tránh quá nhiều khung hình
-                    time.sleep(0.1)
+                        f"Đang thu thập dữ liệu: {p}% - {self._quality_summary(gate)}", self.LABEL_BG))
             
+            features = stage.finish()
             # Hiển thị số lượng khung hình đã thu thập
-            self.root.after(0, lambda c=frame_count: self.show_message(
-                f"Đã thu thập {c} khung hình. Đang xử lý...", self.LABEL_BG))
-                
-            # Giải phóng camera sau khi thu thập xong
-            if self.camera:
-                self.camera.release()
+            self.root.after(0, lambda: self.show_message(
+                f"{self._quality_summary(gate)}. Đang xử lý...", self.LABEL_BG))
                 
             # Chuyển sang bước huấn luyện
-            self.root.after(0, lambda: self._train_and_return())
+            self.root.after(0, lambda: self._train_and_return(os.path.basename(user_data_dir), features))
         except Exception as e:
             print(f"Lỗi trong quá trình thu thập dữ liệu: {e}")
             self.root.after(0, lambda: self.show_message(
                 f"Lỗi thu thập dữ liệu: {str(e)}", self.ERROR_COLOR))
             self.root.after(3000, self.reset_capture)
 
-    def _train_and_return(self):
+    @staticmethod
+    def _quality_summary(gate):
+        """Số khung được nhận/bị loại theo từng lý do"""
+        rejected = gate.rejected
+        return (f"nhận {gate.accepted_count}, loại {gate.rejected_count} "
+                f"(mờ {rejected['blurry']}, trùng {rejected['duplicate']}, không có mặt {rejected['no_face']})")
+
+    def _train_and_return(self, label, features):
         """Huấn luyện mô hình và quay lại trang đăng nhập"""
-        training_thread = Thread(target=self._train_model_thread)
+        training_thread = Thread(target=self._train_model_thread, args=(label, features))
         training_thread.daemon = True
         training_thread.start()
 
-    def _train_model_thread(self):
+    def _train_model_thread(self, label, features):
         """Thread xử lý việc huấn luyện mô hình"""
         try:
             # Import trong hàm để tránh lỗi circular import
             from src.face_recognition import FaceRecognition
+            from src.feature_store import FeatureStore
+
+            if len(features) == 0:
+                raise ValueError("Không tìm thấy khuôn mặt trong các khung hình đã thu thập")
+            if len(features) < self.MIN_ENROLL_SAMPLES:
+                raise ValueError(f"Chỉ có {len(features)} khung hình đạt yêu cầu "
+                                 f"(cần ít nhất {self.MIN_ENROLL_SAMPLES}), hãy thử lại")
             
             # Hiển thị thông báo đang huấn luyện
             self.root.after(0, lambda: self.show_message(
                 "Đang huấn luyện mô hình nhận diện khuôn mặt...", self.LABEL_BG))
                 
-            # Huấn luyện mô hình
-            FaceRecognition.train_face_recognition_model('data/users', 'models')
+            # Huấn luyện mô hình: thay đặc trưng của người vừa thu thập rồi huấn luyện lại từ kho
+            store = FeatureStore('models')
+            # Cài đặt cũ: đưa người dùng đã huấn luyện trước đây vào kho để họ không bị mất khỏi mô hình
+            FaceRecognition.import_legacy_users(store, 'models', os.path.join('data', 'users'))
+            store.replace(label, features)
+            FaceRecognition.fit_models(store, 'models')
             
             # Hiển thị thông báo thành công
             self.root.after(0, lambda: self.show_message(
@@ -457,10 +482,15 @@ class UserDataCollectionApp:
 
     def show_message(self, message, color):
         """Hiển thị thông báo với màu sắc"""
+        # Luồng thu thập/huấn luyện có thể báo về sau khi màn hình đã bị đóng
+        if not self.active:
+            return
         self.message_label.config(text=message, fg=color)
 
     def reset_capture(self):
         """Reset lại giao diện để người dùng có thể thu thập lại dữ liệu"""
+        if not self.active:
+            return
         self.capturing = False
         self.capture_button.config(state="normal")
         self.show_message("Vui lòng nhập thông tin và nhấn 'Bắt Đầu Thu Thập'", self.TEXT_COLOR)
@@ -471,29 +501,22 @@ class UserDataCollectionApp:
 
     def _navigate_to_login(self):
         """Chuyển về trang đăng nhập"""
+        if not self.active:
+            return
         try:
-            self.root.destroy()
-            # Import trong hàm để tránh lỗi circular import
-            from src.login import FaceRecognitionLoginApp
-            login_app = tk.Tk()
-            FaceRecognitionLoginApp(login_app)
-            login_app.mainloop()
+            self.context.show('login')
         except Exception as e:
             print(f"Lỗi khi chuyển về trang đăng nhập: {e}")
 
+    def stop(self):
+        """Dừng màn hình trước khi chuyển đi; luồng thu thập dừng ở khung kế tiếp"""
+        self.active = False
+
     def exit_full_screen(self, event=None):
         """Thoát khỏi ứng dụng"""
-        # Giải phóng tài nguyên
-        if hasattr(self, 'camera') and self.camera:
-            try:
-                self.camera.release()
-            except Exception as e:
-                print(f"Lỗi khi giải phóng camera: {e}")
-                
-        # Thoát ứng dụng
-        self.root.quit()
+        self.context.quit()
 
 if __name__ == "__main__":
     root = tk.Tk()
-    app = UserDataCollectionApp(root)
+    ScreenRouter(root).show('data_collection')
     root.mainloop()
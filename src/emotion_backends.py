@@ -0,0 +1,137 @@
+# emotion_backends.py
+import json
+import numpy as np
+
+# Các lớp Keras mà bộ chạy NumPy hỗ trợ; lớp khác sẽ bị từ chối khi xuất
+SUPPORTED_LAYERS = ('InputLayer', 'Conv2D', 'MaxPooling2D', 'Flatten', 'Dense', 'Dropout', 'BatchNormalization')
+
+
+def _activate(x, name):
+    if name in (None, 'linear'):
+        return x
+    if name == 'relu':
+        return np.maximum(x, 0, out=x)
+    if name == 'softmax':
+        x = x - x.max(axis=-1, keepdims=True)
+        np.exp(x, out=x)
+        return x / x.sum(axis=-1, keepdims=True)
+    if name == 'sigmoid':
+        return 1.0 / (1.0 + np.exp(-x))
+    if name == 'tanh':
+        return np.tanh(x)
+    raise ValueError(f"Hàm kích hoạt không hỗ trợ: {name}")
+
+
+def _conv2d(x, kernel, bias, strides, padding):
+    """Tích chập 2D dạng channels_last bằng sliding_window_view + tensordot"""
+    kh, kw = kernel.shape[:2]
+    if padding == 'same':
+        if strides != (1, 1):
+            raise ValueError("Chỉ hỗ trợ padding='same' với strides=(1, 1)")
+        x = np.pad(x, ((0, 0), ((kh - 1) // 2, kh // 2), ((kw - 1) // 2, kw // 2), (0, 0)))
+    windows = np.lib.stride_tricks.sliding_window_view(x, (kh, kw), axis=(1, 2))
+    windows = windows[:, ::strides[0], ::strides[1]]
+    # windows: (N, H', W', C, kh, kw); kernel: (kh, kw, C, F)
+    out = np.tensordot(windows, kernel.transpose(2, 0, 1, 3), axes=([3, 4, 5], [0, 1, 2]))
+    if bias is not None:
+        out += bias
+    return out
+
+
+def _max_pool(x, pool_size, strides):
+    """Max pooling 2D (padding='valid')"""
+    ph, pw = pool_size
+    if tuple(strides) == (ph, pw):
+        n, h, w, c = x.shape
+        h, w = h // ph * ph, w // pw * pw
+        return x[:, :h, :w].reshape(n, h // ph, ph, w // pw, pw, c).max(axis=(2, 4))
+    windows = np.lib.stride_tricks.sliding_window_view(x, (ph, pw), axis=(1, 2))
+    return windows[:, ::strides[0], ::strides[1]].max(axis=(4, 5))
+
+
+class NumpyEmotionModel:
+    """Chạy mô hình cảm xúc đã xuất sang file .npz chỉ bằng NumPy (không cần TensorFlow)"""
+
+    def __init__(self, path='models/emotion_model_weights.npz'):
+        with np.load(path) as data:
+            self.layers = json.loads(str(data['spec']))
+            self.weights = {key: data[key].astype(np.float32) for key in data.files if key != 'spec'}
+
+    def predict_on_batch(self, batch):
+        x = np.asarray(batch, dtype=np.float32)
+        for index, layer in enumerate(self.layers):
+            kind = layer['type']
+            config = layer['config']
+            if kind == 'Conv2D':
+                x = _conv2d(x, self.weights[f'{index}_kernel'], self.weights.get(f'{index}_bias'),
+                            tuple(config['strides']), config['padding'])
+                x = _activate(x, config['activation'])
+            elif kind == 'MaxPooling2D':
+                if config.get('padding', 'valid') != 'valid':
+                    raise ValueError("Chỉ hỗ trợ MaxPooling2D với padding='valid'")
+                x = _max_pool(x, tuple(config['pool_size']), tuple(config['strides'] or config['pool_size']))
+            elif kind == 'Flatten':
+                x = x.reshape(len(x), -1)
+            elif kind == 'Dense':
+                x = x @ self.weights[f'{index}_kernel']
+                if f'{index}_bias' in self.weights:
+                    x += self.weights[f'{index}_bias']
+                x = _activate(x, config['activation'])
+            elif kind == 'BatchNormalization':
+                scale = self.weights[f'{index}_gamma'] / np.sqrt(self.weights[f'{index}_moving_variance'] + config['epsilon'])
+                x = (x - self.weights[f'{index}_moving_mean']) * scale + self.weights[f'{index}_beta']
+        return x
+
+    def predict(self, batch, **kwargs):
+        return self.predict_on_batch(batch)
+
+
+def _load_interpreter(path):
+    """Ưu tiên tflite_runtime (nhẹ), nếu không có thì dùng tf.lite"""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        # tf.lite chỉ truy cập được qua thuộc tính, không import trực tiếp bằng from tensorflow.lite
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter(model_path=path)
+
+
+class TFLiteEmotionModel:
+    """Chạy mô hình cảm xúc dạng TFLite (float hoặc đã lượng tử hóa int8)"""
+
+    def __init__(self, path='models/emotion_model.tflite'):
+        self.interpreter = _load_interpreter(path)
+        self.input_index = self.interpreter.get_input_details()[0]['index']
+        self.output_index = self.interpreter.get_output_details()[0]['index']
+        self.batch_size = None
+
+    def _resize(self, batch_size):
+        """Đổi kích thước lô của mô hình khi cần (chỉ cấp phát lại khi kích thước thay đổi)"""
+        if batch_size == self.batch_size:
+            return
+        self.interpreter.resize_tensor_input(self.input_index, [batch_size, 48, 48, 1])
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()[0]
+        self.output_details = self.interpreter.get_output_details()[0]
+        self.batch_size = batch_size
+
+    def predict_on_batch(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        self._resize(len(batch))
+        input_type = self.input_details['dtype']
+        if input_type in (np.int8, np.uint8):
+            # Mô hình int8: lượng tử hóa đầu vào theo tham số của mô hình
+            scale, zero_point = self.input_details['quantization']
+            info = np.iinfo(input_type)
+            batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(input_type)
+        self.interpreter.set_tensor(self.input_index, batch)
+        self.interpreter.invoke()
+        output = self.interpreter.get_tensor(self.output_index)
+        if self.output_details['dtype'] in (np.int8, np.uint8):
+            scale, zero_point = self.output_details['quantization']
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output
+
+    def predict(self, batch, **kwargs):
+        return self.predict_on_batch(batch)
@@ -0,0 +1,84 @@
+# emotion_inference.py
+import time
+import queue
+import threading
+from concurrent.futures import Future
+import numpy as np
+
+
+def predict_batch(model, batch):
+    """Chạy mô hình một lần cho cả lô (N, 48, 48, 1), trả về xác suất (N, 7)"""
+    if len(batch) == 0:
+        return np.empty((0, 7), dtype=np.float32)
+    # predict_on_batch bỏ qua phần dựng pipeline dữ liệu của model.predict nên rẻ hơn nhiều với lô nhỏ
+    if hasattr(model, 'predict_on_batch'):
+        return np.asarray(model.predict_on_batch(batch))
+    return np.asarray(model.predict(batch))
+
+
+class EmotionInferenceQueue:
+    """Gom ảnh mặt từ nhiều khuôn mặt và nhiều khung hình, chạy mô hình một lần cho mỗi lô.
+
+    Mỗi ảnh chờ tối đa max_delay giây trước khi lô được chạy, kết quả trả về qua Future.
+    """
+
+    def __init__(self, model, max_batch=32, max_delay=0.03):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batches = 0
+        self.samples = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, face_input):
+        """Đưa một ảnh mặt (1, 48, 48, 1) hoặc (48, 48, 1) vào hàng đợi; trả về Future của vector xác suất"""
+        future = Future()
+        self._queue.put((np.asarray(face_input).reshape(48, 48, 1), future))
+        return future
+
+    def submit_many(self, face_inputs):
+        return [self.submit(face_input) for face_input in face_inputs]
+
+    def _collect(self):
+        """Chờ ảnh đầu tiên rồi gom thêm cho tới khi đủ lô hoặc hết thời gian chờ"""
+        item = self._queue.get()
+        if item is None:
+            return None
+        items = [item]
+        deadline = time.time() + self.max_delay
+        while len(items) < self.max_batch:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            items.append(item)
+        return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            if items is None:
+                break
+            futures = [future for _, future in items]
+            try:
+                probabilities = predict_batch(self.model, np.stack([face for face, _ in items]))
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.samples += len(items)
+            for future, probs in zip(futures, probabilities):
+                future.set_result(probs)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=2)
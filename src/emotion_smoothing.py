@@ -0,0 +1,115 @@
+# emotion_smoothing.py
+import time
+import numpy as np
+
+NORMAL_TEXT = "Bình thường"
+ABNORMAL_TEXT = "Bất thường"
+# Chỉ số cảm xúc fer2013 được coi là bất thường (giống EmotionRecognitionProcessor.get_emotion_text)
+ABNORMAL_EMOTIONS = (0, 1, 2, 4, 5)
+
+
+class EmotionSmoother:
+    """Làm mượt xác suất cảm xúc theo thời gian (EMA) và quyết định khi nào cần chạy lại mô hình.
+
+    Mô hình chỉ chạy lại khi landmark đã chuẩn hóa thay đổi quá motion_threshold (biểu cảm đổi)
+    hoặc kết quả cũ hơn max_age giây; các khung còn lại dùng lại xác suất đã làm mượt.
+    Trạng thái chuyển sang bất thường khi xác suất bất thường vượt enter_threshold liên tục hold giây,
+    và chỉ trở lại bình thường khi xuống dưới exit_threshold.
+    """
+
+    def __init__(self, alpha=0.3, motion_threshold=0.02, max_age=1.0,
+                 enter_threshold=0.6, exit_threshold=0.4, hold=3.0, abnormal_emotions=ABNORMAL_EMOTIONS):
+        self.alpha = alpha
+        self.motion_threshold = motion_threshold
+        self.max_age = max_age
+        self.enter_threshold = enter_threshold
+        self.exit_threshold = exit_threshold
+        self.hold = hold
+        self.abnormal_emotions = list(abnormal_emotions)
+        self.inferences = 0
+        self.skipped = 0
+        self.reset()
+
+    def reset(self):
+        """Xóa trạng thái (ví dụ khi mất khuôn mặt)"""
+        self.probabilities = None
+        self.reference = None
+        self.last_inference = None
+        self.abnormal_since = None
+        self.abnormal = False
+
+    def motion(self, features):
+        """Độ dịch chuyển trung bình của 68 điểm landmark đã chuẩn hóa so với lần suy luận trước"""
+        if self.reference is None or features is None:
+            return float('inf')
+        delta = (np.asarray(features) - self.reference).reshape(-1, 2)
+        return float(np.linalg.norm(delta, axis=1).mean())
+
+    def needs_inference(self, features=None, now=None):
+        """True nếu cần chạy mô hình cho khung này; False thì dùng lại kết quả đã làm mượt"""
+        now = time.time() if now is None else now
+        if (self.probabilities is None or now - self.last_inference >= self.max_age
+                or self.motion(features) >= self.motion_threshold):
+            return True
+        self.skipped += 1
+        return False
+
+    def update(self, probabilities, features=None, now=None):
+        """Đưa vector xác suất mới vào bộ làm mượt"""
+        now = time.time() if now is None else now
+        probabilities = np.asarray(probabilities, dtype=np.float64).reshape(-1)
+        if self.probabilities is None:
+            self.probabilities = probabilities
+        else:
+            self.probabilities = self.alpha * probabilities + (1 - self.alpha) * self.probabilities
+        if features is not None:
+            self.reference = np.array(features, dtype=np.float64)
+        self.last_inference = now
+        self.inferences += 1
+
+    def emotion(self):
+        """Cảm xúc có xác suất đã làm mượt cao nhất (None nếu chưa có dữ liệu)"""
+        return None if self.probabilities is None else int(np.argmax(self.probabilities))
+
+    def abnormal_probability(self):
+        if self.probabilities is None:
+            return None
+        return float(self.probabilities[self.abnormal_emotions].sum())
+
+    def state(self, now=None):
+        """Trạng thái hiển thị: Bình thường/Bất thường (None nếu chưa có dữ liệu)"""
+        now = time.time() if now is None else now
+        probability = self.abnormal_probability()
+        if probability is None:
+            return None
+        if self.abnormal:
+            if probability < self.exit_threshold:
+                self.abnormal = False
+                self.abnormal_since = None
+        elif probability >= self.enter_threshold:
+            if self.abnormal_since is None:
+                self.abnormal_since = now
+            if now - self.abnormal_since >= self.hold:
+                self.abnormal = True
+        else:
+            self.abnormal_since = None
+        return ABNORMAL_TEXT if self.abnormal else NORMAL_TEXT
+
+
+def smooth_emotion(smoother, processor, image, analysis, now=None):
+    """Một bước làm mượt cho khung đã phân tích (dùng chung cho luồng Tk và tiến trình phân tích).
+
+    Không có khuôn mặt thì xóa trạng thái; mô hình chỉ chạy khi smoother.needs_inference().
+    Trả về trạng thái hiển thị, hoặc None nếu chưa có gì để hiển thị.
+    """
+    now = time.time() if now is None else now
+    if analysis is None or len(analysis) == 0:
+        smoother.reset()
+        return None
+    features = analysis.features()[0]
+    if smoother.needs_inference(features, now):
+        probabilities = processor.predict_emotion_probabilities(image, analysis)
+        if probabilities is None:
+            return None
+        smoother.update(probabilities, features, now)
+    return smoother.state(now)
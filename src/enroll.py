@@ -0,0 +1,129 @@
+# enroll.py
+import os
+import sys
+import time
+import argparse
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+PREDICTOR_PATH = 'data/shape_predictor_68_face_landmarks.dat'
+
+# Bộ phát hiện và mô hình landmark của từng tiến trình con, nạp một lần trong _init_worker
+_worker = {}
+
+
+def _init_worker(detection_max_width=None, upsample=0):
+    import dlib
+    from src.face_detection import FaceDetector
+    _worker['detector'] = FaceDetector(max_width=detection_max_width, upsample=upsample)
+    _worker['predictor'] = dlib.shape_predictor(PREDICTOR_PATH)
+
+
+def _extract(item):
+    """Vector landmark (136,) của khuôn mặt đầu tiên trong ảnh; trả về (nhãn, vector hoặc None, lỗi)"""
+    from src.landmarks import shape_to_array, landmark_features
+    label, path = item
+    try:
+        gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            return label, None, f"không đọc được ảnh {path}"
+        faces = _worker['detector'].detect(gray)
+        if len(faces) == 0:
+            return label, None, None
+        points = shape_to_array(_worker['predictor'](gray, faces[0]))
+        return label, landmark_features(points[None])[0], None
+    except Exception as e:
+        return label, None, f"{path}: {e}"
+
+
+def find_images(data_dir, users=None):
+    """Danh sách (nhãn, đường dẫn ảnh); nhãn là tên thư mục con chứa ảnh"""
+    items = []
+    for root, dirs, files in os.walk(data_dir):
+        label = os.path.basename(root)
+        if users is not None and label not in users:
+            continue
+        for file in sorted(files):
+            if file.lower().endswith(IMAGE_EXTENSIONS):
+                items.append((label, os.path.join(root, file)))
+    return items
+
+
+def enroll(data_dir, model_dir='models', users=None, reenroll=False, workers=None,
+           detection_max_width=None, upsample=0, chunksize=8, min_samples=5):
+    """Trích đặc trưng song song cho mọi ảnh, ghi vào kho đặc trưng rồi huấn luyện lại mô hình;
+    người dùng có ít hơn min_samples ảnh có khuôn mặt không được đăng ký"""
+    from src.feature_store import FeatureStore
+    from src.face_recognition import FaceRecognition
+
+    store = FeatureStore(model_dir)
+    # Cài đặt cũ (kho trống): lấy lại vector từ knn_model.pkl; người dùng chỉ có ảnh PNG được trích
+    # song song ở dưới cùng các người dùng đã chọn, kể cả khi chỉ đăng ký một số người dùng
+    legacy = len(store) == 0
+    FaceRecognition.import_legacy_users(store, model_dir, data_dir=None)
+    items = find_images(data_dir, None if legacy else users)
+
+    def wanted(label):
+        if users is not None and label not in users:
+            return label not in store
+        return reenroll or label not in store
+
+    skipped = sorted({label for label, _ in items if not wanted(label)})
+    if skipped:
+        print(f"Bỏ qua {len(skipped)} người dùng đã có trong kho (dùng --reenroll để trích lại)")
+    items = [(label, path) for label, path in items if wanted(label)]
+    if not items:
+        print("Không có ảnh mới để đăng ký")
+        return FaceRecognition.fit_models(store, model_dir) if len(store) else False
+
+    features = defaultdict(list)
+    errors = 0
+    no_face = 0
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(detection_max_width, upsample)) as executor:
+        for done, (label, vector, error) in enumerate(executor.map(_extract, items, chunksize=chunksize), 1):
+            if error is not None:
+                errors += 1
+                print(f"\nLỗi: {error}")
+            elif vector is None:
+                no_face += 1
+            else:
+                features[label].append(vector)
+            if done % 20 == 0 or done == len(items):
+                rate = done / max(time.time() - start, 1e-6)
+                print(f"\r[{done}/{len(items)}] {rate:.1f} ảnh/giây", end='', flush=True)
+    elapsed = time.time() - start
+    print(f"\nĐã xử lý {len(items)} ảnh trong {elapsed:.1f} giây ({len(items) / max(elapsed, 1e-6):.1f} ảnh/giây), "
+          f"{no_face} ảnh không có khuôn mặt, {errors} ảnh lỗi")
+
+    for label in sorted(features):
+        if len(features[label]) < min_samples:
+            print(f"  {label}: chỉ có {len(features[label])} vector (cần {min_samples}), bỏ qua")
+            continue
+        store.replace(label, features[label])
+        print(f"  {label}: {len(features[label])} vector")
+    return FaceRecognition.fit_models(store, model_dir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Đăng ký hàng loạt người dùng từ thư mục ảnh (mỗi người một thư mục con)")
+    parser.add_argument('data_dir', nargs='?', default='data/users')
+    parser.add_argument('--model-dir', default='models')
+    parser.add_argument('--users', nargs='*', help="Chỉ đăng ký các người dùng này")
+    parser.add_argument('--reenroll', action='store_true', help="Trích lại cả người dùng đã có trong kho")
+    parser.add_argument('--workers', type=int, default=None, help="Số tiến trình (mặc định bằng số lõi CPU)")
+    parser.add_argument('--max-width', type=int, default=None, help="Thu nhỏ ảnh rộng hơn giá trị này trước khi phát hiện")
+    parser.add_argument('--upsample', type=int, default=0)
+    parser.add_argument('--min-samples', type=int, default=5, help="Số ảnh có khuôn mặt tối thiểu của mỗi người dùng")
+    args = parser.parse_args(argv)
+
+    ok = enroll(args.data_dir, args.model_dir, args.users, args.reenroll, args.workers,
+                args.max_width, args.upsample, min_samples=args.min_samples)
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
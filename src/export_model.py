@@ -0,0 +1,92 @@
+# export_model.py
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from src.model import EMOTION_MODEL_PATHS, load_trained_model
+from src.emotion_backends import SUPPORTED_LAYERS
+
+# Sai lệch tuyệt đối tối đa cho phép so với Keras khi kiểm tra tương đương
+PARITY_TOLERANCE = {'numpy': 1e-4, 'tflite': 1e-3}
+# Các khóa cấu hình lớp cần giữ lại cho bộ chạy NumPy
+LAYER_CONFIG_KEYS = ('activation', 'strides', 'padding', 'pool_size', 'epsilon')
+
+
+def export_numpy(model, path=EMOTION_MODEL_PATHS['numpy']):
+    """Xuất trọng số và mô tả lớp của mô hình Keras thành một file .npz"""
+    layers = []
+    arrays = {}
+    for index, layer in enumerate(model.layers):
+        kind = type(layer).__name__
+        if kind not in SUPPORTED_LAYERS:
+            raise ValueError(f"Lớp {kind} chưa được bộ chạy NumPy hỗ trợ")
+        config = layer.get_config()
+        layers.append({'type': kind, 'config': {key: config[key] for key in LAYER_CONFIG_KEYS if key in config}})
+        for weight, value in zip(layer.weights, layer.get_weights()):
+            # Tên trọng số dạng 'conv2d/kernel:0' hoặc 'kernel' tùy phiên bản Keras
+            name = weight.name.split('/')[-1].split(':')[0]
+            arrays[f'{index}_{name}'] = value.astype(np.float32)
+    np.savez(path, spec=np.array(json.dumps(layers)), **arrays)
+    return path
+
+
+def export_tflite(model, path=EMOTION_MODEL_PATHS['tflite']):
+    """Chuyển mô hình Keras sang TFLite (float32)"""
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    with open(path, 'wb') as f:
+        f.write(converter.convert())
+    return path
+
+
+def load_holdout(count=500):
+    """Lấy ảnh mặt từ tập kiểm định của fer2013 (cùng cách chia với train_model)"""
+    from sklearn.model_selection import train_test_split
+    from src.train_model import load_fer2013
+    X, y = load_fer2013()
+    _, X_val, _, _ = train_test_split(X, y, test_size=0.1, random_state=42)
+    return X_val[:count].astype(np.float32)
+
+
+def check_parity(reference, backends, crops, batch_size=32):
+    """So sánh xác suất của từng bộ chạy với mô hình Keras; trả về True nếu mọi bộ chạy đạt ngưỡng"""
+    expected = np.concatenate([reference.predict_on_batch(crops[i:i + batch_size])
+                               for i in range(0, len(crops), batch_size)])
+    passed = True
+    print(f"{'backend':>8} {'max |Δ|':>10} {'khớp argmax':>12} {'ms/lô':>8}")
+    for backend in backends:
+        model = load_trained_model(backend=backend)
+        start = time.perf_counter()
+        actual = np.concatenate([np.asarray(model.predict_on_batch(crops[i:i + batch_size]))
+                                 for i in range(0, len(crops), batch_size)])
+        elapsed = (time.perf_counter() - start) * 1000 / max(len(range(0, len(crops), batch_size)), 1)
+        max_diff = float(np.abs(actual - expected).max())
+        agreement = float((actual.argmax(axis=1) == expected.argmax(axis=1)).mean())
+        ok = max_diff <= PARITY_TOLERANCE[backend]
+        passed = passed and ok
+        print(f"{backend:>8} {max_diff:>10.2e} {agreement:>12.3f} {elapsed:>8.2f} {'OK' if ok else 'LỖI'}")
+    return passed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Xuất mô hình cảm xúc sang TFLite/NumPy và kiểm tra tương đương với Keras")
+    parser.add_argument('--model', default=EMOTION_MODEL_PATHS['keras'])
+    parser.add_argument('--formats', nargs='+', default=['tflite', 'numpy'], choices=['tflite', 'numpy'])
+    parser.add_argument('--check', action='store_true', help="Chỉ kiểm tra tương đương trên tập kiểm định fer2013")
+    parser.add_argument('--samples', type=int, default=500)
+    args = parser.parse_args(argv)
+
+    reference = load_trained_model(args.model, backend='keras')
+    if not args.check:
+        if 'numpy' in args.formats:
+            print(f"Đã xuất {export_numpy(reference)}")
+        if 'tflite' in args.formats:
+            print(f"Đã xuất {export_tflite(reference)}")
+    crops = load_holdout(args.samples)
+    print(f"So sánh trên {len(crops)} ảnh mặt của tập kiểm định")
+    return 0 if check_parity(reference, args.formats, crops) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,245 @@
+# face_detection.py
+import os
+import numpy as np
+import cv2
+import dlib
+
+# Biến môi trường chọn bộ phát hiện mặc định: hog, haar, lbp hoặc dnn
+DETECTOR_ENV = 'FACE_DETECTOR'
+
+
+def scale_rectangles(rects, factor, offset_x=0, offset_y=0):
+    """Đổi tọa độ các khung mặt theo hệ số và độ lệch, trả về dlib.rectangles"""
+    scaled = dlib.rectangles()
+    for rect in rects:
+        scaled.append(dlib.rectangle(
+            int(round(rect.left() * factor)) + offset_x,
+            int(round(rect.top() * factor)) + offset_y,
+            int(round(rect.right() * factor)) + offset_x,
+            int(round(rect.bottom() * factor)) + offset_y,
+        ))
+    return scaled
+
+
+def _to_rectangles(boxes, factor=1.0):
+    """Đổi danh sách (x, y, w, h) sang dlib.rectangles"""
+    rects = dlib.rectangles()
+    for x, y, w, h in boxes:
+        rects.append(dlib.rectangle(int(x * factor), int(y * factor),
+                                    int((x + w) * factor) - 1, int((y + h) * factor) - 1))
+    return rects
+
+
+class HogBackend:
+    """Bộ phát hiện HOG + SVM tuyến tính của dlib"""
+    name = 'hog'
+
+    def __init__(self):
+        self.hog = dlib.get_frontal_face_detector()
+
+    def detect(self, gray, upsample=0):
+        return self.hog(gray, upsample)
+
+
+class CascadeBackend:
+    """Bộ phát hiện Haar/LBP cascade đi kèm OpenCV"""
+    CASCADE_FILES = {
+        'haar': 'haarcascade_frontalface_default.xml',
+        'lbp': 'lbpcascade_frontalface_improved.xml',
+    }
+
+    def __init__(self, kind='haar', path=None, scale_factor=1.1, min_neighbors=5, min_size=(40, 40)):
+        self.name = kind
+        if path is None:
+            path = self._find_cascade(self.CASCADE_FILES[kind])
+        self.classifier = cv2.CascadeClassifier(path)
+        if self.classifier.empty():
+            raise FileNotFoundError(f"Không nạp được cascade tại {path}")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+
+    @staticmethod
+    def _find_cascade(file_name):
+        """Tìm file cascade trong thư mục data/ của dự án hoặc thư mục dữ liệu của OpenCV"""
+        base = getattr(cv2, 'data', None)
+        haar_dir = base.haarcascades if base is not None else ''
+        candidates = [
+            os.path.join('data', file_name),
+            os.path.join(haar_dir, file_name),
+            # Một số bản cài OpenCV để LBP cascade ở thư mục lbpcascades cạnh haarcascades
+            os.path.join(os.path.dirname(os.path.normpath(haar_dir)), 'lbpcascades', file_name),
+        ]
+        for candidate in candidates:
+            if os.path.exists(candidate):
+                return candidate
+        raise FileNotFoundError(f"Không tìm thấy {file_name}; hãy đặt file vào thư mục data/")
+
+    def detect(self, gray, upsample=0):
+        factor = 1.0
+        for _ in range(upsample):
+            gray = cv2.pyrUp(gray)
+            factor /= 2
+        boxes = self.classifier.detectMultiScale(
+            gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors, minSize=self.min_size)
+        return _to_rectangles(boxes, factor)
+
+
+class DnnBackend:
+    """Bộ phát hiện SSD của OpenCV DNN, nạp mô hình từ file cục bộ (mặc định res10 300x300 Caffe)"""
+    name = 'dnn'
+
+    def __init__(self, model='data/res10_300x300_ssd_iter_140000.caffemodel', config='data/deploy.prototxt',
+                 confidence=0.5, input_size=(300, 300), mean=(104.0, 177.0, 123.0)):
+        if not os.path.exists(model):
+            raise FileNotFoundError(f"Không tìm thấy mô hình DNN tại {model}")
+        self.net = cv2.dnn.readNet(model, config)
+        self.confidence = confidence
+        self.input_size = input_size
+        self.mean = mean
+
+    def detect(self, gray, upsample=0):
+        height, width = gray.shape[:2]
+        image = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+        blob = cv2.dnn.blobFromImage(image, 1.0, self.input_size, self.mean)
+        self.net.setInput(blob)
+        detections = self.net.forward().reshape(-1, 7)
+        detections = detections[detections[:, 2] >= self.confidence]
+        boxes = np.clip(detections[:, 3:7], 0.0, 1.0) * np.array([width, height, width, height])
+        rects = dlib.rectangles()
+        for left, top, right, bottom in boxes.astype(int):
+            if right > left and bottom > top:
+                rects.append(dlib.rectangle(int(left), int(top), int(right), int(bottom)))
+        return rects
+
+
+DETECTOR_BACKENDS = {
+    'hog': HogBackend,
+    'haar': lambda **kwargs: CascadeBackend(kind='haar', **kwargs),
+    'lbp': lambda **kwargs: CascadeBackend(kind='lbp', **kwargs),
+    'dnn': DnnBackend,
+}
+
+
+def create_backend(name=None, **kwargs):
+    """Tạo bộ phát hiện theo tên; mặc định lấy từ biến môi trường FACE_DETECTOR hoặc hog"""
+    if name is None:
+        name = os.environ.get(DETECTOR_ENV, 'hog')
+    if name not in DETECTOR_BACKENDS:
+        raise ValueError(f"Bộ phát hiện không hợp lệ: {name} (chọn một trong {', '.join(DETECTOR_BACKENDS)})")
+    return DETECTOR_BACKENDS[name](**kwargs)
+
+
+class DepthGate:
+    """Dùng ảnh độ sâu để giới hạn vùng tìm khuôn mặt trong một dải khoảng cách.
+
+    Ảnh độ sâu phải được căn chỉnh theo ảnh màu (RealSenseCamera.ALIGN_DEPTH); khi đó hai ảnh chỉ
+    có thể khác nhau về độ phân giải.
+    """
+
+    # Đơn vị độ sâu của dòng D400 (1 mm), dùng khi camera không cho biết
+    DEFAULT_DEPTH_SCALE = 0.001
+
+    def __init__(self, near_m=0.3, far_m=2.0, depth_scale=None, step=4, min_area=0.01,
+                 margin=0.1, focal_px=None, face_width_m=0.15, target_face_px=100):
+        self.near_m = near_m
+        self.far_m = far_m
+        self.depth_scale = depth_scale or self.DEFAULT_DEPTH_SCALE
+        # Lấy mẫu thưa ảnh độ sâu; vùng người đứng đủ lớn nên không cần độ phân giải đầy đủ
+        self.step = step
+        # Tỷ lệ diện tích tối thiểu của vùng gần để coi là có người
+        self.min_area = min_area
+        # Nới rộng vùng vì độ sâu ở mép tóc/vai nhiễu và vùng lấy mẫu thưa
+        self.margin = margin
+        self.focal_px = focal_px
+        self.face_width_m = face_width_m
+        self.target_face_px = target_face_px
+
+    def find_region(self, depth_image, frame_shape):
+        """Trả về (x0, y0, x1, y1, khoảng cách m) của vùng gần lớn nhất, hoặc None nếu không có ai"""
+        sub = depth_image[::self.step, ::self.step]
+        near = self.near_m / self.depth_scale
+        far = self.far_m / self.depth_scale
+        mask = ((sub >= near) & (sub <= far)).astype(np.uint8)
+        min_pixels = self.min_area * mask.size
+        if np.count_nonzero(mask) < min_pixels:
+            return None
+
+        count, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        if count < 2:
+            return None
+        largest = 1 + int(np.argmax(stats[1:, cv2.CC_STAT_AREA]))
+        if stats[largest, cv2.CC_STAT_AREA] < min_pixels:
+            return None
+        distance = float(np.median(sub[labels == largest])) * self.depth_scale
+
+        # Đổi tọa độ từ ảnh độ sâu đã lấy mẫu (đã căn chỉnh) sang ảnh màu
+        frame_height, frame_width = frame_shape[:2]
+        sx = frame_width / depth_image.shape[1] * self.step
+        sy = frame_height / depth_image.shape[0] * self.step
+        x, y, w, h = stats[largest, :4]
+        pad_x = int(w * sx * self.margin)
+        pad_y = int(h * sy * self.margin)
+        x0 = max(int(x * sx) - pad_x, 0)
+        y0 = max(int(y * sy) - pad_y, 0)
+        x1 = min(int((x + w) * sx) + pad_x, frame_width)
+        y1 = min(int((y + h) * sy) + pad_y, frame_height)
+        return x0, y0, x1, y1, distance
+
+    def scale_for_distance(self, distance, frame_width):
+        """Hệ số co giãn để khuôn mặt ở khoảng cách distance có kích thước khoảng target_face_px"""
+        # Camera màu D435i có góc nhìn ngang ~69 độ nên tiêu cự xấp xỉ 0.73 * chiều rộng ảnh
+        focal = self.focal_px or 0.73 * frame_width
+        face_px = focal * self.face_width_m / max(distance, 1e-3)
+        return self.target_face_px / face_px
+
+
+class FaceDetector:
+    """Phát hiện khuôn mặt trên ảnh thu nhỏ, trả về tọa độ ở độ phân giải gốc"""
+
+    def __init__(self, scale=1.0, max_width=None, upsample=0, depth_gate=None, backend=None):
+        # backend: tên trong DETECTOR_BACKENDS hoặc một đối tượng có detect(gray, upsample)
+        self.backend = backend if hasattr(backend, 'detect') else create_backend(backend)
+        self.scale = scale
+        self.max_width = max_width
+        self.upsample = upsample
+        self.depth_gate = depth_gate
+
+    def scale_for(self, width):
+        """Tính hệ số thu nhỏ cho ảnh có chiều rộng width"""
+        scale = self.scale
+        if self.max_width and width * scale > self.max_width:
+            scale = self.max_width / width
+        return min(scale, 1.0)
+
+    def detect(self, gray, depth=None):
+        """Chạy bộ phát hiện trên bản thu nhỏ của ảnh xám, đổi kết quả về tọa độ ảnh gốc"""
+        if self.depth_gate is None or depth is None:
+            return self._detect_region(gray, self.scale_for(gray.shape[1]), self.upsample)
+
+        region = self.depth_gate.find_region(depth, gray.shape)
+        if region is None:
+            # Không có ai trong dải khoảng cách: bỏ qua bước phát hiện
+            return dlib.rectangles()
+        x0, y0, x1, y1, distance = region
+        ratio = self.depth_gate.scale_for_distance(distance, gray.shape[1])
+        if ratio >= 2.0:
+            # Khuôn mặt ở xa: để bộ phát hiện phóng to ảnh thay vì thu nhỏ
+            scale, upsample = 1.0, self.upsample + 1
+        else:
+            scale, upsample = min(ratio, 1.0), self.upsample
+        roi = np.ascontiguousarray(gray[y0:y1, x0:x1])
+        return self._detect_region(roi, scale, upsample, x0, y0)
+
+    def _detect_region(self, gray, scale, upsample, offset_x=0, offset_y=0):
+        """Phát hiện trên vùng ảnh với hệ số thu nhỏ cho trước"""
+        if scale >= 1.0:
+            faces = self.backend.detect(gray, upsample)
+            if not offset_x and not offset_y:
+                return faces
+            return scale_rectangles(faces, 1.0, offset_x, offset_y)
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return scale_rectangles(self.backend.detect(small, upsample), 1.0 / scale, offset_x, offset_y)
+
+    def __call__(self, gray, depth=None):
+        return self.detect(gray, depth)
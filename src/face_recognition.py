@@ -2,12 +2,15 @@ import os
 import cv2
 import numpy as np
 import joblib
-from sklearn import neighbors
-from sklearn.svm import SVC
 import dlib
+from src.face_detection import FaceDetector
+from src.landmarks import shape_to_array, normalize_landmarks_batch, landmark_features
+from src.feature_store import FeatureStore
+from src.identity_index import IdentityIndex
+from src.recognition_bundle import BundleError, bundle_exists, load_bundle, save_bundle
 
 # Sử dụng mô hình landmark khuôn mặt của dlib
-detector = dlib.get_frontal_face_detector()
+detector = FaceDetector()
 predictor = dlib.shape_predictor("data/shape_predictor_68_face_landmarks.dat")  # Đường dẫn tới mô hình dlib landmark
 
 def load_image_file(path):
@@ -18,129 +21,140 @@ def load_image_file(path):
     return image
 
 class FaceRecognition:
-    @staticmethod
-    def train_face_recognition_model(data_dir, model_dir):
-        X = []
-        y = []
-
-        trained_users = set()
+    BUNDLE_DIR = os.path.join('models', 'recognition')
 
-        # Kiểm tra danh sách những người đã được huấn luyện trước đó
-        trained_users_path = os.path.join(model_dir, 'trained_users.txt')
-        if os.path.exists(trained_users_path):
-            with open(trained_users_path, 'r') as f:
-                trained_users = set(f.read().splitlines())
+    @staticmethod
+    def train_face_recognition_model(data_dir, model_dir, users=None):
+        """Trích đặc trưng của người dùng chưa có trong kho (hoặc của các người dùng trong users,
+        khi đăng ký lại) rồi dựng lại mô hình nhận diện từ toàn bộ kho đặc trưng"""
+        store = FeatureStore(model_dir)
+        FaceRecognition.import_legacy_users(store, model_dir, data_dir)
+        FaceRecognition._import_images(store, data_dir, users)
+        FaceRecognition.fit_models(store, model_dir)
 
+    @staticmethod
+    def _import_images(store, data_dir, users=None):
+        """Trích đặc trưng từ ảnh PNG trong data_dir/<người dùng> vào kho; trả về số người dùng đã thêm"""
+        imported = 0
         # Duyệt qua tất cả các thư mục con trong data_dir
         for root, dirs, files in os.walk(data_dir):
             label = os.path.basename(root)
-            if label in trained_users:
-                print(f"Người dùng {label} đã được huấn luyện. Bỏ qua.")
+            images = [file for file in files if file.endswith(".png")]
+            if not images:
+                continue
+            if users is not None and label not in users:
+                continue
+            if users is None and label in store:
+                print(f"Người dùng {label} đã có trong kho đặc trưng. Bỏ qua.")
                 continue  # Bỏ qua người dùng đã huấn luyện
 
-            for file in files:
-                if file.endswith(".png"):
-                    path = os.path.join(root, file)
-                    
-                    # Tiền xử lý ảnh và kiểm tra chất lượng khuôn mặt
-                    landmarks = FaceRecognition.extract_landmarks(path)
-                    if landmarks is not None:
-                        X.append(landmarks)
-                        y.append(label)
-
-        # Chuyển đổi danh sách thành numpy arrays
-        if X and y:
-            X = np.array(X)
-            y = np.array(y)
-
-            # Huấn luyện mô hình k-NN với k=3 dựa trên các đặc điểm khuôn mặt
-            knn = neighbors.KNeighborsClassifier(n_neighbors=3)
-            knn.fit(X, y)
-
-            # Huấn luyện mô hình SVM
-            svm = SVC(kernel='linear', probability=True)
-            svm.fit(X, y)
-
-            # Lưu cả hai mô hình
-            if not os.path.exists(model_dir):
-                os.makedirs(model_dir)
-
-            knn_model_path = os.path.join(model_dir, "knn_model.pkl")
-            svm_model_path = os.path.join(model_dir, "svm_model.pkl")
-            joblib.dump(knn, knn_model_path)
-            joblib.dump(svm, svm_model_path)
-            print("Huấn luyện hoàn tất và mô hình đã được lưu tại:", knn_model_path, "và", svm_model_path)
-
-            # Cập nhật danh sách người dùng đã được huấn luyện
-            with open(trained_users_path, 'a') as f:
-                for label in np.unique(y):
-                    f.write(f"{label}\n")
+            X = []
+            for file in images:
+                # Tiền xử lý ảnh và kiểm tra chất lượng khuôn mặt
+                landmarks = FaceRecognition.extract_landmarks(os.path.join(root, file))
+                if landmarks is not None:
+                    X.append(landmarks)
+            if X:
+                store.replace(label, X)
+                imported += 1
+                print(f"Đã lưu {len(X)} vector đặc trưng của {label}")
+        return imported
 
-        else:
+    @staticmethod
+    def import_legacy_users(store, model_dir='models', data_dir='data/users'):
+        """Chuyển người dùng của cách huấn luyện cũ vào kho đặc trưng, một lần khi kho còn trống.
+
+        Vector huấn luyện được lấy lại từ knn_model.pkl; người dùng không có trong pickle được trích
+        từ ảnh PNG trong data_dir (data_dir=None để bỏ qua bước này). Trả về số người dùng đã chuyển.
+        """
+        if len(store):
+            return 0
+        imported = 0
+        knn_path = os.path.join(model_dir, 'knn_model.pkl')
+        if os.path.exists(knn_path):
+            try:
+                imported = len(store.import_knn(knn_path))
+                print(f"Đã chuyển {imported} người dùng từ {knn_path} vào kho đặc trưng")
+            except Exception as e:
+                print(f"Không đọc được mô hình KNN cũ: {e}")
+        if data_dir is not None and os.path.isdir(data_dir):
+            imported += FaceRecognition._import_images(store, data_dir)
+        return imported
+
+    @staticmethod
+    def fit_models(store, model_dir):
+        """Dựng chỉ mục nhận diện từ mọi người dùng trong kho đặc trưng (không đọc lại ảnh) và ghi gói mô hình"""
+        X, y = store.load()
+        if len(X) == 0:
             print("Không tìm thấy dữ liệu mới để huấn luyện.")
+            return False
+
+        index = IdentityIndex.from_features(X, y)
+        bundle_dir = os.path.join(model_dir, 'recognition')
+        manifest = save_bundle(index, X, y, bundle_dir)
+        print(f"Huấn luyện hoàn tất: {manifest['samples']} mẫu của {len(manifest['labels'])} người dùng, "
+              f"gói mô hình đã được lưu tại {bundle_dir}")
+        return True
 
     @staticmethod
     def extract_landmarks(image_path):
         """ Trích xuất 68 điểm đặc trưng khuôn mặt từ ảnh và chuẩn hóa """
         image = load_image_file(image_path)
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        faces = detector(gray)
+        faces = detector.detect(gray)
         
         if len(faces) == 0:
             return None
         
         # Trích xuất các landmark cho khuôn mặt đầu tiên được phát hiện
         face = faces[0]
-        landmarks = predictor(gray, face)
+        points = shape_to_array(predictor(gray, face))
 
-        # Chuyển đổi các điểm đặc trưng thành một danh sách tọa độ
-        landmark_points = []
-        for i in range(0, 68):
-            landmark_points.append((landmarks.part(i).x, landmarks.part(i).y))
-        
-        # Chuẩn hóa các tọa độ để loại bỏ tác động của vị trí và kích thước khuôn mặt
-        normalized_landmarks = FaceRecognition.normalize_landmarks(landmark_points)
-        
-        # Làm phẳng danh sách các tọa độ để có thể đưa vào mô hình học máy
-        flattened_landmarks = np.array(normalized_landmarks).flatten()
-        return flattened_landmarks
+        # Chuẩn hóa tọa độ (loại bỏ vị trí và kích thước khuôn mặt) rồi làm phẳng thành vector 136 chiều
+        return landmark_features(points[None])[0]
 
     @staticmethod
     def normalize_landmarks(landmarks):
         """ Chuẩn hóa các tọa độ landmark bằng cách đưa về cùng tỷ lệ """
-        # Chuyển đổi danh sách các tọa độ thành một numpy array
-        landmarks = np.array(landmarks)
-
-        # Tính trung tâm của khuôn mặt (giữa mắt)
-        mean = np.mean(landmarks, axis=0)
+        return normalize_landmarks_batch(np.asarray(landmarks)[None])[0]
 
-        # Chuẩn hóa tọa độ bằng cách trừ đi trung tâm và chia cho khoảng cách chuẩn hóa
-        normalized_landmarks = landmarks - mean
-        max_distance = np.linalg.norm(normalized_landmarks, axis=1).max()
-        normalized_landmarks /= max_distance
-
-        return normalized_landmarks
-
-    def __init__(self):
+    def __init__(self, detection_max_width=None):
+        self.detector = FaceDetector(max_width=detection_max_width)
         self.model_path_knn = os.path.join('models', 'knn_model.pkl')
         self.model_path_svm = os.path.join('models', 'svm_model.pkl')
         self.knn_classifier = None
         self.svm_classifier = None
-        if os.path.exists(self.model_path_knn) and os.path.exists(self.model_path_svm):
+        # Chỉ mục nhận diện tập mở: nạp từ gói mô hình (memmap, vài mili giây), nếu chưa có gói thì dựng
+        # từ kho đặc trưng; cặp KNN + SVM (pickle) chỉ còn dùng cho dữ liệu huấn luyện theo cách cũ
+        self.identity_index = None
+        if bundle_exists(self.BUNDLE_DIR):
+            try:
+                self.identity_index = load_bundle(self.BUNDLE_DIR)
+            except BundleError as e:
+                print(f"Không nạp được gói mô hình nhận diện: {e}")
+        if self.identity_index is None:
+            store = FeatureStore('models')
+            if len(store):
+                self.identity_index = IdentityIndex.from_store(store)
+        if self.identity_index is None and os.path.exists(self.model_path_knn) and os.path.exists(self.model_path_svm):
             self.knn_classifier = joblib.load(self.model_path_knn)
             self.svm_classifier = joblib.load(self.model_path_svm)
-        else:
+        elif self.identity_index is None:
             print("Mô hình nhận diện khuôn mặt không tồn tại!")
 
-    def recognize_user(self, image):
-        if self.knn_classifier is None or self.svm_classifier is None:
+    def recognize_user(self, image, analysis=None):
+        if self.identity_index is None and (self.knn_classifier is None or self.svm_classifier is None):
             return None
         
         # Trích xuất các điểm đặc trưng từ khuôn mặt trong ảnh
-        landmarks = self.extract_landmarks_from_frame(image)
+        landmarks = self.extract_landmarks_from_frame(image, analysis)
         if landmarks is None:
             return None
 
+        # Một truy vấn khoảng cách cho mỗi khuôn mặt; người lạ (xa hơn ngưỡng) trả về None
+        if self.identity_index is not None:
+            return self.identity_index.identify(landmarks)
+
         # Dự đoán bằng KNN và SVM
         knn_prediction = self.knn_classifier.predict([landmarks])
         svm_prediction = self.svm_classifier.predict([landmarks])
@@ -148,18 +162,22 @@ class FaceRecognition:
         # Sử dụng dự đoán từ KNN và SVM, có thể chọn cách kết hợp nếu cần
         return knn_prediction[0] if knn_prediction == svm_prediction else None
 
-    def extract_landmarks_from_frame(self, frame):
+    def extract_landmarks_from_frame(self, frame, analysis=None):
         """ Trích xuất 68 điểm từ một khung hình và chuẩn hóa """
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = detector(gray)
-        
-        if len(faces) == 0:
-            return None
+        if analysis is not None:
+            # Dùng lại kết quả phát hiện và landmark đã tính cho khung hình này
+            if len(analysis.faces) == 0:
+                return None
+            return analysis.features()[0]
+        else:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            faces = self.detector.detect(gray)
 
-        face = faces[0]
-        landmarks = predictor(gray, face)
-        landmark_points = [(landmarks.part(i).x, landmarks.part(i).y) for i in range(68)]
-        
-        # Chuẩn hóa các điểm đặc trưng
-        normalized_landmarks = self.normalize_landmarks(landmark_points)
-        return np.array(normalized_landmarks).flatten()
+            if len(faces) == 0:
+                return None
+
+            face = faces[0]
+            points = shape_to_array(predictor(gray, face))
+
+            # Chuẩn hóa các điểm đặc trưng
+            return landmark_features(points[None])[0]
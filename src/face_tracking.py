@@ -0,0 +1,92 @@
+# face_tracking.py
+import dlib
+
+
+def overlap(a, b):
+    """Tỷ lệ giao trên hợp (IoU) của hai dlib.rectangle"""
+    left, top = max(a.left(), b.left()), max(a.top(), b.top())
+    right, bottom = min(a.right(), b.right()), min(a.bottom(), b.bottom())
+    if right < left or bottom < top:
+        return 0.0
+    inter = (right - left + 1) * (bottom - top + 1)
+    return inter / float(a.area() + b.area() - inter)
+
+
+class Track:
+    """Một khuôn mặt đang được bám với mã định danh ổn định"""
+
+    def __init__(self, track_id, gray, rect):
+        self.track_id = track_id
+        self.rect = rect
+        self.confidence = float('inf')
+        self.tracker = dlib.correlation_tracker()
+        self.tracker.start_track(gray, rect)
+
+    def update(self, gray):
+        """Bám khuôn mặt sang khung mới, trả về độ tin cậy (PSR) của bộ bám"""
+        self.confidence = self.tracker.update(gray)
+        position = self.tracker.get_position()
+        self.rect = dlib.rectangle(int(position.left()), int(position.top()),
+                                   int(position.right()), int(position.bottom()))
+        return self.confidence
+
+
+class FaceTracker:
+    """Chạy bộ phát hiện mỗi detect_every khung hoặc khi bám kém, giữa các lần đó dùng correlation_tracker"""
+
+    def __init__(self, detector, detect_every=10, min_confidence=7.0, match_iou=0.3):
+        self.detector = detector
+        self.detect_every = detect_every
+        # Ngưỡng PSR của dlib.correlation_tracker; thấp hơn nghĩa là đã mất dấu
+        self.min_confidence = min_confidence
+        self.match_iou = match_iou
+        self.tracks = []
+        self.next_id = 1
+        self.frames_since_detect = 0
+
+    @property
+    def track_ids(self):
+        return [track.track_id for track in self.tracks]
+
+    def reset(self):
+        self.tracks = []
+        self.frames_since_detect = 0
+
+    def update(self, gray, depth=None):
+        """Trả về dlib.rectangles của các khuôn mặt trong khung hiện tại"""
+        need_detect = not self.tracks or self.frames_since_detect >= self.detect_every
+        if not need_detect:
+            for track in self.tracks:
+                if track.update(gray) < self.min_confidence:
+                    need_detect = True
+                    break
+
+        if need_detect:
+            self._redetect(gray, depth)
+        else:
+            self.frames_since_detect += 1
+
+        faces = dlib.rectangles()
+        for track in self.tracks:
+            faces.append(track.rect)
+        return faces
+
+    def _redetect(self, gray, depth):
+        """Chạy bộ phát hiện và ghép kết quả với các track cũ để giữ nguyên mã định danh"""
+        detections = self.detector.detect(gray, depth)
+        previous = self.tracks
+        self.tracks = []
+        for rect in detections:
+            best, best_iou = None, self.match_iou
+            for track in previous:
+                iou = overlap(track.rect, rect)
+                if iou >= best_iou:
+                    best, best_iou = track, iou
+            if best is not None:
+                previous.remove(best)
+                track_id = best.track_id
+            else:
+                track_id = self.next_id
+                self.next_id += 1
+            self.tracks.append(Track(track_id, gray, rect))
+        self.frames_since_detect = 0
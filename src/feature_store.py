@@ -0,0 +1,136 @@
+# feature_store.py
+import os
+import json
+import numpy as np
+
+
+class FeatureStore:
+    """Kho vector landmark đã chuẩn hóa của mọi người dùng đã đăng ký.
+
+    Dữ liệu là một file float32 chỉ ghi nối thêm (mỗi dòng một vector), kèm file chỉ mục JSON
+    ánh xạ người dùng -> các đoạn dòng [đầu, cuối). Đăng ký lại một người chỉ đổi chỉ mục;
+    các dòng cũ được dọn khi gọi compact(). Mở kho chỉ để đọc không ghi gì vào đĩa: các dòng nằm
+    ngoài chỉ mục (chưa được ghi nhận) bị bỏ qua khi đọc và chỉ bị cắt bỏ trước lần ghi tiếp theo.
+    """
+
+    DATA_FILE = 'features.f32'
+    INDEX_FILE = 'features_index.json'
+
+    def __init__(self, directory='models', dim=136):
+        self.directory = directory
+        self.data_path = os.path.join(directory, self.DATA_FILE)
+        self.index_path = os.path.join(directory, self.INDEX_FILE)
+        self.dim = dim
+        self.index = {'dim': dim, 'rows': 0, 'users': {}}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+            if self.index['dim'] != dim:
+                raise ValueError(f"Kho đặc trưng có {self.index['dim']} chiều, cần {dim}")
+
+    def _truncate_uncommitted(self):
+        """Bỏ các dòng đã ghi nhưng chưa vào chỉ mục (ví dụ khi chương trình dừng giữa chừng)"""
+        if not os.path.exists(self.data_path):
+            return
+        committed = self.index['rows'] * self.dim * 4
+        if os.path.getsize(self.data_path) > committed:
+            with open(self.data_path, 'r+b') as f:
+                f.truncate(committed)
+
+    def _save_index(self):
+        # Ghi ra file tạm rồi đổi tên để chỉ mục không bao giờ bị ghi dở
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def __len__(self):
+        return sum(end - start for ranges in self.index['users'].values() for start, end in ranges)
+
+    def __contains__(self, label):
+        return label in self.index['users']
+
+    def users(self):
+        return list(self.index['users'])
+
+    def append(self, label, features):
+        """Nối thêm các vector (N, dim) của người dùng label"""
+        features = np.asarray(features, dtype=np.float32).reshape(-1, self.dim)
+        if len(features) == 0:
+            return 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._truncate_uncommitted()
+        start = self.index['rows']
+        with open(self.data_path, 'ab') as f:
+            f.write(features.tobytes())
+        self.index['rows'] = start + len(features)
+        ranges = self.index['users'].setdefault(label, [])
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = self.index['rows']
+        else:
+            ranges.append([start, self.index['rows']])
+        self._save_index()
+        return len(features)
+
+    def remove(self, label):
+        """Xóa người dùng khỏi chỉ mục (dữ liệu được dọn khi compact())"""
+        if self.index['users'].pop(label, None) is not None:
+            self._save_index()
+
+    def replace(self, label, features):
+        """Đăng ký lại: thay toàn bộ vector cũ của người dùng bằng vector mới"""
+        self.index['users'].pop(label, None)
+        if self.append(label, features) == 0:
+            self._save_index()
+
+    def _data(self):
+        if self.index['rows'] == 0:
+            return np.empty((0, self.dim), dtype=np.float32)
+        return np.memmap(self.data_path, dtype=np.float32, mode='r', shape=(self.index['rows'], self.dim))
+
+    def features(self, label):
+        """Các vector (N, dim) của một người dùng"""
+        data = self._data()
+        ranges = self.index['users'].get(label, [])
+        if not ranges:
+            return np.empty((0, self.dim), dtype=np.float32)
+        return np.concatenate([data[start:end] for start, end in ranges])
+
+    def load(self):
+        """Toàn bộ dữ liệu huấn luyện: X (N, dim) float32 và nhãn y (N,)"""
+        data = self._data()
+        X = []
+        y = []
+        for label, ranges in self.index['users'].items():
+            for start, end in ranges:
+                X.append(data[start:end])
+                y.extend([label] * (end - start))
+        if not X:
+            return np.empty((0, self.dim), dtype=np.float32), np.array([], dtype=object)
+        return np.concatenate(X), np.array(y)
+
+    def import_knn(self, path):
+        """Nạp vector huấn luyện của một KNeighborsClassifier cũ (knn_model.pkl); trả về danh sách người dùng"""
+        import joblib
+        knn = joblib.load(path)
+        X = np.asarray(knn._fit_X, dtype=np.float32)
+        y = np.asarray(knn.classes_)[np.asarray(knn._y)]
+        labels = list(dict.fromkeys(y.tolist()))
+        for label in labels:
+            self.append(label, X[y == label])
+        return labels
+
+    def compact(self):
+        """Ghi lại file dữ liệu chỉ với các dòng còn dùng"""
+        users = {label: self.features(label) for label in self.index['users']}
+        tmp_path = self.data_path + '.tmp'
+        rows = 0
+        ranges = {}
+        with open(tmp_path, 'wb') as f:
+            for label, features in users.items():
+                f.write(np.ascontiguousarray(features).tobytes())
+                ranges[label] = [[rows, rows + len(features)]]
+                rows += len(features)
+        os.replace(tmp_path, self.data_path)
+        self.index = {'dim': self.dim, 'rows': rows, 'users': ranges}
+        self._save_index()
@@ -0,0 +1,126 @@
+# frame_hub.py
+import threading
+import time
+from collections import deque, namedtuple
+
+# Một khung hình trong bộ đệm vòng: số thứ tự, thời điểm nhận, ảnh màu và ảnh độ sâu
+Frame = namedtuple('Frame', ['frame_id', 'timestamp', 'color', 'depth'])
+
+
+class FrameHub:
+    """Luồng nền duy nhất đọc camera và phân phối khung hình mới nhất cho nhiều bên sử dụng"""
+
+    def __init__(self, camera, buffer_size=3):
+        self.camera = camera
+        # Hiệu chỉnh màu của camera (nếu có) để các màn hình áp dụng khi hiển thị
+        self.color_correction = getattr(camera, 'color_correction', None)
+        # Đơn vị độ sâu (mét) và tiêu cự ảnh màu (pixel) của camera, None nếu nguồn không cho biết
+        self.depth_scale = getattr(camera, 'depth_scale', None)
+        self.focal_px = getattr(camera, 'focal_px', None)
+        self.buffer = deque(maxlen=buffer_size)
+        self.condition = threading.Condition()
+        self.frame_count = 0
+        self.error = None
+        self.running = True
+        self.thread = threading.Thread(target=self._grab_loop, daemon=True)
+        self.thread.start()
+
+    def depth_settings(self):
+        """Tham số độ sâu của camera cho EmotionRecognitionProcessor (depth_scale, focal_px)"""
+        return dict(depth_scale=self.depth_scale, focal_px=self.focal_px)
+
+    def _grab_loop(self):
+        """Đọc camera liên tục; khung cũ nhất bị loại khi bộ đệm đầy"""
+        while self.running:
+            try:
+                ret, color_image, depth_image = self.camera.get_frames()
+            except Exception as e:
+                print(f"Lỗi khi đọc camera: {e}")
+                with self.condition:
+                    self.error = e
+                    self.condition.notify_all()
+                time.sleep(0.1)
+                continue
+
+            if not ret:
+                continue
+
+            with self.condition:
+                self.frame_count += 1
+                self.error = None
+                self.buffer.append(Frame(self.frame_count, time.time(), color_image, depth_image))
+                self.condition.notify_all()
+
+    def latest(self):
+        """Trả về khung hình mới nhất (hoặc None nếu chưa có)"""
+        with self.condition:
+            return self.buffer[-1] if self.buffer else None
+
+    def wait_for_frame(self, after_id=0, timeout=None, copy=False):
+        """Chờ khung hình có số thứ tự lớn hơn after_id; trả về None nếu hết thời gian chờ.
+
+        copy=True chép ảnh ngay khi còn giữ khóa: camera ghi xoay vòng vào bộ đệm của chính nó nên
+        bản chép sau khi nhả khóa có thể lẫn dữ liệu của khung sau (luồng đọc không thể công bố
+        khung mới, nên không quay vòng tới bộ đệm này, khi khóa đang bị giữ).
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self.condition:
+            while self.running and (not self.buffer or self.buffer[-1].frame_id <= after_id):
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+            if not self.buffer or self.buffer[-1].frame_id <= after_id:
+                return None
+            frame = self.buffer[-1]
+            if copy:
+                frame = frame._replace(color=frame.color.copy(), depth=frame.depth.copy())
+            return frame
+
+    def subscribe(self, name=None, copy=True):
+        """Tạo một bên đăng ký nhận khung hình theo nhịp riêng"""
+        return FrameSubscriber(self, name, copy)
+
+    def release(self):
+        """Dừng luồng đọc và giải phóng camera"""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread is not threading.current_thread():
+            self.thread.join(timeout=2)
+        self.camera.release()
+
+
+class FrameSubscriber:
+    """Bên nhận khung hình từ FrameHub, có cùng giao diện get_frames()/release() như camera"""
+
+    def __init__(self, hub, name=None, copy=True):
+        self.hub = hub
+        self.name = name
+        self.copy = copy
+        self.last_frame_id = 0
+        self.received = 0
+        self.dropped = 0
+
+    def get_frame(self, timeout=0.0):
+        """Lấy khung hình mới nhất chưa nhận; các khung ở giữa bị bỏ qua"""
+        # Bên nhận có thể vẽ trực tiếp lên khung hình nên cần bản sao riêng (chép trong khóa của hub)
+        frame = self.hub.wait_for_frame(self.last_frame_id, timeout, copy=self.copy)
+        if frame is None:
+            return None
+        if self.last_frame_id:
+            self.dropped += frame.frame_id - self.last_frame_id - 1
+        self.last_frame_id = frame.frame_id
+        self.received += 1
+        return frame
+
+    def get_frames(self, timeout=0.0):
+        """Giống camera.get_frames(): trả về (ret, color_image, depth_image)"""
+        frame = self.get_frame(timeout)
+        if frame is None:
+            return False, None, None
+        return True, frame.color, frame.depth
+
+    def release(self):
+        """Bên nhận không sở hữu camera nên không cần giải phóng gì"""
+        pass
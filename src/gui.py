@@ -5,11 +5,14 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 import tkinter as tk
 from tkinter import Label, Button, ttk
 from PIL import Image, ImageTk
-import cv2
 import time
 import serial.tools.list_ports
 from src.camera import RealSenseCamera
-from src.processor import EmotionRecognitionProcessor
+from src.renderer import FrameRenderer
+from src.router import ScreenRouter
+from src.vision_worker import VisionWorker
+from src.landmarks import draw_landmarks
+from src.emotion_smoothing import EmotionSmoother, smooth_emotion, ABNORMAL_TEXT
 from src.arduino_reader import ArduinoReader
 from src.virtual_assistant import VirtualAssistant
 
@@ -32,17 +35,36 @@ class EmotionRecognitionApp:
     TITLE_COLOR = "#3366cc"
     COMPANY_COLOR = "#FF4040"
     ABNORMAL_COLOR = "#FF5722"
+
+    # Dải khoảng cách (mét) của người tập; chỉ tìm khuôn mặt trong vùng này của ảnh độ sâu
+    DEPTH_RANGE_M = (0.3, 2.0)
+    # Bám khuôn mặt giữa các lần phát hiện: chỉ chạy HOG mỗi DETECT_EVERY khung
+    FACE_TRACKING = True
+    DETECT_EVERY = 10
+    # Số khung hình hiển thị mỗi giây, độc lập với nhịp xử lý
+    RENDER_FPS = 15
+    # Phân tích khung hình ở tiến trình riêng (VisionWorker), luồng Tk chỉ hiển thị
+    VISION_WORKER = False
+    # Chỉ chạy lại mô hình cảm xúc khi landmark chuẩn hóa dịch chuyển quá ngưỡng này (hoặc kết quả cũ hơn 1 giây)
+    EMOTION_MOTION_THRESHOLD = 0.02
     
-    def __init__(self, root):
+    def __init__(self, root, context=None):
         """Khởi tạo ứng dụng nhận diện cảm xúc"""
         self.root = root
+        # Bộ điều hướng giữ camera và bộ xử lý dùng chung giữa các màn hình
+        self.context = context if context is not None else ScreenRouter(root)
+        self.context.screen = self
         self.root.title("Nhận Diện Tình Trạng")
         self.root.attributes('-fullscreen', True)
         self.root.configure(bg=self.BG_COLOR)
 
         # Khởi tạo biến thành viên
         self.camera = None
+        self.video_source = None
         self.processor = None
+        self.processor_kwargs = None
+        self.vision_worker = None
+        self.emotion_smoother = EmotionSmoother(motion_threshold=self.EMOTION_MOTION_THRESHOLD)
         self.arduino_reader = None
         self.arduino_connected = False
         
@@ -64,7 +86,7 @@ class EmotionRecognitionApp:
         self._initialize_camera_system()
         
         # Bắt đầu cập nhật video nếu camera và bộ xử lý khả dụng
-        if self.camera and self.processor:
+        if self.camera and (self.processor or self.vision_worker):
             self.update_video()
 
     def _setup_styles(self):
@@ -151,6 +173,10 @@ class EmotionRecognitionApp:
         self.depth_frame = Label(self.depth_container, bg="black")
         self.depth_frame.pack(fill=tk.BOTH, expand=True, padx=2, pady=2)
 
+        # Bộ hiển thị dùng lại bộ đệm và PhotoImage cho từng khung
+        self.video_renderer = FrameRenderer(self.video_frame, fps=self.RENDER_FPS)
+        self.depth_renderer = FrameRenderer(self.depth_frame, fps=self.RENDER_FPS)
+
     def _create_info_frames(self):
         """Tạo các khung hiển thị thông tin"""
         # Frame hiển thị cảm xúc
@@ -320,14 +346,26 @@ class EmotionRecognitionApp:
     def _initialize_camera_system(self):
         """Khởi tạo hệ thống camera và bộ xử lý"""
         try:
-            self.camera = RealSenseCamera()
-            self.processor = EmotionRecognitionProcessor()
+            self.camera = self.context.camera(RealSenseCamera)
+            self.video_source = self.camera.subscribe("preview")
+            self.video_renderer.color_correction = self.camera.color_correction
+            self.processor_kwargs = dict(
+                depth_range=self.DEPTH_RANGE_M, tracking=self.FACE_TRACKING, detect_every=self.DETECT_EVERY,
+                **self.camera.depth_settings())
+            if self.VISION_WORKER:
+                # Tiến trình con làm mượt và bỏ qua suy luận theo cùng quy tắc với _process_emotion
+                self.vision_worker = VisionWorker(
+                    self.processor_kwargs, smoother_kwargs=dict(motion_threshold=self.EMOTION_MOTION_THRESHOLD))
+            else:
+                self.processor = self.context.processor(**self.processor_kwargs)
             self.special_message.config(text="")
         except Exception as e:
             print(f"Lỗi khi khởi tạo camera: {e}")
             self.special_message.config(text="Không tìm thấy camera!", bg=self.ERROR_COLOR, fg=self.LABEL_FG)
             self.camera = None
+            self.video_source = None
             self.processor = None
+            self.vision_worker = None
 
     def populate_com_ports(self):
         """Lấy danh sách các cổng COM và điền vào combobox"""
@@ -445,13 +483,16 @@ class EmotionRecognitionApp:
 
     def update_video(self):
         """Cập nhật hiển thị video và xử lý nhận diện cảm xúc"""
-        if self.camera is None or self.processor is None:
+        if self.camera is None or (self.processor is None and self.vision_worker is None):
             return
 
         try:
-            ret, color_image, depth_image = self.camera.get_frames()
-            if ret:
-                self._process_video_frame(color_image, depth_image)
+            # Không chờ camera trên luồng Tk: chỉ lấy khung mới nếu đã có
+            ret, color_image, depth_image = self.video_source.get_frames()
+            if ret and self.vision_worker is not None:
+                self._process_worker_frame(color_image, depth_image, self.video_source.last_frame_id)
+            elif ret:
+                self._process_video_frame(color_image, depth_image, self.video_source.last_frame_id)
                 
             # Kiểm tra trạng thái từ trợ lý ảo
             if hasattr(self, 'assistant'):
@@ -464,12 +505,13 @@ class EmotionRecognitionApp:
         # Lưu ID của after để có thể hủy nó khi cần
         self._after_id = self.root.after(50, self.update_video)
 
-    def _process_video_frame(self, color_image, depth_image):
+    def _process_video_frame(self, color_image, depth_image, frame_id=None):
         """Xử lý khung hình video và cập nhật hiển thị"""
         current_time = time.time()
         if current_time - self.processor.last_update_time >= 0.05:
-            # Xử lý khung hình và nhận diện khuôn mặt
-            frame_with_landmarks, faces, landmarks = self.processor.process_frame1(color_image)
+            # Phát hiện khuôn mặt và landmark một lần, dùng chung cho vẽ và nhận diện cảm xúc
+            analysis = self.processor.analyze(color_image, depth_image, frame_id)
+            frame_with_landmarks, faces, landmarks = self.processor.process_frame1(color_image, analysis=analysis)
             
             # Kiểm tra khuôn mặt và cập nhật thông báo
             if len(faces) == 0:
@@ -478,113 +520,104 @@ class EmotionRecognitionApp:
                     bg=self.WARNING_COLOR, 
                     fg=self.LABEL_FG
                 )
+                self.emotion_smoother.reset()
             else:
                 self.special_message.config(text="", bg=self.VALUE_BG, fg=self.VALUE_FG)
-                self._process_emotion(color_image)
+                self._process_emotion(color_image, analysis)
                 
             self.processor.last_update_time = current_time
             
             # Cập nhật hiển thị video
             self._update_video_display(frame_with_landmarks, depth_image)
 
-    def _process_emotion(self, color_image):
-        """Xử lý và cập nhật trạng thái cảm xúc"""
-        emotion = self.processor.predict_emotion(color_image)
-        if emotion is not None:
-            emotion_text = self.processor.get_emotion_text(emotion)
-            
-            # Kiểm tra trạng thái cảm xúc
-            if emotion_text == "Bất thường":
-                if self.processor.current_emotion == emotion_text:
-                    emotion_duration = time.time() - self.processor.emotion_start_time
-                    if emotion_duration >= 3:
-                        # Cảm xúc bất thường kéo dài trên 3 giây
-                        self.emotion_value.config(text="Bất thường", fg=self.ABNORMAL_COLOR)
-                        self.rest_value.config(
-                            text="Cần nghỉ ngơi", 
-                            fg=self.ERROR_COLOR, 
-                            font=("Helvetica", 18, "bold")
-                        )
-                    elif emotion_duration < 2:
-                        # Cảm xúc bất thường xuất hiện dưới 2 giây
-                        self.emotion_value.config(text="Bình thường", fg=self.SUCCESS_COLOR)
-                else:
-                    # Cảm xúc bất thường mới xuất hiện, bắt đầu đếm thời gian
-                    self.processor.current_emotion = emotion_text
-                    self.processor.emotion_start_time = time.time()
+    def _process_worker_frame(self, color_image, depth_image, frame_id):
+        """Gửi khung hình cho tiến trình phân tích và vẽ kết quả mới nhất đã nhận"""
+        self.vision_worker.submit(frame_id, color_image, depth_image)
+        result = self.vision_worker.poll()
+        if self.vision_worker.failed:
+            if self._use_local_analysis():
+                self._process_video_frame(color_image, depth_image, frame_id)
+            return
+        if result is not None:
+            if len(result.faces) == 0:
+                self.special_message.config(
+                    text="Không tìm thấy khuôn mặt!", 
+                    bg=self.WARNING_COLOR, 
+                    fg=self.LABEL_FG
+                )
             else:
-                # Cảm xúc bình thường
-                self.processor.current_emotion = None
-                self.processor.emotion_start_time = None
-                self.emotion_value.config(text="Bình thường", fg=self.SUCCESS_COLOR)
-                self.rest_value.config(text="", fg=self.ERROR_COLOR)
+                self.special_message.config(text="", bg=self.VALUE_BG, fg=self.VALUE_FG)
+                # Trạng thái đã được làm mượt trong tiến trình con
+                self._update_emotion_state(result.emotion_state)
+        latest = self.vision_worker.latest
+        if latest is not None:
+            # Landmark của khung đã phân tích gần nhất (trễ một vài khung so với ảnh đang hiển thị)
+            draw_landmarks(color_image, latest.landmarks, (255, 0, 0), 2)
+        self._update_video_display(color_image, depth_image)
+
+    def _use_local_analysis(self):
+        """Tiến trình phân tích hỏng: báo lỗi và chuyển sang phân tích trong tiến trình; trả về False nếu cũng thất bại"""
+        print(f"Tiến trình phân tích lỗi, chuyển sang phân tích trực tiếp: {self.vision_worker.error}")
+        self.vision_worker.close()
+        self.vision_worker = None
+        try:
+            self.processor = self.context.processor(**self.processor_kwargs)
+        except Exception as e:
+            print(f"Lỗi khi khởi tạo bộ xử lý: {e}")
+            self.special_message.config(text="Lỗi bộ xử lý cảm xúc", bg=self.ERROR_COLOR, fg=self.LABEL_FG)
+            return False
+        return True
+
+    def _process_emotion(self, color_image, analysis=None):
+        """Xử lý và cập nhật trạng thái cảm xúc; bỏ qua mô hình khi biểu cảm gần như không đổi"""
+        self._update_emotion_state(smooth_emotion(self.emotion_smoother, self.processor, color_image, analysis))
+
+    def _update_emotion_state(self, state):
+        """Hiển thị trạng thái Bình thường/Bất thường đã làm mượt theo thời gian"""
+        if state == ABNORMAL_TEXT:
+            # Xác suất bất thường (đã làm mượt) duy trì trên 3 giây
+            self.emotion_value.config(text="Bất thường", fg=self.ABNORMAL_COLOR)
+            self.rest_value.config(
+                text="Cần nghỉ ngơi", 
+                fg=self.ERROR_COLOR, 
+                font=("Helvetica", 18, "bold")
+            )
+        elif state is not None:
+            self.emotion_value.config(text="Bình thường", fg=self.SUCCESS_COLOR)
+            self.rest_value.config(text="", fg=self.ERROR_COLOR)
 
     def _update_video_display(self, frame_with_landmarks, depth_image):
         """Cập nhật hiển thị video và depth map"""
         try:
-            # Xử lý và hiển thị video màu
-            cv2image_color = cv2.cvtColor(frame_with_landmarks, cv2.COLOR_BGR2RGBA)
-            img_color = Image.fromarray(cv2image_color)
-            
-            # Tính toán kích thước mới
-            new_width = int(0.47 * self.root.winfo_width() - 10)
-            new_height = int(0.6 * self.root.winfo_height() - 10)
-            
-            # Resize và hiển thị video
-            img_color = img_color.resize((new_width, new_height))
-            imgtk_color = ImageTk.PhotoImage(image=img_color)
-            self.video_frame.imgtk = imgtk_color
-            self.video_frame.configure(image=imgtk_color)
-            
-            # Xử lý và hiển thị depth map
-            depth_colormap = cv2.applyColorMap(
-                cv2.convertScaleAbs(depth_image, alpha=0.03), 
-                cv2.COLORMAP_JET
-            )
-            cv2image_depth = cv2.cvtColor(depth_colormap, cv2.COLOR_BGR2RGBA)
-            img_depth = Image.fromarray(cv2image_depth)
-            
-            # Resize và hiển thị depth map
-            img_depth = img_depth.resize((new_width, new_height))
-            imgtk_depth = ImageTk.PhotoImage(image=img_depth)
-            self.depth_frame.imgtk = imgtk_depth
-            self.depth_frame.configure(image=imgtk_depth)
+            self.video_renderer.render(frame_with_landmarks)
+            self.depth_renderer.render_depth(depth_image)
         except Exception as e:
             print(f"Lỗi khi cập nhật hiển thị video: {e}")
 
+    def stop(self):
+        """Dừng màn hình trước khi chuyển đi; camera và bộ xử lý do bộ điều hướng giữ lại"""
+        # Dừng tiến trình phân tích
+        if self.vision_worker is not None:
+            self.vision_worker.close()
+            self.vision_worker = None
+
+        # Đóng kết nối Arduino
+        if self.arduino_reader:
+            self._close_arduino_connection()
+
     def close_app(self):
         """Đóng ứng dụng và giải phóng tài nguyên"""
         try:
-            # Dừng cập nhật video
-            if hasattr(self, '_after_id'):
-                self.root.after_cancel(self._after_id)
-            
-            # Giải phóng tài nguyên camera
-            if hasattr(self, 'camera') and self.camera:
-                try:
-                    self.camera.release()
-                except Exception as e:
-                    print(f"Lỗi khi giải phóng camera: {e}")
-            
-            # Đóng kết nối Arduino
-            if hasattr(self, 'arduino_reader') and self.arduino_reader:
-                try:
-                    if hasattr(self.arduino_reader, 'serial_connection'):
-                        self.arduino_reader.serial_connection.close()
-                except Exception as e:
-                    print(f"Lỗi khi đóng kết nối Arduino: {e}")
+            # Bộ điều hướng dừng màn hình, hủy các after đang chờ và giải phóng camera
+            self.context.quit()
         except Exception as e:
             print(f"Lỗi khi đóng tài nguyên: {e}")
         finally:
-            # Hủy tất cả các after đang chờ
-            for after_id in self.root.tk.call('after', 'info'):
-                self.root.after_cancel(int(after_id))
-                
             # Đóng cửa sổ và kết thúc chương trình
             self.root.destroy()
             sys.exit(0)
 
 if __name__ == "__main__":
     root = tk.Tk()
-    app = EmotionRecognitionApp(root)
+    ScreenRouter(root).show('emotion')
     root.mainloop()
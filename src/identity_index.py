@@ -0,0 +1,211 @@
+# identity_index.py
+import numpy as np
+
+
+def pairwise_distances(a, b):
+    """Khoảng cách Euclid giữa mọi cặp dòng của a (N, D) và b (M, D), tính theo lô bằng một phép nhân ma trận"""
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    squared = (a * a).sum(axis=1)[:, None] + (b * b).sum(axis=1)[None, :] - 2.0 * (a @ b.T)
+    return np.sqrt(np.maximum(squared, 0.0))
+
+
+def select_exemplars(features, count):
+    """Chỉ số của count mẫu đại diện trải đều (farthest-point), bắt đầu từ mẫu gần tâm nhất"""
+    features = np.asarray(features, dtype=np.float32)
+    if len(features) <= count:
+        return np.arange(len(features))
+    centroid = features.mean(axis=0, keepdims=True)
+    chosen = [int(pairwise_distances(features, centroid)[:, 0].argmin())]
+    nearest = pairwise_distances(features, features[chosen])[:, 0]
+    while len(chosen) < count:
+        index = int(nearest.argmax())
+        if nearest[index] == 0:
+            break  # các mẫu còn lại trùng với mẫu đã chọn
+        chosen.append(index)
+        nearest = np.minimum(nearest, pairwise_distances(features, features[index:index + 1])[:, 0])
+    return np.array(chosen)
+
+
+class IdentityIndex:
+    """Chỉ mục nhận diện tập mở trên vector landmark đã chuẩn hóa.
+
+    Mỗi người dùng có tâm, tối đa exemplars mẫu đại diện và một ngưỡng khoảng cách riêng.
+    Truy vấn tính khoảng cách tới mọi mẫu đại diện trong một phép nhân ma trận; khuôn mặt xa hơn
+    ngưỡng của người gần nhất được trả về là người lạ (None). Thêm/xóa một người dùng là O(1)
+    (xóa bằng cách chuyển người cuối vào ô trống).
+
+    Người dùng có quá ít mẫu khác nhau để hiệu chỉnh (ngưỡng NaN) dùng trung vị ngưỡng của các
+    người dùng khác, hoặc DEFAULT_THRESHOLD nếu không có ai, thay vì chấp nhận mọi khuôn mặt.
+    """
+
+    # Ngưỡng dự phòng (khoảng cách giữa hai vector 136 chiều đã chuẩn hóa), chọn chặt để thà từ chối
+    DEFAULT_THRESHOLD = 0.2
+    # Số khoảng cách tối thiểu để phân vị có ý nghĩa
+    MIN_CALIBRATION_SAMPLES = 2
+
+    def __init__(self, dim=136, exemplars=16, quantile=0.99, margin=1.2):
+        self.dim = dim
+        self.exemplar_count = exemplars
+        self.quantile = quantile
+        self.margin = margin
+        self.labels = []
+        self.slots = {}
+        self.centroids = np.empty((0, dim), dtype=np.float32)
+        self.exemplars = np.empty((0, exemplars, dim), dtype=np.float32)
+        # Mẫu đại diện thiếu (người dùng có ít mẫu) được đánh dấu bằng mặt nạ
+        self.exemplar_mask = np.empty((0, exemplars), dtype=bool)
+        self.thresholds = np.empty((0,), dtype=np.float32)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, label):
+        return label in self.slots
+
+    @classmethod
+    def from_features(cls, X, y, **kwargs):
+        index = cls(dim=np.asarray(X).shape[1], **kwargs)
+        y = np.asarray(y)
+        for label in dict.fromkeys(y.tolist()):
+            index.add_user(label, np.asarray(X)[y == label])
+        return index
+
+    @classmethod
+    def from_store(cls, store, **kwargs):
+        """Dựng chỉ mục từ kho đặc trưng (FeatureStore)"""
+        index = cls(dim=store.dim, **kwargs)
+        for label in store.users():
+            index.add_user(label, store.features(label))
+        return index
+
+    @classmethod
+    def from_arrays(cls, labels, centroids, exemplars, exemplar_mask, thresholds, **kwargs):
+        """Dựng chỉ mục từ các mảng đã lưu (có thể là memmap chỉ đọc, được chép khi cần sửa)"""
+        index = cls(dim=centroids.shape[1], exemplars=exemplars.shape[1], **kwargs)
+        index.labels = list(labels)
+        index.slots = {label: slot for slot, label in enumerate(index.labels)}
+        index.centroids = centroids
+        index.exemplars = exemplars
+        index.exemplar_mask = exemplar_mask
+        index.thresholds = thresholds
+        index.size = len(index.labels)
+        return index
+
+    def arrays(self):
+        """Các mảng của chỉ mục (chỉ phần đang dùng) để lưu ra đĩa"""
+        return {
+            'centroids': self.centroids[:self.size],
+            'exemplars': self.exemplars[:self.size],
+            'exemplar_mask': self.exemplar_mask[:self.size],
+            'thresholds': self.thresholds[:self.size],
+        }
+
+    def _ensure_writable(self):
+        # Mảng nạp bằng memmap chỉ đọc: chép ra bộ nhớ trước lần sửa đầu tiên
+        if not self.centroids.flags.writeable:
+            self.centroids = np.array(self.centroids)
+            self.exemplars = np.array(self.exemplars)
+            self.exemplar_mask = np.array(self.exemplar_mask)
+            self.thresholds = np.array(self.thresholds)
+
+    def _calibrate(self, features, indices):
+        """Ngưỡng = phân vị quantile của khoảng cách từ mỗi mẫu tới mẫu đại diện gần nhất khác nó, nhân margin;
+        NaN nếu không đủ mẫu khác nhau để hiệu chỉnh. indices: chỉ số của các mẫu đại diện trong features"""
+        distances = pairwise_distances(features, features[indices])
+        # Bỏ khoảng cách của mỗi mẫu đại diện tới chính nó theo chỉ số (float32 cho ra khác 0 một chút,
+        # còn mẫu trùng lặp thật sự thì phải được giữ lại)
+        distances[indices, np.arange(len(indices))] = np.inf
+        nearest = distances.min(axis=1)
+        nearest = nearest[np.isfinite(nearest)]
+        if len(nearest) < self.MIN_CALIBRATION_SAMPLES:
+            return np.nan
+        threshold = float(np.quantile(nearest, self.quantile) * self.margin)
+        # Mọi mẫu trùng nhau: không có độ phân tán để hiệu chỉnh
+        return threshold if threshold > 0 else np.nan
+
+    def _grow(self):
+        capacity = max(2 * len(self.centroids), 8)
+        extra = capacity - len(self.centroids)
+        self.centroids = np.concatenate([self.centroids, np.zeros((extra, self.dim), np.float32)])
+        self.exemplars = np.concatenate(
+            [self.exemplars, np.zeros((extra, self.exemplar_count, self.dim), np.float32)])
+        self.exemplar_mask = np.concatenate([self.exemplar_mask, np.zeros((extra, self.exemplar_count), bool)])
+        self.thresholds = np.concatenate([self.thresholds, np.zeros(extra, np.float32)])
+
+    def add_user(self, label, features):
+        """Thêm (hoặc thay) một người dùng từ các vector (N, dim) của họ"""
+        features = np.asarray(features, dtype=np.float32).reshape(-1, self.dim)
+        if len(features) == 0:
+            raise ValueError(f"Người dùng {label} không có vector đặc trưng nào")
+        self._ensure_writable()
+        slot = self.slots.get(label)
+        if slot is None:
+            if self.size == len(self.centroids):
+                self._grow()
+            slot = self.size
+            self.size += 1
+            self.slots[label] = slot
+            self.labels.append(label)
+        indices = select_exemplars(features, self.exemplar_count)
+        exemplars = features[indices]
+        self.centroids[slot] = features.mean(axis=0)
+        self.exemplars[slot] = 0
+        self.exemplars[slot, :len(exemplars)] = exemplars
+        self.exemplar_mask[slot] = False
+        self.exemplar_mask[slot, :len(exemplars)] = True
+        self.thresholds[slot] = self._calibrate(features, indices)
+
+    def remove_user(self, label):
+        slot = self.slots.pop(label, None)
+        if slot is None:
+            return
+        last = self.size - 1
+        self._ensure_writable()
+        if slot != last:
+            # Chuyển người dùng cuối vào ô vừa trống
+            moved = self.labels[last]
+            self.labels[slot] = moved
+            self.slots[moved] = slot
+            self.centroids[slot] = self.centroids[last]
+            self.exemplars[slot] = self.exemplars[last]
+            self.exemplar_mask[slot] = self.exemplar_mask[last]
+            self.thresholds[slot] = self.thresholds[last]
+        self.labels.pop()
+        self.size = last
+
+    def effective_thresholds(self):
+        """Ngưỡng dùng khi truy vấn: ngưỡng chưa hiệu chỉnh được thay bằng ngưỡng dự phòng"""
+        thresholds = np.array(self.thresholds[:self.size], dtype=np.float32)
+        missing = ~np.isfinite(thresholds)
+        if missing.any():
+            calibrated = thresholds[~missing]
+            thresholds[missing] = np.median(calibrated) if len(calibrated) else self.DEFAULT_THRESHOLD
+        return thresholds
+
+    def distances(self, features):
+        """Khoảng cách (N, U) từ mỗi khuôn mặt tới mẫu đại diện gần nhất của từng người dùng"""
+        features = np.asarray(features, dtype=np.float32).reshape(-1, self.dim)
+        count = self.exemplar_count
+        flat = self.exemplars[:self.size].reshape(-1, self.dim)
+        distances = pairwise_distances(features, flat).reshape(len(features), self.size, count)
+        distances[:, ~self.exemplar_mask[:self.size]] = np.inf
+        return distances.min(axis=2)
+
+    def query(self, features):
+        """Nhận diện theo lô: trả về (danh sách nhãn hoặc None cho người lạ, khoảng cách tới người gần nhất)"""
+        features = np.asarray(features, dtype=np.float32).reshape(-1, self.dim)
+        if self.size == 0:
+            return [None] * len(features), np.full(len(features), np.inf, dtype=np.float32)
+        distances = self.distances(features)
+        best = distances.argmin(axis=1)
+        best_distance = distances[np.arange(len(features)), best]
+        known = best_distance <= self.effective_thresholds()[best]
+        labels = [self.labels[slot] if ok else None for slot, ok in zip(best, known)]
+        return labels, best_distance
+
+    def identify(self, features):
+        """Nhận diện một khuôn mặt (136,); None nếu là người lạ"""
+        labels, _ = self.query(np.asarray(features)[None])
+        return labels[0]
@@ -0,0 +1,56 @@
+# landmarks.py
+import numpy as np
+import cv2
+
+# Các vùng của mô hình 68 điểm dlib: (điểm đầu, điểm cuối, đường khép kín)
+FACIAL_REGIONS = {
+    'jaw': (0, 17, False),
+    'right_eyebrow': (17, 22, False),
+    'left_eyebrow': (22, 27, False),
+    'nose_bridge': (27, 31, False),
+    'nose_tip': (31, 36, False),
+    'right_eye': (36, 42, True),
+    'left_eye': (42, 48, True),
+    'outer_lip': (48, 60, True),
+    'inner_lip': (60, 68, True),
+}
+
+_OPEN_REGIONS = [(start, end) for start, end, closed in FACIAL_REGIONS.values() if not closed]
+_CLOSED_REGIONS = [(start, end) for start, end, closed in FACIAL_REGIONS.values() if closed]
+
+
+def shape_to_array(shape, dtype=np.int32):
+    """Đổi dlib.full_object_detection thành mảng (68, 2) một lần duy nhất"""
+    return np.array([(point.x, point.y) for point in shape.parts()], dtype=dtype)
+
+
+def shapes_to_array(shapes, dtype=np.int32):
+    """Đổi danh sách dlib.full_object_detection thành mảng (N, 68, 2)"""
+    if not shapes:
+        return np.empty((0, 68, 2), dtype=dtype)
+    return np.stack([shape_to_array(shape, dtype) for shape in shapes])
+
+
+def normalize_landmarks_batch(points):
+    """Chuẩn hóa hàng loạt (N, 68, 2): trừ tâm và chia cho khoảng cách lớn nhất tới tâm của từng khuôn mặt"""
+    points = np.asarray(points, dtype=np.float64)
+    centered = points - points.mean(axis=1, keepdims=True)
+    max_distance = np.linalg.norm(centered, axis=2).max(axis=1)
+    return centered / max_distance[:, None, None]
+
+
+def landmark_features(points):
+    """Vector đặc trưng (N, 136) dùng cho nhận diện người dùng"""
+    normalized = normalize_landmarks_batch(points)
+    return normalized.reshape(normalized.shape[0], normalized.shape[1] * 2)
+
+
+def draw_landmarks(frame, points, color=(255, 0, 0), thickness=1):
+    """Vẽ landmark của mọi khuôn mặt bằng hai lệnh polylines (đường hở và đường khép kín)"""
+    if len(points) == 0:
+        return frame
+    open_lines = [face[start:end] for face in points for start, end in _OPEN_REGIONS]
+    closed_lines = [face[start:end] for face in points for start, end in _CLOSED_REGIONS]
+    cv2.polylines(frame, open_lines, False, color, thickness, cv2.LINE_AA)
+    cv2.polylines(frame, closed_lines, True, color, thickness, cv2.LINE_AA)
+    return frame
@@ -3,10 +3,14 @@ import time
 import tkinter as tk
 from tkinter import Label, Button, Frame
 from PIL import Image, ImageTk
-import cv2
 from src.camera import RealSenseCameraNew
-from src.processor import EmotionRecognitionProcessor
+from src.renderer import FrameRenderer
 from src.face_recognition import FaceRecognition
+from src.recognition_bundle import bundle_exists
+from src.router import ScreenRouter
+from src.recognition_evidence import RecognitionEvidence, ACCEPT, REJECT
+from src.vision_worker import VisionWorker
+from src.overlay import OverlayRenderer
 
 class FaceRecognitionLoginApp:
     # Các hằng số cho giao diện
@@ -16,9 +20,32 @@ class FaceRecognitionLoginApp:
     TEXT_COLOR = "#333333"
     WARNING_COLOR = "red"
     SUCCESS_COLOR = "green"
+
+    # Chiều rộng tối đa của ảnh dùng để phát hiện khuôn mặt (camera 1280x720)
+    DETECTION_MAX_WIDTH = 640
+    # Dải khoảng cách (mét) để tìm khuôn mặt theo ảnh độ sâu; None để tìm trên toàn khung hình
+    DEPTH_RANGE_M = None
+    # Số khung hình hiển thị mỗi giây, độc lập với nhịp xử lý
+    RENDER_FPS = 15
+    # Phát hiện và nhận diện khuôn mặt ở tiến trình riêng (VisionWorker), luồng Tk chỉ hiển thị
+    VISION_WORKER = False
+    # Đăng nhập theo bằng chứng nhiều khung: cửa sổ EVIDENCE_WINDOW khung có khuôn mặt gần nhất,
+    # chấp nhận khi một người đạt ACCEPT_VOTES phiếu và ACCEPT_RATIO tỷ lệ, từ chối sớm khi REJECT_VOTES khung là người lạ
+    EVIDENCE_WINDOW = 15
+    ACCEPT_VOTES = 5
+    ACCEPT_RATIO = 0.8
+    REJECT_VOTES = 12
+    # Thời gian tối đa (giây) chờ đủ bằng chứng trước khi chuyển sang thu thập dữ liệu
+    LOGIN_TIMEOUT = 10
+    # Thời gian hiện thông báo đăng nhập thành công trước khi chuyển sang màn hình cảm xúc (ms)
+    SUCCESS_DELAY_MS = 300
     
-    def __init__(self, root):
+    def __init__(self, root, context=None):
         self.root = root
+        # Bộ điều hướng giữ camera và bộ xử lý dùng chung giữa các màn hình
+        self.context = context if context is not None else ScreenRouter(root)
+        self.context.screen = self
+        self.vision_worker = None
         self.root.title("Đăng Nhập Hệ Thống")
         self.setup_window()
         self.load_and_setup_logos()
@@ -87,6 +114,7 @@ class FaceRecognitionLoginApp:
         
         self.video_frame = Label(self.video_container, bg="black")
         self.video_frame.pack(fill=tk.BOTH, expand=True, padx=2, pady=2)
+        self.renderer = FrameRenderer(self.video_frame, fps=self.RENDER_FPS)
 
     def create_message_frame(self):
         """Tạo khung thông báo"""
@@ -118,11 +146,23 @@ class FaceRecognitionLoginApp:
     def initialize_camera_system(self):
         """Khởi tạo hệ thống camera và xử lý"""
         try:
-            self.camera = RealSenseCameraNew()
-            self.processor = EmotionRecognitionProcessor()
-            self.face_recognition = FaceRecognition()
+            self.camera = self.context.camera(RealSenseCameraNew)
+            self.preview_source = self.camera.subscribe("preview")
+            self.recognition_source = self.camera.subscribe("recognition")
+            self.renderer.color_correction = self.camera.color_correction
+            self.processor_kwargs = dict(detection_max_width=self.DETECTION_MAX_WIDTH, depth_range=self.DEPTH_RANGE_M,
+                                         **self.camera.depth_settings())
+            self.recognition_kwargs = dict(detection_max_width=self.DETECTION_MAX_WIDTH)
+            if self.VISION_WORKER:
+                self.vision_worker = VisionWorker(self.processor_kwargs, self.recognition_kwargs)
+                self.overlay = OverlayRenderer()
+            else:
+                self.processor = self.context.processor(**self.processor_kwargs)
+                self.face_recognition = FaceRecognition(**self.recognition_kwargs)
             self.start_time = time.time()
             self.recognized_user = None
+            self.evidence = RecognitionEvidence(self.EVIDENCE_WINDOW, self.ACCEPT_VOTES, self.ACCEPT_RATIO,
+                                                self.REJECT_VOTES)
             
             # Kiểm tra mô hình
             if not self.check_models_exist():
@@ -135,6 +175,8 @@ class FaceRecognitionLoginApp:
 
     def check_models_exist(self):
         """Kiểm tra sự tồn tại của các mô hình"""
+        if bundle_exists(FaceRecognition.BUNDLE_DIR):
+            return True
         return os.path.exists('models/knn_model.pkl') and os.path.exists('models/svm_model.pkl')
 
     def display_large_logo(self):
@@ -152,12 +194,13 @@ class FaceRecognitionLoginApp:
         self.start_time = time.time()
         self.message_label.config(text="NHẬN DIỆN KHUÔN MẶT ĐỂ ĐĂNG NHẬP.")
         self.update_camera_preview()
-        self.root.after(8000, self.update_video)
+        # Nhận diện bắt đầu ngay từ khung hình đầu tiên
+        self.update_video()
 
     def update_camera_preview(self):
         """Cập nhật khung hình camera"""
         try:
-            ret, color_image, depth_image = self.camera.get_frames()
+            ret, color_image, depth_image = self.preview_source.get_frames()
             if ret:
                 self.process_and_display_frame(color_image)
             self.root.after(50, self.update_camera_preview)
@@ -166,20 +209,7 @@ class FaceRecognitionLoginApp:
 
     def process_and_display_frame(self, frame):
         """Xử lý và hiển thị khung hình"""
-        cv2image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGBA)
-        img = Image.fromarray(cv2image)
-        
-        video_width = self.video_frame.winfo_width()
-        video_height = self.video_frame.winfo_height()
-        
-        if video_width > 10 and video_height > 10:
-            img = img.resize((video_width, video_height))
-        else:
-            img = img.resize((800, 600))
-            
-        imgtk = ImageTk.PhotoImage(image=img)
-        self.video_frame.imgtk = imgtk
-        self.video_frame.configure(image=imgtk)
+        self.renderer.render(frame)
 
     def update_video(self):
         """Cập nhật video với nhận diện khuôn mặt"""
@@ -187,31 +217,68 @@ class FaceRecognitionLoginApp:
             return
             
         try:
-            ret, color_image, depth_image = self.camera.get_frames()
-            if ret:
-                self.process_face_recognition(color_image)
+            ret, color_image, depth_image = self.recognition_source.get_frames()
+            if ret and self.vision_worker is not None:
+                if self.process_worker_result(color_image, depth_image, self.recognition_source.last_frame_id):
+                    return
+            elif ret:
+                if self.process_face_recognition(color_image, depth_image, self.recognition_source.last_frame_id):
+                    return
             self.root.after(50, self.update_video)
         except Exception as e:
             self.show_warning_message(f"Lỗi xử lý video: {str(e)}")
 
     def check_timeout(self):
         """Kiểm tra thời gian chờ"""
-        if time.time() - self.start_time > 10 and self.recognized_user is None:
+        if time.time() - self.start_time > self.LOGIN_TIMEOUT and self.recognized_user is None:
             self.show_warning_message("Không nhận diện được khuôn mặt. Cần thu thập dữ liệu.")
             self.root.after(1000, self.start_capture)
             return True
         return False
 
-    def process_face_recognition(self, frame):
-        """Xử lý nhận diện khuôn mặt"""
-        frame_with_landmarks, faces, _ = self.processor.process_frame(frame)
-        if faces:
-            user = self.face_recognition.recognize_user(frame)
-            if user:
-                self.recognized_user = user
-                self.show_success_message()
-                return
+    def process_face_recognition(self, frame, depth_image=None, frame_id=None):
+        """Xử lý nhận diện khuôn mặt; trả về True khi đã có quyết định đăng nhập"""
+        # Phát hiện khuôn mặt và landmark một lần, dùng chung cho vẽ và nhận diện người dùng
+        analysis = self.processor.analyze(frame, depth_image, frame_id)
+        frame_with_landmarks, faces, _ = self.processor.process_frame(frame, analysis=analysis)
+        if faces and self.add_evidence(self.face_recognition.recognize_user(frame, analysis)):
+            return True
         self.process_and_display_frame(frame_with_landmarks)
+        return False
+
+    def add_evidence(self, user):
+        """Thêm kết quả nhận diện của một khung vào cửa sổ bằng chứng; trả về True khi đã quyết định"""
+        self.evidence.add(user)
+        decision, label = self.evidence.decision()
+        if decision == ACCEPT:
+            self.recognized_user = label
+            self.show_success_message()
+            return True
+        if decision == REJECT:
+            self.show_warning_message("Không nhận diện được khuôn mặt. Cần thu thập dữ liệu.")
+            self.root.after(1000, self.start_capture)
+            return True
+        return False
+
+    def process_worker_result(self, frame, depth_image, frame_id):
+        """Gửi khung cho tiến trình phân tích; trả về True khi đã có quyết định đăng nhập"""
+        self.vision_worker.submit(frame_id, frame, depth_image)
+        result = self.vision_worker.poll()
+        if self.vision_worker.failed:
+            # Tiến trình phân tích hỏng: chuyển sang phân tích trực tiếp (lỗi khởi tạo được báo ở update_video)
+            print(f"Tiến trình phân tích lỗi, chuyển sang phân tích trực tiếp: {self.vision_worker.error}")
+            self.vision_worker.close()
+            self.vision_worker = None
+            self.processor = self.context.processor(**self.processor_kwargs)
+            self.face_recognition = FaceRecognition(**self.recognition_kwargs)
+            return self.process_face_recognition(frame, depth_image, frame_id)
+        if result is not None and result.faces and self.add_evidence(result.user):
+            return True
+        latest = self.vision_worker.latest
+        if latest is not None and latest.faces:
+            self.overlay.draw(frame, latest.faces, latest.landmarks)
+        self.process_and_display_frame(frame)
+        return False
 
     def show_warning_message(self, message):
         """Hiển thị cảnh báo"""
@@ -220,35 +287,27 @@ class FaceRecognitionLoginApp:
     def show_success_message(self):
         """Hiển thị thông báo thành công"""
         self.success_message_label.config(text="Đăng nhập thành công", fg=self.SUCCESS_COLOR)
-        self.root.after(5000, self.navigate_to_emotion_recognition)
+        self.root.after(self.SUCCESS_DELAY_MS, self.navigate_to_emotion_recognition)
 
     def start_capture(self):
         """Chuyển đến trang thu thập dữ liệu"""
-        self.root.destroy()
-        from data_collection import UserDataCollectionApp
-        data_collection_app = tk.Tk()
-        UserDataCollectionApp(data_collection_app)
-        data_collection_app.mainloop()
+        self.context.show('data_collection')
 
     def navigate_to_emotion_recognition(self):
         """Chuyển đến trang nhận diện cảm xúc"""
-        self.root.destroy()
-        from gui import EmotionRecognitionApp
-        main_app = tk.Tk()
-        EmotionRecognitionApp(main_app)
-        main_app.mainloop()
+        self.context.show('emotion')
 
-    def destroy(self):
-        """Giải phóng tài nguyên"""
-        if hasattr(self, 'camera'):
-            self.camera.release()
+    def stop(self):
+        """Dừng màn hình trước khi chuyển đi; camera và bộ xử lý do bộ điều hướng giữ lại"""
+        if self.vision_worker is not None:
+            self.vision_worker.close()
+            self.vision_worker = None
 
     def exit_full_screen(self, event=None):
         """Thoát chương trình"""
-        self.destroy()
-        self.root.quit()
+        self.context.quit()
 
 if __name__ == "__main__":
     root = tk.Tk()
-    app = FaceRecognitionLoginApp(root)
+    ScreenRouter(root).show('login')
     root.mainloop()
@@ -4,14 +4,17 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 # main.py
 import tkinter as tk
-from src import login
+from src.router import ScreenRouter
 
 # from login import FaceRecognitionLoginApp
 
 def main():
     root = tk.Tk()
-    app = login.FaceRecognitionLoginApp(root)
+    # Một cửa sổ Tk cho mọi màn hình; camera và bộ xử lý được dùng chung khi chuyển màn hình
+    router = ScreenRouter(root)
+    router.show('login')
     root.mainloop()
+    router.release()
 
 if __name__ == '__main__':
     main()
@@ -1,18 +1,42 @@
 # model.py
 
-from tensorflow.keras.models import load_model
 import os
 import cv2
-from keras_facenet import FaceNet
 import numpy as np
-from sklearn.svm import SVC
-from sklearn.preprocessing import LabelEncoder
 import joblib
 
-def load_trained_model(model_path='models/emotion_model.h5'):
+# Bộ chạy mô hình cảm xúc: keras (mặc định), tflite, tflite_int8 (đã lượng tử hóa) hoặc numpy (không cần TensorFlow)
+EMOTION_BACKEND_ENV = 'EMOTION_BACKEND'
+EMOTION_MODEL_PATHS = {
+    'keras': 'models/emotion_model.h5',
+    'tflite': 'models/emotion_model.tflite',
+    'tflite_int8': 'models/emotion_model_int8.tflite',
+    'numpy': 'models/emotion_model_weights.npz',
+}
+
+
+def load_trained_model(model_path=None, backend=None):
+    """Nạp mô hình cảm xúc theo bộ chạy đã chọn; TensorFlow chỉ được import khi dùng keras"""
+    if backend is None:
+        backend = os.environ.get(EMOTION_BACKEND_ENV, 'keras')
+    if backend not in EMOTION_MODEL_PATHS:
+        raise ValueError(f"Bộ chạy mô hình cảm xúc không hợp lệ: {backend}")
+    if model_path is None:
+        model_path = EMOTION_MODEL_PATHS[backend]
+    if backend in ('tflite', 'tflite_int8'):
+        from src.emotion_backends import TFLiteEmotionModel
+        return TFLiteEmotionModel(model_path)
+    if backend == 'numpy':
+        from src.emotion_backends import NumpyEmotionModel
+        return NumpyEmotionModel(model_path)
+    from tensorflow.keras.models import load_model
     return load_model(model_path)
 
 def train_face_recognition_model(user_data_dir):
+    from keras_facenet import FaceNet
+    from sklearn.svm import SVC
+    from sklearn.preprocessing import LabelEncoder
+
     face_recognition_model = FaceNet()
     face_encodings = []
     user_labels = []
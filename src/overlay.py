@@ -0,0 +1,145 @@
+# overlay.py
+import os
+import math
+from collections import OrderedDict
+import numpy as np
+import cv2
+
+# Mức trang trí khuôn mặt: không vẽ, chỉ khung vuông, hoặc khung + trục + lưới
+OVERLAY_ENV = 'OVERLAY_LEVEL'
+OVERLAY_LEVELS = ('none', 'box', 'full')
+
+AXIS_COLOR = (0, 255, 0)
+GRID_COLOR = (200, 200, 200)
+GRID_STEP = 20  # Khoảng cách giữa các đường lưới
+
+
+def draw_axes_and_grid(image, center, square_size, angle, alpha=None):
+    """Vẽ trục OX/OY xoay theo góc khuôn mặt và lưới xám quanh tâm (điểm 30)"""
+    axis_color = AXIS_COLOR if alpha is None else AXIS_COLOR + (alpha,)
+    grid_color = GRID_COLOR if alpha is None else GRID_COLOR + (alpha,)
+    center_x, center_y = center
+
+    # Vẽ trục OX và OY trong hình vuông, với điểm 30 làm tâm
+    length = square_size / 2
+    cos_a = math.cos(math.radians(angle))
+    sin_a = math.sin(math.radians(angle))
+
+    pX1 = (int(center_x + length * cos_a), int(center_y + length * sin_a))
+    pX2 = (int(center_x - length * cos_a), int(center_y - length * sin_a))
+    pY1 = (int(center_x - length * sin_a), int(center_y + length * cos_a))
+    pY2 = (int(center_x + length * sin_a), int(center_y - length * cos_a))
+
+    cv2.line(image, pX1, pX2, axis_color, 2)
+    cv2.line(image, pY1, pY2, axis_color, 2)
+
+    # Vẽ các đường lưới màu xám mờ song song với OX và OY
+    for i in range(1, int(square_size // (2 * GRID_STEP)) + 1):
+        # Đường song song với OX
+        offset = i * GRID_STEP
+        cv2.line(image,
+                 (int(center_x + offset * cos_a), int(center_y + offset * sin_a)),
+                 (int(center_x + offset * cos_a - square_size * sin_a / length),
+                  int(center_y + offset * sin_a + square_size * cos_a / length)),
+                 grid_color, 1)
+
+        cv2.line(image,
+                 (int(center_x - offset * cos_a), int(center_y - offset * sin_a)),
+                 (int(center_x - offset * cos_a - square_size * sin_a / length),
+                  int(center_y - offset * sin_a + square_size * cos_a / length)),
+                 grid_color, 1)
+
+        # Đường song song với OY
+        cv2.line(image,
+                 (int(center_x + offset * sin_a), int(center_y - offset * cos_a)),
+                 (int(center_x + offset * sin_a - square_size * cos_a / length),
+                  int(center_y - offset * cos_a - square_size * sin_a / length)),
+                 grid_color, 1)
+
+        cv2.line(image,
+                 (int(center_x - offset * sin_a), int(center_y + offset * cos_a)),
+                 (int(center_x - offset * sin_a - square_size * cos_a / length),
+                  int(center_y + offset * cos_a - square_size * sin_a / length)),
+                 grid_color, 1)
+    return image
+
+
+class OverlayRenderer:
+    """Vẽ khung, trục và lưới quanh khuôn mặt; phần trục/lưới được vẽ sẵn thành sprite BGRA có lưu đệm LRU"""
+
+    def __init__(self, level=None, cache_size=64, size_step=8, angle_step=2):
+        if level is None:
+            level = os.environ.get(OVERLAY_ENV, 'full')
+        if level not in OVERLAY_LEVELS:
+            raise ValueError(f"Mức trang trí không hợp lệ: {level}")
+        self.level = level
+        self.cache_size = cache_size
+        # Lượng tử hóa kích thước (pixel) và góc (độ) để các khung hình liên tiếp dùng chung sprite
+        self.size_step = size_step
+        self.angle_step = angle_step
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _sprite(self, square_size, angle):
+        """Lấy sprite (BGRA, mặt nạ) cho kích thước và góc đã lượng tử hóa"""
+        key = (square_size, angle)
+        sprite = self.cache.get(key)
+        if sprite is not None:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return sprite
+
+        self.misses += 1
+        # Đoạn lưới ngắn có thể vượt ra ngoài hình vuông vài pixel nên chừa thêm lề
+        side = int(square_size) + 2 * 4 + 1
+        half = side // 2
+        image = np.zeros((side, side, 4), dtype=np.uint8)
+        draw_axes_and_grid(image, (half, half), square_size, angle, alpha=255)
+        mask = image[:, :, 3:] > 0
+        sprite = (np.ascontiguousarray(image[:, :, :3]), mask, half)
+
+        self.cache[key] = sprite
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return sprite
+
+    def _composite(self, frame, sprite, center_x, center_y):
+        """Dán sprite lên khung hình quanh tâm bằng một lệnh chép có mặt nạ, cắt phần tràn biên"""
+        image, mask, half = sprite
+        frame_height, frame_width = frame.shape[:2]
+        x0, y0 = center_x - half, center_y - half
+        fx0, fy0 = max(x0, 0), max(y0, 0)
+        fx1 = min(x0 + image.shape[1], frame_width)
+        fy1 = min(y0 + image.shape[0], frame_height)
+        if fx1 <= fx0 or fy1 <= fy0:
+            return
+        sx0, sy0 = fx0 - x0, fy0 - y0
+        sx1, sy1 = sx0 + (fx1 - fx0), sy0 + (fy1 - fy0)
+        np.copyto(frame[fy0:fy1, fx0:fx1], image[sy0:sy1, sx0:sx1], where=mask[sy0:sy1, sx0:sx1])
+
+    def draw(self, frame, faces, landmarks):
+        """Vẽ trang trí cho mọi khuôn mặt theo mức đã chọn"""
+        if self.level == 'none':
+            return frame
+        for face, points in zip(faces, landmarks):
+            # Tâm là điểm 30 (đầu mũi), góc lấy theo sống mũi (điểm 28 -> 29)
+            center_x, center_y = int(points[30][0]), int(points[30][1])
+            square_size = max(face.width(), face.height()) * 1.5
+            x_min = int(center_x - square_size / 2)
+            x_max = int(center_x + square_size / 2)
+            y_min = int(center_y - square_size / 2)
+            y_max = int(center_y + square_size / 2)
+
+            # Vẽ hình vuông bao quanh khuôn mặt
+            cv2.rectangle(frame, (x_min, y_min), (x_max, y_max), AXIS_COLOR, 2)
+            if self.level != 'full':
+                continue
+
+            dx = int(points[29][0]) - int(points[28][0])
+            dy = int(points[29][1]) - int(points[28][1])
+            angle = math.degrees(math.atan2(dy, dx))
+            size_q = max(round(square_size / self.size_step), 1) * self.size_step
+            angle_q = (round(angle / self.angle_step) * self.angle_step) % 360
+            self._composite(frame, self._sprite(size_q, angle_q), center_x, center_y)
+        return frame
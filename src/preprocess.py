@@ -1,27 +1,32 @@
 import cv2
 import dlib
+from src.face_detection import FaceDetector
 
-detector = dlib.get_frontal_face_detector()
+detector = FaceDetector()
 predictor = dlib.shape_predictor('data/shape_predictor_68_face_landmarks.dat')
 
-def preprocess_image(image):
+def preprocess_face(gray, face):
+    """Cắt khuôn mặt từ ảnh xám và chuẩn hóa thành tensor (1, 48, 48, 1) cho mô hình cảm xúc"""
+    x1 = max(face.left(), 0)
+    y1 = max(face.top(), 0)
+    x2 = face.right()
+    y2 = face.bottom()
+    roi_gray = gray[y1:y2, x1:x2]
+    if roi_gray.size == 0:
+        print("Empty ROI")
+        return None
+    roi_gray = cv2.resize(roi_gray, (48, 48))
+    roi_gray = roi_gray / 255.0
+    roi_gray = roi_gray.reshape(1, 48, 48, 1)
+    return roi_gray
+
+def preprocess_image(image, face_detector=None):
     gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    faces = detector(gray)
+    faces = (face_detector or detector).detect(gray)
     if len(faces) == 0:
         print("No faces detected")
         return None
 
     for face in faces:
-        x1 = face.left()
-        y1 = face.top()
-        x2 = face.right()
-        y2 = face.bottom()
-        roi_gray = gray[y1:y2, x1:x2]
-        if roi_gray.size == 0:
-            print("Empty ROI")
-            return None
-        roi_gray = cv2.resize(roi_gray, (48, 48))
-        roi_gray = roi_gray / 255.0
-        roi_gray = roi_gray.reshape(1, 48, 48, 1)
-        return roi_gray
+        return preprocess_face(gray, face)
     return None
@@ -4,111 +4,107 @@ import dlib
 import numpy as np
 from src.preprocess import preprocess_image
 from src.model import load_trained_model
+from src.face_detection import FaceDetector, DepthGate
+from src.face_tracking import FaceTracker
+from src.analysis import FrameAnalysis
+from src.landmarks import shapes_to_array, draw_landmarks
+from src.overlay import OverlayRenderer
+from src.emotion_inference import EmotionInferenceQueue, predict_batch
 
 class EmotionRecognitionProcessor:
-    def __init__(self):
-        self.model = load_trained_model()
-        self.detector = dlib.get_frontal_face_detector()
-        self.predictor = dlib.shape_predictor('data/shape_predictor_68_face_landmarks.dat')
+    def __init__(self, detection_max_width=None, depth_range=None, tracking=False, detect_every=10,
+                 detector_backend=None, overlay_level=None, batch_window=None, emotion_backend=None,
+                 model=None, predictor=None, depth_scale=None, focal_px=None):
+        # emotion_backend: keras, tflite, tflite_int8, numpy (mặc định theo biến môi trường EMOTION_BACKEND).
+        # model/predictor: dùng lại mô hình đã nạp của bộ xử lý khác (xem ScreenRouter.processor)
+        self.model = model if model is not None else load_trained_model(backend=emotion_backend)
+        # batch_window (giây): gom ảnh mặt qua nhiều khung hình thành một lô, xem submit_emotions()
+        self.inference_queue = EmotionInferenceQueue(self.model, max_delay=batch_window) if batch_window else None
+        # Phát hiện trên ảnh thu nhỏ (nếu rộng hơn detection_max_width), landmark vẫn tính ở ảnh gốc.
+        # depth_range=(gần, xa) tính bằng mét: chỉ tìm khuôn mặt trong vùng người đứng trong dải này.
+        # depth_scale/focal_px lấy từ camera (FrameHub.depth_settings())
+        depth_gate = DepthGate(*depth_range, depth_scale=depth_scale, focal_px=focal_px) if depth_range else None
+        # detector_backend: hog, haar, lbp, dnn (mặc định theo biến môi trường FACE_DETECTOR)
+        self.detector = FaceDetector(max_width=detection_max_width, depth_gate=depth_gate,
+                                     backend=detector_backend)
+        # Chế độ bám: chỉ chạy HOG mỗi detect_every khung, giữa các lần đó bám khuôn mặt
+        self.tracker = FaceTracker(self.detector, detect_every) if tracking else None
+        self.predictor = predictor or dlib.shape_predictor('data/shape_predictor_68_face_landmarks.dat')
+        # overlay_level: none, box, full (mặc định theo biến môi trường OVERLAY_LEVEL)
+        self.overlay = OverlayRenderer(overlay_level)
         self.last_update_time = time.time()
-        self.emotion_start_time = None
-        self.current_emotion = None
+        self.last_analysis = None
 
-    def process_frame1(self, frame):
+    def analyze(self, frame, depth=None, frame_id=None):
+        """Phát hiện khuôn mặt và landmark một lần cho mỗi khung hình (theo frame_id)"""
+        if frame_id is not None and self.last_analysis is not None and self.last_analysis.frame_id == frame_id:
+            return self.last_analysis
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = self.detector(gray)
-        landmarks = []
-        for face in faces:
-            shape = self.predictor(gray, face)
-            landmarks.append(shape)
-            for n in range(0, 68):
-                x = shape.part(n).x
-                y = shape.part(n).y
-                cv2.circle(frame, (x, y), 2, (255, 0, 0), -1)
-        return frame, faces, landmarks    
-
-    def process_frame(self, frame):
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = self.detector(gray)
-        landmarks = []
-        for face in faces:
-            shape = self.predictor(gray, face)
-            landmarks.append(shape)
-
-            # Lấy ba điểm 28, 29, 30
-            p28 = (shape.part(28).x, shape.part(28).y)
-            p29 = (shape.part(29).x, shape.part(29).y)
-            p30 = (shape.part(30).x, shape.part(30).y)
-
-            # Tính góc của trục tung
-            dx = p29[0] - p28[0]
-            dy = p29[1] - p28[1]
-            angle = np.arctan2(dy, dx) * 180.0 / np.pi
-
-            # Xác định hình vuông bao quanh khuôn mặt, to hơn một chút so với khuôn mặt
-            square_size = max(face.width(), face.height()) * 1.5
-            center_x, center_y = p30
-            x_min = int(center_x - square_size / 2)
-            x_max = int(center_x + square_size / 2)
-            y_min = int(center_y - square_size / 2)
-            y_max = int(center_y + square_size / 2)
-
-            # Vẽ hình vuông bao quanh khuôn mặt
-            cv2.rectangle(frame, (x_min, y_min), (x_max, y_max), (0, 255, 0), 2)
-
-            # Vẽ trục OX và OY trong hình vuông, với điểm 30 làm tâm
-            length = square_size / 2
-            cos_a = np.cos(np.radians(angle))
-            sin_a = np.sin(np.radians(angle))
-
-            pX1 = (int(center_x + length * cos_a), int(center_y + length * sin_a))
-            pX2 = (int(center_x - length * cos_a), int(center_y - length * sin_a))
-            pY1 = (int(center_x - length * sin_a), int(center_y + length * cos_a))
-            pY2 = (int(center_x + length * sin_a), int(center_y - length * cos_a))
-
-            cv2.line(frame, pX1, pX2, (0, 255, 0), 2)
-            cv2.line(frame, pY1, pY2, (0, 255, 0), 2)
-
-            # Vẽ các đường lưới màu xám mờ song song với OX và OY
-            step_size = 20  # Khoảng cách giữa các đường lưới
-            for i in range(1, int(square_size // (2 * step_size)) + 1):
-                # Đường song song với OX
-                offset = i * step_size
-                cv2.line(frame, 
-                         (int(center_x + offset * cos_a), int(center_y + offset * sin_a)), 
-                         (int(center_x + offset * cos_a - square_size * sin_a / length), 
-                          int(center_y + offset * sin_a + square_size * cos_a / length)), 
-                         (200, 200, 200), 1)
-
-                cv2.line(frame, 
-                         (int(center_x - offset * cos_a), int(center_y - offset * sin_a)), 
-                         (int(center_x - offset * cos_a - square_size * sin_a / length), 
-                          int(center_y - offset * sin_a + square_size * cos_a / length)), 
-                         (200, 200, 200), 1)
-
-                # Đường song song với OY
-                cv2.line(frame, 
-                         (int(center_x + offset * sin_a), int(center_y - offset * cos_a)), 
-                         (int(center_x + offset * sin_a - square_size * cos_a / length), 
-                          int(center_y - offset * cos_a - square_size * sin_a / length)), 
-                         (200, 200, 200), 1)
-
-                cv2.line(frame, 
-                         (int(center_x - offset * sin_a), int(center_y + offset * cos_a)), 
-                         (int(center_x - offset * sin_a - square_size * cos_a / length), 
-                          int(center_y + offset * cos_a - square_size * sin_a / length)), 
-                         (200, 200, 200), 1)
+        if self.tracker is not None:
+            faces = self.tracker.update(gray, depth)
+            track_ids = self.tracker.track_ids
+        else:
+            faces = self.detector.detect(gray, depth)
+            track_ids = None
+        # Landmark được đổi sang mảng (N, 68, 2) một lần và dùng chung cho mọi bước sau
+        landmarks = shapes_to_array([self.predictor(gray, face) for face in faces])
+        self.last_analysis = FrameAnalysis(frame_id, gray, faces, landmarks, track_ids)
+        return self.last_analysis
+
+    def process_frame1(self, frame, depth=None, analysis=None):
+        if analysis is None:
+            analysis = self.analyze(frame, depth)
+        faces = analysis.faces
+        landmarks = analysis.landmarks
+        draw_landmarks(frame, landmarks, (255, 0, 0), 2)
+        return frame, faces, landmarks
 
+    def process_frame(self, frame, depth=None, analysis=None):
+        if analysis is None:
+            analysis = self.analyze(frame, depth)
+        faces = analysis.faces
+        landmarks = analysis.landmarks
+        # Khung vuông, trục và lưới quanh khuôn mặt (lưới lấy từ sprite vẽ sẵn)
+        self.overlay.draw(frame, faces, landmarks)
         return frame, faces, landmarks
 
-    def predict_emotion(self, image):
-        processed_image = preprocess_image(image)
+    def predict_emotion_probabilities(self, image, analysis=None):
+        """Vector xác suất (7,) của khuôn mặt đầu tiên (None nếu không cắt được mặt)"""
+        # Dùng lại khuôn mặt đã phát hiện nếu có, tránh chạy bộ phát hiện lần thứ hai
+        if analysis is not None:
+            processed_image = analysis.emotion_input(0)
+        else:
+            processed_image = preprocess_image(image, self.detector)
         if processed_image is None:
             return None
-        predictions = self.model.predict(processed_image)
-        emotion = np.argmax(predictions)
+        return predict_batch(self.model, processed_image)[0]
+
+    def predict_emotion(self, image, analysis=None):
+        probabilities = self.predict_emotion_probabilities(image, analysis)
+        if probabilities is None:
+            return None
+        emotion = np.argmax(probabilities)
         return emotion
 
+    def predict_emotions(self, analysis):
+        """Xác suất cảm xúc của mọi khuôn mặt trong khung với một lần gọi mô hình (None nếu không cắt được mặt)"""
+        indices, batch = analysis.emotion_batch()
+        results = [None] * len(analysis.faces)
+        if indices:
+            for index, probs in zip(indices, predict_batch(self.model, batch)):
+                results[index] = probs
+        return results
+
+    def submit_emotions(self, analysis):
+        """Gửi mọi khuôn mặt vào hàng đợi gom lô; trả về danh sách Future (None nếu không cắt được mặt)"""
+        if self.inference_queue is None:
+            raise RuntimeError("Cần khởi tạo EmotionRecognitionProcessor với batch_window để gom lô qua nhiều khung")
+        indices, batch = analysis.emotion_batch()
+        results = [None] * len(analysis.faces)
+        for index, future in zip(indices, self.inference_queue.submit_many(batch)):
+            results[index] = future
+        return results
+
     def get_emotion_text(self, emotion):
         abnormal_emotions = [0, 1, 2, 4, 5]
         normal_emotions = [3, 6]
@@ -0,0 +1,133 @@
+# quantize_model.py
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from src.model import EMOTION_MODEL_PATHS, load_trained_model
+
+# Thứ tự nhãn của fer2013
+EMOTION_LABELS = ('angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral')
+REPORT_PATH = 'models/quantization_report.json'
+
+
+def load_splits():
+    """Chia fer2013 giống train_model: 90% huấn luyện, 10% kiểm định"""
+    from sklearn.model_selection import train_test_split
+    from src.train_model import load_fer2013
+    X, y = load_fer2013()
+    X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.1, random_state=42)
+    return X_train.astype(np.float32), X_val.astype(np.float32), y_val.argmax(axis=1)
+
+
+def representative_dataset(X_train, samples=300, seed=0):
+    """Mẫu ảnh đại diện (lấy ngẫu nhiên từ tập huấn luyện) để hiệu chỉnh dải lượng tử hóa"""
+    indices = np.random.default_rng(seed).choice(len(X_train), min(samples, len(X_train)), replace=False)
+
+    def generator():
+        for index in indices:
+            yield [X_train[index:index + 1]]
+    return generator
+
+
+def quantize_int8(model, X_train, path=EMOTION_MODEL_PATHS['tflite_int8'], samples=300):
+    """Lượng tử hóa toàn bộ (trọng số, kích hoạt, đầu vào/ra) sang int8"""
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset(X_train, samples)
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+    with open(path, 'wb') as f:
+        f.write(converter.convert())
+    return path
+
+
+def evaluate(model, X_val, labels, batch_size=32):
+    """Độ chính xác tổng và theo từng lớp cảm xúc"""
+    predictions = np.concatenate([np.asarray(model.predict_on_batch(X_val[i:i + batch_size])).argmax(axis=1)
+                                  for i in range(0, len(X_val), batch_size)])
+    per_class = {}
+    for index, name in enumerate(EMOTION_LABELS):
+        mask = labels == index
+        per_class[name] = float((predictions[mask] == index).mean()) if mask.any() else None
+    return predictions, float((predictions == labels).mean()), per_class
+
+
+def measure_latency(model, X_val, batch_size, repeats=100):
+    """Độ trễ CPU (ms) cho một lần gọi mô hình với lô batch_size; bỏ qua vài lần chạy khởi động"""
+    batch = X_val[:batch_size]
+    for _ in range(5):
+        model.predict_on_batch(batch)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict_on_batch(batch)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings = np.array(timings)
+    return {'mean_ms': float(timings.mean()), 'p95_ms': float(np.percentile(timings, 95))}
+
+
+def build_report(backends, X_val, labels, repeats=100, paths=None):
+    """paths: đường dẫn mô hình theo bộ chạy, thay cho EMOTION_MODEL_PATHS (ví dụ {'keras': args.model})"""
+    report = {'validation_samples': int(len(X_val)), 'models': {}}
+    reference = None
+    for backend in backends:
+        path = (paths or {}).get(backend, EMOTION_MODEL_PATHS[backend])
+        if not os.path.exists(path):
+            print(f"Bỏ qua {backend}: không có {path}")
+            continue
+        model = load_trained_model(path, backend=backend)
+        predictions, accuracy, per_class = evaluate(model, X_val, labels)
+        if reference is None:
+            reference = predictions
+        report['models'][backend] = {
+            'path': path,
+            'size_bytes': os.path.getsize(path),
+            'accuracy': accuracy,
+            'per_class_accuracy': per_class,
+            # Tỷ lệ dự đoán trùng với mô hình float (mô hình đầu tiên trong danh sách)
+            'agreement_with_float': float((predictions == reference).mean()),
+            'latency_batch_1': measure_latency(model, X_val, 1, repeats),
+            'latency_batch_32': measure_latency(model, X_val, 32, max(repeats // 5, 1)),
+        }
+    return report
+
+
+def print_report(report):
+    models = report['models']
+    print(f"{'':>10}" + ''.join(f"{name:>14}" for name in models))
+    print(f"{'size KB':>10}" + ''.join(f"{m['size_bytes'] / 1024:>14.1f}" for m in models.values()))
+    print(f"{'accuracy':>10}" + ''.join(f"{m['accuracy']:>14.3f}" for m in models.values()))
+    for name in EMOTION_LABELS:
+        values = [m['per_class_accuracy'][name] for m in models.values()]
+        print(f"{name:>10}" + ''.join(f"{v:>14.3f}" if v is not None else f"{'-':>14}" for v in values))
+    print(f"{'ms/ảnh':>10}" + ''.join(f"{m['latency_batch_1']['mean_ms']:>14.2f}" for m in models.values()))
+    print(f"{'ms/lô 32':>10}" + ''.join(f"{m['latency_batch_32']['mean_ms']:>14.2f}" for m in models.values()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lượng tử hóa int8 mô hình cảm xúc và so sánh với mô hình float")
+    parser.add_argument('--model', default=EMOTION_MODEL_PATHS['keras'])
+    parser.add_argument('--samples', type=int, default=300, help="Số ảnh đại diện dùng để hiệu chỉnh")
+    parser.add_argument('--repeats', type=int, default=100)
+    parser.add_argument('--report-only', action='store_true', help="Không lượng tử hóa lại, chỉ đo các mô hình có sẵn")
+    args = parser.parse_args(argv)
+
+    X_train, X_val, labels = load_splits()
+    if not args.report_only:
+        model = load_trained_model(args.model, backend='keras')
+        print(f"Đã xuất {quantize_int8(model, X_train, samples=args.samples)}")
+    report = build_report(['keras', 'tflite', 'tflite_int8'], X_val, labels, args.repeats,
+                          paths={'keras': args.model})
+    with open(REPORT_PATH, 'w') as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f"Đã ghi báo cáo vào {REPORT_PATH}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
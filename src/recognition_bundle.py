@@ -0,0 +1,115 @@
+# recognition_bundle.py
+import os
+import json
+import time
+import glob
+import uuid
+import numpy as np
+from src.identity_index import IdentityIndex
+
+# Gói mô hình nhận diện: các mảng .npy (nạp bằng memmap) và manifest.json mô tả phiên bản, nhãn, tham số
+BUNDLE_DIR = 'models/recognition'
+BUNDLE_SCHEMA = 'recognition-bundle'
+BUNDLE_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+BUNDLE_ARRAYS = ('features', 'labels', 'centroids', 'exemplars', 'exemplar_mask', 'thresholds')
+# Mảng không thuộc manifest nào (lần ghi bị dừng giữa chừng) được xóa khi đã cũ hơn chừng này giây;
+# mảng mới hơn có thể là của một lần ghi khác chưa kịp thay manifest
+ORPHAN_AGE = 3600
+
+
+class BundleError(ValueError):
+    """Gói mô hình không tồn tại, hỏng hoặc khác phiên bản"""
+
+
+def bundle_exists(directory=BUNDLE_DIR):
+    return os.path.exists(os.path.join(directory, MANIFEST_FILE))
+
+
+def save_bundle(index, X, y, directory=BUNDLE_DIR):
+    """Ghi gói mô hình một cách nguyên tử.
+
+    Các mảng của lần ghi mới mang hậu tố thế hệ riêng; manifest.json được thay bằng os.replace sau cùng
+    nên bên đọc chỉ thấy gói cũ hoặc gói mới đầy đủ. Sau khi ghi xong chỉ xóa mảng của manifest trước
+    đó (và mảng mồ côi đã cũ), không đụng tới mảng của lần ghi khác đang chạy song song.
+    """
+    os.makedirs(directory, exist_ok=True)
+    # Duy nhất kể cả khi hai tiến trình (đăng ký hàng loạt, thu thập dữ liệu) ghi trong cùng một mili giây
+    generation = f"{time.time_ns()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    label_table = list(index.labels)
+    codes = {label: code for code, label in enumerate(label_table)}
+    arrays = dict(index.arrays())
+    arrays['features'] = np.asarray(X, dtype=np.float32)
+    arrays['labels'] = np.array([codes[label] for label in y], dtype=np.int32)
+    files = {}
+    for name in BUNDLE_ARRAYS:
+        filename = f"{name}.{generation}.npy"
+        np.save(os.path.join(directory, filename), np.ascontiguousarray(arrays[name]))
+        files[name] = filename
+
+    manifest = {
+        'schema': BUNDLE_SCHEMA,
+        'version': BUNDLE_VERSION,
+        'generation': generation,
+        'dim': int(index.dim),
+        'samples': int(len(arrays['features'])),
+        'labels': label_table,
+        'index': {'exemplars': index.exemplar_count, 'quantile': index.quantile, 'margin': index.margin},
+        'files': files,
+    }
+    try:
+        previous = set(read_manifest(directory)['files'].values())
+    except (BundleError, OSError, ValueError, KeyError):
+        previous = set()
+    tmp_path = os.path.join(directory, f"{MANIFEST_FILE}.{generation}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, os.path.join(directory, MANIFEST_FILE))
+
+    current = set(files.values())
+    now = time.time()
+    for path in glob.glob(os.path.join(directory, '*.npy')):
+        name = os.path.basename(path)
+        if name in current:
+            continue
+        try:
+            if name in previous or now - os.path.getmtime(path) > ORPHAN_AGE:
+                os.remove(path)
+        except OSError:
+            # File còn đang được memmap ở nơi khác (Windows); sẽ được xóa ở lần ghi sau
+            pass
+    return manifest
+
+
+def read_manifest(directory=BUNDLE_DIR):
+    path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(path):
+        raise BundleError(f"Không tìm thấy gói mô hình tại {directory}")
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('schema') != BUNDLE_SCHEMA:
+        raise BundleError(f"Không phải gói mô hình nhận diện: {path}")
+    if manifest.get('version') != BUNDLE_VERSION:
+        raise BundleError(f"Gói mô hình phiên bản {manifest.get('version')}, cần phiên bản {BUNDLE_VERSION}")
+    return manifest
+
+
+def load_arrays(directory=BUNDLE_DIR, manifest=None):
+    """Nạp các mảng của gói bằng memmap (chỉ đọc, không chép dữ liệu)"""
+    manifest = manifest or read_manifest(directory)
+    arrays = {name: np.load(os.path.join(directory, manifest['files'][name]), mmap_mode='r')
+              for name in BUNDLE_ARRAYS}
+    if arrays['features'].shape != (manifest['samples'], manifest['dim']):
+        raise BundleError(f"Kích thước ma trận đặc trưng {arrays['features'].shape} không khớp manifest")
+    if len(arrays['centroids']) != len(manifest['labels']):
+        raise BundleError("Số người dùng trong chỉ mục không khớp bảng nhãn")
+    return arrays
+
+
+def load_bundle(directory=BUNDLE_DIR):
+    """Nạp chỉ mục nhận diện từ gói mô hình"""
+    manifest = read_manifest(directory)
+    arrays = load_arrays(directory, manifest)
+    return IdentityIndex.from_arrays(manifest['labels'], arrays['centroids'], arrays['exemplars'],
+                                     arrays['exemplar_mask'], arrays['thresholds'],
+                                     quantile=manifest['index']['quantile'], margin=manifest['index']['margin'])
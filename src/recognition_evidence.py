@@ -0,0 +1,42 @@
+# recognition_evidence.py
+from collections import Counter, deque
+
+ACCEPT = 'accept'
+REJECT = 'reject'
+
+
+class RecognitionEvidence:
+    """Gom kết quả nhận diện của các khung gần nhất (cửa sổ trượt) để quyết định đăng nhập.
+
+    Chấp nhận ngay khi một người dùng có ít nhất accept_votes phiếu và chiếm accept_ratio số khung
+    trong cửa sổ; từ chối sớm khi có ít nhất reject_votes khung là người lạ và chiếm reject_ratio.
+    """
+
+    def __init__(self, window=15, accept_votes=5, accept_ratio=0.8, reject_votes=12, reject_ratio=0.8):
+        self.window = deque(maxlen=window)
+        self.accept_votes = accept_votes
+        self.accept_ratio = accept_ratio
+        self.reject_votes = reject_votes
+        self.reject_ratio = reject_ratio
+
+    def reset(self):
+        self.window.clear()
+
+    def add(self, label):
+        """Thêm kết quả của một khung có khuôn mặt (label là None nếu không nhận ra)"""
+        self.window.append(label)
+
+    def decision(self):
+        """Trả về (ACCEPT, nhãn), (REJECT, None) hoặc (None, None) khi chưa đủ bằng chứng"""
+        if not self.window:
+            return None, None
+        counts = Counter(self.window)
+        total = len(self.window)
+        unknown = counts.pop(None, 0)
+        if counts:
+            label, votes = counts.most_common(1)[0]
+            if votes >= self.accept_votes and votes / total >= self.accept_ratio:
+                return ACCEPT, label
+        if unknown >= self.reject_votes and unknown / total >= self.reject_ratio:
+            return REJECT, None
+        return None, None
@@ -0,0 +1,274 @@
+# recording.py
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+import numpy as np
+import cv2
+
+MANIFEST_NAME = 'manifest.json'
+FORMAT_VERSION = 1
+REPLAY_MODES = ('realtime', 'fixed', 'fast')
+
+
+def _pack(buffers):
+    """Ghép danh sách bytes đã mã hóa thành một mảng liên tục kèm kích thước từng phần tử"""
+    sizes = np.array([len(b) for b in buffers], dtype=np.int64)
+    data = np.frombuffer(b''.join(buffers), dtype=np.uint8)
+    return sizes, data
+
+
+def _unpack(sizes, data):
+    """Tách mảng liên tục thành các đoạn bytes theo kích thước"""
+    offsets = np.concatenate(([0], np.cumsum(sizes)))
+    return [data[offsets[i]:offsets[i + 1]] for i in range(len(sizes))]
+
+
+class FrameRecorder:
+    """Ghi khung hình màu + độ sâu kèm thời điểm vào thư mục gồm các khối .npz"""
+
+    def __init__(self, path, chunk_size=60, color_format='.png', jpeg_quality=95, queue_size=90,
+                 depth_scale=None, focal_px=None):
+        if color_format not in ('.png', '.jpg'):
+            raise ValueError(f"Định dạng ảnh màu không hỗ trợ: {color_format}")
+        self.path = path
+        self.chunk_size = chunk_size
+        self.color_format = color_format
+        if color_format == '.jpg':
+            self.color_params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]
+        else:
+            self.color_params = [cv2.IMWRITE_PNG_COMPRESSION, 1]
+        # Ảnh độ sâu 16 bit luôn lưu PNG để không mất dữ liệu
+        self.depth_params = [cv2.IMWRITE_PNG_COMPRESSION, 1]
+
+        os.makedirs(path, exist_ok=True)
+        self.manifest = {
+            'version': FORMAT_VERSION,
+            'color_format': color_format,
+            'chunk_size': chunk_size,
+            'frames': 0,
+            'width': None,
+            'height': None,
+            # Thông số camera để DepthGate đọc đúng bản ghi khi phát lại
+            'depth_scale': depth_scale,
+            'focal_px': focal_px,
+            'chunks': [],
+        }
+        self._pending = []
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def write(self, color_image, depth_image, timestamp=None):
+        """Đưa khung hình vào hàng đợi ghi; bỏ khung nếu luồng ghi không theo kịp"""
+        if timestamp is None:
+            timestamp = time.time()
+        try:
+            self._queue.put_nowait((timestamp, color_image.copy(), depth_image.copy()))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _write_loop(self):
+        """Luồng ghi: mã hóa khung hình và ghi từng khối xuống đĩa"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            timestamp, color_image, depth_image = item
+            ok_color, color_buf = cv2.imencode(self.color_format, color_image, self.color_params)
+            ok_depth, depth_buf = cv2.imencode('.png', depth_image, self.depth_params)
+            if not ok_color or not ok_depth:
+                print("Lỗi khi mã hóa khung hình, bỏ qua")
+                continue
+            if self.manifest['width'] is None:
+                self.manifest['height'], self.manifest['width'] = color_image.shape[:2]
+            self._pending.append((timestamp, color_buf.tobytes(), depth_buf.tobytes()))
+            if len(self._pending) >= self.chunk_size:
+                self._flush_chunk()
+        self._flush_chunk()
+
+    def _flush_chunk(self):
+        """Ghi các khung hình đang chờ thành một khối"""
+        if not self._pending:
+            return
+        index = len(self.manifest['chunks'])
+        file_name = f'chunk_{index:05d}.npz'
+        timestamps = np.array([p[0] for p in self._pending], dtype=np.float64)
+        color_sizes, color_data = _pack([p[1] for p in self._pending])
+        depth_sizes, depth_data = _pack([p[2] for p in self._pending])
+        np.savez(os.path.join(self.path, file_name),
+                 timestamps=timestamps,
+                 color_sizes=color_sizes, color_data=color_data,
+                 depth_sizes=depth_sizes, depth_data=depth_data)
+
+        self.manifest['chunks'].append({
+            'file': file_name,
+            'frames': len(self._pending),
+            'first_timestamp': float(timestamps[0]),
+            'last_timestamp': float(timestamps[-1]),
+        })
+        self.manifest['frames'] += len(self._pending)
+        self._pending = []
+        self._write_manifest()
+
+    def _write_manifest(self):
+        """Ghi manifest qua file tạm để luôn đọc được bản ghi dở dang"""
+        tmp_path = os.path.join(self.path, MANIFEST_NAME + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.path, MANIFEST_NAME))
+
+    def close(self):
+        """Ghi nốt dữ liệu còn lại và đóng bản ghi"""
+        self._queue.put(None)
+        self._thread.join()
+
+
+class ReplayCamera:
+    """Phát lại bản ghi của FrameRecorder với cùng giao diện get_frames()/release() như RealSenseCamera"""
+
+    def __init__(self, path, mode='realtime', fps=30, loop=False):
+        if mode not in REPLAY_MODES:
+            raise ValueError(f"Chế độ phát lại không hợp lệ: {mode}")
+        manifest_path = os.path.join(path, MANIFEST_NAME)
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"Không tìm thấy bản ghi tại {path}")
+        with open(manifest_path, 'r') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Phiên bản bản ghi không hỗ trợ: {self.manifest.get('version')}")
+        if not self.manifest['chunks']:
+            raise ValueError(f"Bản ghi rỗng: {path}")
+
+        self.path = path
+        self.depth_scale = self.manifest.get('depth_scale')
+        self.focal_px = self.manifest.get('focal_px')
+        self.mode = mode
+        self.frame_interval = 1.0 / fps
+        self.loop = loop
+        self.finished = False
+        self._rewind()
+
+    def _rewind(self):
+        """Quay về khung hình đầu tiên"""
+        self._chunk_index = -1
+        self._frame_index = 0
+        self._chunk = None
+        self._start_wall = None
+        self._start_timestamp = None
+        self._last_wall = None
+
+    def _load_chunk(self, index):
+        """Nạp một khối vào bộ nhớ (chỉ giữ một khối tại một thời điểm)"""
+        info = self.manifest['chunks'][index]
+        with np.load(os.path.join(self.path, info['file'])) as data:
+            self._chunk = {
+                'timestamps': data['timestamps'],
+                'color': _unpack(data['color_sizes'], data['color_data']),
+                'depth': _unpack(data['depth_sizes'], data['depth_data']),
+            }
+        self._chunk_index = index
+        self._frame_index = 0
+
+    def _next_encoded(self):
+        """Trả về (timestamp, color_buf, depth_buf) kế tiếp hoặc None khi hết bản ghi"""
+        if self._chunk is None or self._frame_index >= len(self._chunk['timestamps']):
+            next_index = self._chunk_index + 1
+            if next_index >= len(self.manifest['chunks']):
+                if not self.loop:
+                    return None
+                self._rewind()
+                next_index = 0
+            self._load_chunk(next_index)
+        i = self._frame_index
+        self._frame_index += 1
+        return self._chunk['timestamps'][i], self._chunk['color'][i], self._chunk['depth'][i]
+
+    def _wait_until_due(self, timestamp):
+        """Giữ nhịp phát theo chế độ đã chọn"""
+        now = time.time()
+        if self.mode == 'realtime':
+            if self._start_wall is None:
+                self._start_wall, self._start_timestamp = now, timestamp
+            delay = (timestamp - self._start_timestamp) - (now - self._start_wall)
+        elif self.mode == 'fixed':
+            delay = 0 if self._last_wall is None else self._last_wall + self.frame_interval - now
+        else:
+            delay = 0
+        if delay > 0:
+            time.sleep(delay)
+        self._last_wall = time.time()
+
+    def get_frames(self):
+        item = self._next_encoded()
+        if item is None:
+            # Hết bản ghi: tránh vòng lặp bận ở phía gọi
+            self.finished = True
+            time.sleep(self.frame_interval)
+            return False, None, None
+        timestamp, color_buf, depth_buf = item
+        self._wait_until_due(timestamp)
+        color_image = cv2.imdecode(color_buf, cv2.IMREAD_COLOR)
+        depth_image = cv2.imdecode(depth_buf, cv2.IMREAD_UNCHANGED)
+        if color_image is None or depth_image is None:
+            return False, None, None
+        return True, color_image, depth_image
+
+    def release(self):
+        self._chunk = None
+
+
+def record(path, seconds, color_format='.png', high_resolution=True):
+    """Ghi trực tiếp từ camera RealSense trong một khoảng thời gian"""
+    from src.camera import RealSenseCamera, RealSenseCameraNew
+
+    camera = RealSenseCameraNew() if high_resolution else RealSenseCamera()
+    recorder = FrameRecorder(path, color_format=color_format, depth_scale=camera.depth_scale,
+                             focal_px=camera.focal_px)
+    frame_count = 0
+    start_time = time.time()
+    try:
+        while time.time() - start_time < seconds:
+            ret, color_image, depth_image = camera.get_frames()
+            if ret and recorder.write(color_image, depth_image):
+                frame_count += 1
+    finally:
+        camera.release()
+        recorder.close()
+    print(f"Đã ghi {frame_count} khung hình vào {path} (bỏ {recorder.dropped} khung)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ghi và kiểm tra bản ghi khung hình RealSense")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help="Ghi khung hình từ camera")
+    record_parser.add_argument('path')
+    record_parser.add_argument('--seconds', type=float, default=10)
+    record_parser.add_argument('--jpeg', action='store_true', help="Lưu ảnh màu dạng JPEG (nhỏ hơn, có mất mát)")
+    record_parser.add_argument('--low-res', action='store_true', help="Ghi ở 640x480 thay vì 1280x720")
+
+    info_parser = subparsers.add_parser('info', help="In thông tin bản ghi")
+    info_parser.add_argument('path')
+
+    args = parser.parse_args(argv)
+    if args.command == 'record':
+        record(args.path, args.seconds, '.jpg' if args.jpeg else '.png', not args.low_res)
+    else:
+        with open(os.path.join(args.path, MANIFEST_NAME), 'r') as f:
+            manifest = json.load(f)
+        chunks = manifest['chunks']
+        duration = chunks[-1]['last_timestamp'] - chunks[0]['first_timestamp'] if chunks else 0
+        print(f"{manifest['frames']} khung hình, {manifest['width']}x{manifest['height']}, "
+              f"{len(chunks)} khối, {duration:.1f} giây, ảnh màu {manifest['color_format']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+# renderer.py
+import time
+import numpy as np
+import cv2
+from PIL import Image, ImageTk
+
+
+class FrameRenderer:
+    """Hiển thị khung hình BGR lên một Label Tk, dùng lại bộ đệm và một PhotoImage duy nhất"""
+
+    def __init__(self, label, fps=20, keep_aspect=True, size=None, default_size=(800, 600),
+                 color_correction=None):
+        self.label = label
+        # Nhịp hiển thị độc lập với nhịp xử lý; fps=None để hiển thị mọi khung
+        self.min_interval = 1.0 / fps if fps else 0.0
+        self.keep_aspect = keep_aspect
+        # Kích thước cố định (rộng, cao); None để theo kích thước hiện tại của Label
+        self.size = size
+        self.default_size = default_size
+        self.color_correction = color_correction
+        self.last_render = 0.0
+        self._layout = None
+        self.photo = None
+
+    def due(self):
+        """Đã đến lúc hiển thị khung tiếp theo chưa"""
+        return time.time() - self.last_render >= self.min_interval
+
+    def panel_size(self):
+        """Kích thước vùng hiển thị (rộng, cao)"""
+        if self.size:
+            return self.size
+        width = self.label.winfo_width()
+        height = self.label.winfo_height()
+        if width > 10 and height > 10:
+            return width, height
+        return self.default_size
+
+    def _prepare(self, frame_shape):
+        """Cấp phát lại bộ đệm và PhotoImage chỉ khi kích thước khung hoặc vùng hiển thị thay đổi"""
+        frame_height, frame_width = frame_shape[:2]
+        panel_width, panel_height = self.panel_size()
+        layout = (frame_width, frame_height, panel_width, panel_height)
+        if layout == self._layout:
+            return
+
+        if self.keep_aspect:
+            ratio = min(panel_width / frame_width, panel_height / frame_height)
+            content_width = max(int(frame_width * ratio), 1)
+            content_height = max(int(frame_height * ratio), 1)
+        else:
+            ratio = panel_width / frame_width
+            content_width, content_height = panel_width, panel_height
+        self.interpolation = cv2.INTER_AREA if ratio < 1 else cv2.INTER_LINEAR
+
+        self.resized = np.empty((content_height, content_width, 3), dtype=np.uint8)
+        self.depth_resized = np.empty((content_height, content_width), dtype=np.uint16)
+        self.depth_scaled = np.empty((content_height, content_width), dtype=np.uint8)
+        # Bộ đệm RGBA: Pillow chỉ ánh xạ (không chép) bộ đệm RGBA/RGBX, còn RGB thì bị chép một lần
+        # khi tạo ảnh nên các khung sau sẽ không hiện lên
+        self.rgb = np.empty((content_height, content_width, 4), dtype=np.uint8)
+        if (content_width, content_height) == (panel_width, panel_height):
+            self.canvas = self.rgb
+            self.view = None
+        else:
+            # Khung hình được đặt giữa vùng hiển thị, phần viền giữ màu đen (không trong suốt)
+            self.canvas = np.zeros((panel_height, panel_width, 4), dtype=np.uint8)
+            self.canvas[..., 3] = 255
+            x = (panel_width - content_width) // 2
+            y = (panel_height - content_height) // 2
+            self.view = self.canvas[y:y + content_height, x:x + content_width]
+        self.image = Image.frombuffer('RGBA', (panel_width, panel_height), self.canvas, 'raw', 'RGBA', 0, 1)
+
+        self.photo = ImageTk.PhotoImage('RGBA', (panel_width, panel_height))
+        self.label.imgtk = self.photo
+        self.label.configure(image=self.photo)
+        self._layout = layout
+
+    def _present(self):
+        """Chuyển bộ đệm BGR đã thu nhỏ sang RGBA và dán vào PhotoImage hiện có"""
+        cv2.cvtColor(self.resized, cv2.COLOR_BGR2RGBA, dst=self.rgb)
+        if self.view is not None:
+            np.copyto(self.view, self.rgb)
+        self.photo.paste(self.image)
+        self.last_render = time.time()
+
+    def render(self, frame, force=False):
+        """Hiển thị ảnh màu BGR; trả về False nếu chưa đến lượt hiển thị"""
+        if not force and not self.due():
+            return False
+        self._prepare(frame.shape)
+        cv2.resize(frame, (self.resized.shape[1], self.resized.shape[0]),
+                   dst=self.resized, interpolation=self.interpolation)
+        if self.color_correction:
+            # Hiệu chỉnh trên ảnh đã thu nhỏ nên rẻ hơn so với trên khung hình gốc
+            self.color_correction.for_display(self.resized)
+        self._present()
+        return True
+
+    def render_depth(self, depth_image, alpha=0.03, force=False):
+        """Hiển thị ảnh độ sâu 16 bit dưới dạng bản đồ màu"""
+        if not force and not self.due():
+            return False
+        self._prepare(depth_image.shape)
+        # Thu nhỏ trước rồi mới tô màu để chỉ xử lý số điểm ảnh hiển thị
+        cv2.resize(depth_image, (self.resized.shape[1], self.resized.shape[0]),
+                   dst=self.depth_resized, interpolation=cv2.INTER_NEAREST)
+        cv2.convertScaleAbs(self.depth_resized, dst=self.depth_scaled, alpha=alpha)
+        cv2.applyColorMap(self.depth_scaled, cv2.COLORMAP_JET, dst=self.resized)
+        self._present()
+        return True
@@ -0,0 +1,92 @@
+# router.py
+import importlib
+import tkinter as tk
+from src.camera import create_camera
+from src.frame_hub import FrameHub
+
+# Tên màn hình -> (mô-đun, lớp); import khi cần để tránh vòng import giữa các màn hình
+SCREENS = {
+    'login': ('src.login', 'FaceRecognitionLoginApp'),
+    'data_collection': ('src.data_collection', 'UserDataCollectionApp'),
+    'emotion': ('src.gui', 'EmotionRecognitionApp'),
+}
+
+
+class ScreenRouter:
+    """Chuyển màn hình trong một cửa sổ Tk duy nhất, dùng chung camera và bộ xử lý giữa các màn hình.
+
+    Camera chỉ được mở lại khi màn hình mới cần cấu hình luồng khác (ví dụ 1280x720 -> 640x480).
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.screen = None
+        self.hub = None
+        self.camera_class = None
+        self.processors = {}
+
+    def show(self, name):
+        """Dừng màn hình hiện tại, xóa giao diện của nó và dựng màn hình mới trên cùng cửa sổ"""
+        self._stop_screen()
+        module_name, class_name = SCREENS[name]
+        screen_class = getattr(importlib.import_module(module_name), class_name)
+        self.screen = screen_class(self.root, self)
+        return self.screen
+
+    def _stop_screen(self):
+        if self.screen is not None:
+            try:
+                self.screen.stop()
+            except Exception as e:
+                print(f"Lỗi khi dừng màn hình: {e}")
+            self.screen = None
+        # Hủy mọi after còn chờ của màn hình cũ rồi xóa các widget của nó
+        try:
+            for after_id in self.root.tk.call('after', 'info'):
+                self.root.after_cancel(after_id)
+            for child in self.root.winfo_children():
+                child.destroy()
+        except tk.TclError:
+            # Cửa sổ đã bị đóng (ví dụ bằng nút đóng của hệ điều hành)
+            pass
+
+    def camera(self, camera_class):
+        """FrameHub của camera với cấu hình camera_class; chỉ mở lại thiết bị khi cấu hình thay đổi"""
+        if self.hub is not None and self.camera_class is camera_class:
+            return self.hub
+        if self.hub is not None:
+            # Giải phóng thiết bị trước khi mở với cấu hình mới, tránh lỗi thiết bị đang bận
+            self.hub.release()
+            self.hub = None
+        self.hub = FrameHub(create_camera(camera_class))
+        self.camera_class = camera_class
+        return self.hub
+
+    def processor(self, **kwargs):
+        """EmotionRecognitionProcessor dùng chung theo cấu hình; mọi bộ xử lý dùng chung mô hình cảm xúc và landmark"""
+        key = tuple(sorted(kwargs.items()))
+        processor = self.processors.get(key)
+        if processor is None:
+            from src.processor import EmotionRecognitionProcessor
+            shared = next(iter(self.processors.values()), None)
+            if shared is not None:
+                kwargs = dict(kwargs, model=shared.model, predictor=shared.predictor)
+            processor = EmotionRecognitionProcessor(**kwargs)
+            self.processors[key] = processor
+        return processor
+
+    def release(self):
+        """Dừng màn hình hiện tại và giải phóng camera, hàng đợi suy luận"""
+        self._stop_screen()
+        for processor in self.processors.values():
+            if processor.inference_queue is not None:
+                processor.inference_queue.close()
+        self.processors = {}
+        if self.hub is not None:
+            self.hub.release()
+            self.hub = None
+            self.camera_class = None
+
+    def quit(self):
+        self.release()
+        self.root.quit()
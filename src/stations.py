@@ -0,0 +1,190 @@
+# stations.py
+import sys
+import time
+import queue
+import argparse
+import threading
+import multiprocessing
+from collections import namedtuple, deque
+
+# Cấu hình một trạm tập: camera theo số serial (hoặc bản ghi để phát lại) và độ phân giải luồng
+StationConfig = namedtuple(
+    'StationConfig',
+    ['name', 'serial', 'width', 'height', 'fps', 'replay', 'detection_max_width', 'depth_range', 'batch_window'],
+    defaults=(None, 640, 480, 30, None, None, None, 0.03),
+)
+
+
+def _open_station_camera(config):
+    """Mở camera của trạm (thiết bị thật theo serial hoặc bản ghi)"""
+    if config.replay:
+        from src.recording import ReplayCamera
+        return ReplayCamera(config.replay, mode='realtime', loop=True)
+    from src.camera import RealSenseCamera
+    return RealSenseCamera(serial=config.serial, width=config.width, height=config.height, fps=config.fps)
+
+
+def _put_latest(results, item):
+    """Đưa kết quả vào hàng đợi; bỏ kết quả nếu bên nhận không theo kịp"""
+    try:
+        results.put_nowait(item)
+    except queue.Full:
+        pass
+
+
+def run_station(config, results, stop_event):
+    """Vòng phân tích của một trạm: chạy trong tiến trình hoặc luồng riêng"""
+    # Import trong hàm để mỗi tiến trình tự nạp dlib/Keras của riêng nó
+    from src.frame_hub import FrameHub
+    from src.processor import EmotionRecognitionProcessor
+
+    try:
+        hub = FrameHub(_open_station_camera(config))
+        # Ảnh mặt của mọi khuôn mặt qua một cửa sổ batch_window giây được suy luận chung một lô
+        processor = EmotionRecognitionProcessor(
+            detection_max_width=config.detection_max_width, depth_range=config.depth_range,
+            batch_window=config.batch_window, **hub.depth_settings())
+    except Exception as e:
+        _put_latest(results, {'station': config.name, 'serial': config.serial, 'error': str(e)})
+        return
+
+    # Cần bản sao: camera ghi xoay vòng vào BUFFER_COUNT bộ đệm, phân tích chậm hơn vài khung
+    # sẽ đọc đúng bộ đệm đang bị ghi lại
+    source = hub.subscribe("analysis", copy=True)
+    pending = deque()
+    processed = 0
+    start_time = time.time()
+    try:
+        while not stop_event.is_set():
+            frame = source.get_frame(timeout=0.05 if pending else 0.5)
+            if frame is not None:
+                analysis = processor.analyze(frame.color, frame.depth, frame.frame_id)
+                faces = [(f.left(), f.top(), f.right(), f.bottom()) for f in analysis.faces]
+                pending.append((frame.frame_id, frame.timestamp, faces, processor.submit_emotions(analysis)))
+
+            # Trả kết quả theo đúng thứ tự khung khi lô chứa khung đó đã chạy xong
+            while pending and all(f is None or f.done() for f in pending[0][3]):
+                frame_id, timestamp, faces, futures = pending.popleft()
+                probabilities = [None if f is None else f.result() for f in futures]
+                emotions = [None if p is None else int(p.argmax()) for p in probabilities]
+                emotion = emotions[0] if emotions else None
+                processed += 1
+                _put_latest(results, {
+                    'station': config.name,
+                    'serial': config.serial,
+                    'frame_id': frame_id,
+                    'timestamp': timestamp,
+                    'faces': faces,
+                    'emotions': emotions,
+                    'probabilities': [None if p is None else p.tolist() for p in probabilities],
+                    'emotion': emotion,
+                    'emotion_text': None if emotion is None else processor.get_emotion_text(emotion),
+                    'fps': processed / max(time.time() - start_time, 1e-6),
+                    'dropped': source.dropped,
+                })
+    finally:
+        if processor.inference_queue is not None:
+            processor.inference_queue.close()
+        hub.release()
+
+
+class StationSupervisor:
+    """Chạy một bộ phân tích cho mỗi camera và gom kết quả về một nơi"""
+
+    def __init__(self, configs, use_processes=True, queue_size=256):
+        self.configs = list(configs)
+        self.use_processes = use_processes
+        if use_processes:
+            # spawn để mỗi trạm có trình thông dịch sạch, tránh chia sẻ trạng thái của dlib/TensorFlow
+            context = multiprocessing.get_context('spawn')
+            self.results = context.Queue(maxsize=queue_size)
+            self.stop_event = context.Event()
+            self.workers = [context.Process(target=run_station, args=(config, self.results, self.stop_event),
+                                            name=f"station-{config.name}", daemon=True)
+                            for config in self.configs]
+        else:
+            self.results = queue.Queue(maxsize=queue_size)
+            self.stop_event = threading.Event()
+            self.workers = [threading.Thread(target=run_station, args=(config, self.results, self.stop_event),
+                                             name=f"station-{config.name}", daemon=True)
+                            for config in self.configs]
+        self.latest = {}
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+
+    def poll(self, max_items=100):
+        """Lấy các kết quả mới (không chờ) và cập nhật kết quả mới nhất của từng trạm"""
+        items = []
+        for _ in range(max_items):
+            try:
+                item = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.latest[item['station']] = item
+            items.append(item)
+        return items
+
+    def stop(self, timeout=5):
+        self.stop_event.set()
+        for worker in self.workers:
+            worker.join(timeout)
+
+
+def default_configs(width=640, height=480, fps=30):
+    """Một trạm cho mỗi camera RealSense đang kết nối"""
+    from src.camera import list_devices
+    return [StationConfig(name=f"station{i + 1}", serial=device['serial'], width=width, height=height, fps=fps)
+            for i, device in enumerate(list_devices())]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Giám sát nhiều trạm tập, mỗi camera một bộ phân tích")
+    parser.add_argument('--list', action='store_true', help="Chỉ liệt kê các camera đang kết nối")
+    parser.add_argument('--serial', nargs='*', help="Chỉ dùng các camera có số serial này")
+    parser.add_argument('--replay', nargs='*', help="Dùng các bản ghi thay cho camera thật")
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--threads', action='store_true', help="Dùng luồng thay vì tiến trình")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        from src.camera import list_devices
+        for device in list_devices():
+            print(f"{device['serial']}  {device['name']}")
+        return 0
+
+    if args.replay:
+        configs = [StationConfig(name=f"replay{i + 1}", replay=path) for i, path in enumerate(args.replay)]
+    else:
+        configs = default_configs(args.width, args.height, args.fps)
+        if args.serial:
+            configs = [c for c in configs if c.serial in args.serial]
+    if not configs:
+        print("Không tìm thấy camera nào")
+        return 1
+
+    supervisor = StationSupervisor(configs, use_processes=not args.threads)
+    supervisor.start()
+    try:
+        while True:
+            time.sleep(1)
+            supervisor.poll(max_items=1000)
+            for name in sorted(supervisor.latest):
+                result = supervisor.latest[name]
+                if 'error' in result:
+                    print(f"[{name}] Lỗi: {result['error']}")
+                else:
+                    print(f"[{name}] {result['fps']:.1f} FPS, {len(result['faces'])} khuôn mặt, "
+                          f"cảm xúc: {result['emotion_text'] or '-'}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        supervisor.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,218 @@
+# vision_worker.py
+import time
+import queue
+import multiprocessing
+from collections import namedtuple
+from multiprocessing import shared_memory
+import numpy as np
+import dlib
+
+# Kết quả gọn của một khung hình do tiến trình phân tích trả về
+VisionResult = namedtuple(
+    'VisionResult',
+    ['frame_id', 'faces', 'landmarks', 'probabilities', 'emotion', 'emotion_text', 'user', 'latency',
+     'emotion_state'],
+)
+
+
+class SharedFrameRing:
+    """Các ô nhớ dùng chung chứa ảnh màu và ảnh độ sâu; tiến trình con đọc trực tiếp, không cần pickle khung hình"""
+
+    def __init__(self, color_shape, depth_shape, slots=3, name=None):
+        self.color_shape = tuple(color_shape)
+        self.depth_shape = tuple(depth_shape)
+        self.slots = slots
+        self.color_bytes = int(np.prod(self.color_shape))  # uint8
+        self.depth_bytes = int(np.prod(self.depth_shape)) * 2  # uint16
+        self.slot_bytes = self.color_bytes + self.depth_bytes
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.slot_bytes * slots)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.colors = [np.ndarray(self.color_shape, np.uint8, self.shm.buf, i * self.slot_bytes)
+                       for i in range(slots)]
+        self.depths = [np.ndarray(self.depth_shape, np.uint16, self.shm.buf, i * self.slot_bytes + self.color_bytes)
+                       for i in range(slots)]
+
+    def write(self, slot, color, depth):
+        np.copyto(self.colors[slot], color)
+        np.copyto(self.depths[slot], depth)
+
+    def read(self, slot):
+        return self.colors[slot], self.depths[slot]
+
+    def close(self):
+        # Bỏ các view trước khi đóng, nếu không SharedMemory.close() báo lỗi còn tham chiếu
+        self.colors = []
+        self.depths = []
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def run_vision_worker(ring_args, tasks, results, processor_kwargs, recognition_kwargs, smoother_kwargs=None):
+    """Vòng phân tích trong tiến trình con: phát hiện, landmark, cảm xúc và (tùy chọn) nhận diện người dùng"""
+    # Import trong hàm để dlib/TensorFlow chỉ được nạp trong tiến trình con
+    from src.processor import EmotionRecognitionProcessor
+    from src.emotion_smoothing import EmotionSmoother, smooth_emotion
+
+    ring = SharedFrameRing(*ring_args)
+    try:
+        processor = EmotionRecognitionProcessor(**processor_kwargs)
+        # smoother_kwargs khác None: làm mượt và bỏ qua suy luận giống hệt khi phân tích trong luồng Tk
+        smoother = EmotionSmoother(**smoother_kwargs) if smoother_kwargs is not None else None
+        face_recognition = None
+        if recognition_kwargs is not None:
+            from src.face_recognition import FaceRecognition
+            face_recognition = FaceRecognition(**recognition_kwargs)
+    except Exception as e:
+        # Lỗi khởi động: tiến trình cha giải phóng các ô và chuyển sang phân tích trong tiến trình
+        results.put({'error': str(e), 'fatal': True})
+        ring.close()
+        return
+
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            slot, frame_id = task
+            start = time.time()
+            color, depth = ring.read(slot)
+            try:
+                analysis = processor.analyze(color, depth, frame_id)
+                emotion_state = None
+                if smoother is not None:
+                    emotion_state = smooth_emotion(smoother, processor, color, analysis)
+                    probabilities = [smoother.probabilities] if analysis.faces else []
+                else:
+                    probabilities = processor.predict_emotions(analysis) if analysis.faces else []
+                user = None
+                if face_recognition is not None and analysis.faces:
+                    user = face_recognition.recognize_user(color, analysis)
+            except Exception as e:
+                results.put({'slot': slot, 'frame_id': frame_id, 'error': str(e)})
+                continue
+            emotion = None
+            if probabilities and probabilities[0] is not None:
+                emotion = int(np.argmax(probabilities[0]))
+            results.put({
+                'slot': slot,
+                'frame_id': frame_id,
+                'faces': [(f.left(), f.top(), f.right(), f.bottom()) for f in analysis.faces],
+                'landmarks': analysis.landmarks,
+                'probabilities': probabilities,
+                'emotion': emotion,
+                'emotion_text': None if emotion is None else processor.get_emotion_text(emotion),
+                'user': user,
+                'latency': time.time() - start,
+                'emotion_state': emotion_state,
+            })
+    finally:
+        ring.close()
+
+
+class VisionWorker:
+    """Chạy phân tích khung hình ở tiến trình riêng để luồng Tk chỉ còn việc hiển thị.
+
+    Khung hình được chép vào ô nhớ dùng chung; chỉ số ô và kết quả gọn đi qua hàng đợi.
+    Khi mọi ô đều đang được phân tích, khung mới bị bỏ qua (giữ độ trễ thấp thay vì xếp hàng).
+    Nếu tiến trình con không khởi động được hoặc đã dừng, failed chuyển thành True (lý do ở error)
+    và màn hình cần chuyển sang phân tích trong tiến trình.
+    """
+
+    def __init__(self, processor_kwargs=None, recognition_kwargs=None, slots=2, smoother_kwargs=None):
+        self.processor_kwargs = processor_kwargs or {}
+        # recognition_kwargs khác None: tiến trình con nạp thêm FaceRecognition và trả về người dùng
+        self.recognition_kwargs = recognition_kwargs
+        # smoother_kwargs khác None: tiến trình con làm mượt cảm xúc (xem VisionResult.emotion_state)
+        self.smoother_kwargs = smoother_kwargs
+        self.slots = slots
+        self.context = multiprocessing.get_context('spawn')
+        self.tasks = self.context.Queue()
+        self.results = self.context.Queue()
+        self.ring = None
+        self.process = None
+        self.free_slots = list(range(slots))
+        self.latest = None
+        self.error = None
+        self.failed = False
+        self.submitted = 0
+        self.skipped = 0
+
+    def _start(self, color, depth):
+        """Tạo bộ nhớ dùng chung theo kích thước khung đầu tiên rồi khởi động tiến trình con"""
+        self.ring = SharedFrameRing(color.shape, depth.shape, self.slots)
+        ring_args = (self.ring.color_shape, self.ring.depth_shape, self.slots, self.ring.name)
+        self.process = self.context.Process(
+            target=run_vision_worker,
+            args=(ring_args, self.tasks, self.results, self.processor_kwargs, self.recognition_kwargs,
+                  self.smoother_kwargs),
+            name="vision-worker", daemon=True)
+        self.process.start()
+
+    def submit(self, frame_id, color, depth):
+        """Gửi khung hình cho tiến trình con; trả về False nếu khung bị bỏ qua vì mọi ô đang bận"""
+        if self.failed:
+            return False
+        if self.ring is None:
+            self._start(color, depth)
+        if not self.free_slots:
+            self.skipped += 1
+            return False
+        slot = self.free_slots.pop()
+        self.ring.write(slot, color, depth)
+        self.tasks.put((slot, frame_id))
+        self.submitted += 1
+        return True
+
+    def poll(self):
+        """Nhận các kết quả đã xong (không chờ); trả về kết quả mới nhất hoặc None nếu chưa có gì mới"""
+        newest = None
+        while True:
+            try:
+                item = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if 'slot' in item:
+                self.free_slots.append(item['slot'])
+            if 'error' in item:
+                self.error = item['error']
+                print(f"Lỗi tiến trình phân tích: {self.error}")
+                if item.get('fatal'):
+                    self._fail(self.error)
+                continue
+            newest = VisionResult(
+                frame_id=item['frame_id'],
+                faces=[dlib.rectangle(*face) for face in item['faces']],
+                landmarks=item['landmarks'],
+                probabilities=item['probabilities'],
+                emotion=item['emotion'],
+                emotion_text=item['emotion_text'],
+                user=item['user'],
+                latency=item['latency'],
+                emotion_state=item['emotion_state'],
+            )
+        if not self.failed and self.process is not None and not self.process.is_alive():
+            self._fail(f"Tiến trình phân tích đã dừng (mã thoát {self.process.exitcode})")
+        if newest is not None:
+            self.latest = newest
+        return newest
+
+    def _fail(self, error):
+        """Đánh dấu tiến trình con hỏng: các ô đang chờ sẽ không bao giờ có kết quả nên được giải phóng"""
+        self.failed = True
+        self.error = error
+        self.free_slots = list(range(self.slots))
+
+    def close(self, timeout=2):
+        if self.process is not None:
+            self.tasks.put(None)
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
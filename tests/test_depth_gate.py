@@ -0,0 +1,31 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+pytest.importorskip('dlib')
+
+from src.face_detection import DepthGate
+
+
+def person_depth(shape, box, value):
+    depth = np.zeros(shape, dtype=np.uint16)
+    x0, y0, x1, y1 = box
+    depth[y0:y1, x0:x1] = value
+    return depth
+
+
+def test_region_maps_aligned_depth_to_color():
+    # Ảnh độ sâu đã căn chỉnh, nhỏ hơn ảnh màu một nửa
+    depth = person_depth((360, 640), (200, 80, 400, 360), 1000)
+    gate = DepthGate(0.3, 2.0, margin=0.0)
+    x0, y0, x1, y1, distance = gate.find_region(depth, (720, 1280, 3))
+    assert (x0, y0, x1, y1) == (400, 160, 800, 720)
+    assert distance == pytest.approx(1.0)
+
+
+def test_uses_camera_depth_scale():
+    # Cùng giá trị thô 4000: 1 m với đơn vị 0.25 mm, 4 m (ngoài dải) với đơn vị mặc định 1 mm
+    depth = person_depth((120, 160), (40, 20, 120, 120), 4000)
+    assert DepthGate(0.3, 2.0).find_region(depth, (120, 160)) is None
+    region = DepthGate(0.3, 2.0, depth_scale=0.00025).find_region(depth, (120, 160))
+    assert region is not None and region[4] == pytest.approx(1.0)
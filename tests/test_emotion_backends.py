@@ -0,0 +1,91 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from src.emotion_backends import _conv2d, _max_pool
+
+
+def naive_conv2d(x, kernel, bias, strides, padding):
+    kh, kw, _, filters = kernel.shape
+    if padding == 'same':
+        x = np.pad(x, ((0, 0), ((kh - 1) // 2, kh // 2), ((kw - 1) // 2, kw // 2), (0, 0)))
+    n, h, w, _ = x.shape
+    out_h = (h - kh) // strides[0] + 1
+    out_w = (w - kw) // strides[1] + 1
+    out = np.zeros((n, out_h, out_w, filters), dtype=np.float64)
+    for b in range(n):
+        for i in range(out_h):
+            for j in range(out_w):
+                patch = x[b, i * strides[0]:i * strides[0] + kh, j * strides[1]:j * strides[1] + kw]
+                for f in range(filters):
+                    out[b, i, j, f] = (patch * kernel[..., f]).sum() + bias[f]
+    return out
+
+
+def naive_max_pool(x, pool_size, strides):
+    ph, pw = pool_size
+    n, h, w, c = x.shape
+    out_h = (h - ph) // strides[0] + 1
+    out_w = (w - pw) // strides[1] + 1
+    out = np.empty((n, out_h, out_w, c), dtype=x.dtype)
+    for i in range(out_h):
+        for j in range(out_w):
+            out[:, i, j] = x[:, i * strides[0]:i * strides[0] + ph, j * strides[1]:j * strides[1] + pw].max(axis=(1, 2))
+    return out
+
+
+@pytest.mark.parametrize('kernel_size, strides, padding', [
+    ((3, 3), (1, 1), 'valid'),
+    ((3, 3), (1, 1), 'same'),
+    ((2, 2), (1, 1), 'same'),
+    ((3, 3), (2, 2), 'valid'),
+])
+def test_conv2d_matches_naive_loop(kernel_size, strides, padding):
+    rng = np.random.default_rng(0)
+    x = rng.standard_normal((2, 9, 8, 3)).astype(np.float32)
+    kernel = rng.standard_normal(kernel_size + (3, 4)).astype(np.float32)
+    bias = rng.standard_normal(4).astype(np.float32)
+    expected = naive_conv2d(x, kernel, bias, strides, padding)
+    np.testing.assert_allclose(_conv2d(x, kernel, bias, strides, padding), expected, atol=1e-4)
+
+
+@pytest.mark.parametrize('pool_size, strides', [((2, 2), (2, 2)), ((3, 3), (2, 2)), ((2, 2), (1, 1))])
+def test_max_pool_matches_naive_loop(pool_size, strides):
+    x = np.random.default_rng(1).standard_normal((2, 11, 10, 3)).astype(np.float32)
+    np.testing.assert_array_equal(_max_pool(x, pool_size, strides), naive_max_pool(x, pool_size, strides))
+
+
+@pytest.fixture(scope='module')
+def keras_model():
+    tf = pytest.importorskip('tensorflow')
+    pytest.importorskip('pandas')
+    from src.train_model import build_model
+    tf.keras.utils.set_random_seed(0)
+    model = build_model()
+    rng = np.random.default_rng(0)
+    model.set_weights([rng.normal(scale=0.1, size=w.shape).astype(np.float32) for w in model.get_weights()])
+    return model
+
+
+@pytest.fixture(scope='module')
+def crops():
+    return np.random.default_rng(2).random((16, 48, 48, 1)).astype(np.float32)
+
+
+def test_numpy_backend_matches_keras(keras_model, crops, tmp_path):
+    from src.emotion_backends import NumpyEmotionModel
+    from src.export_model import PARITY_TOLERANCE, export_numpy
+    model = NumpyEmotionModel(export_numpy(keras_model, str(tmp_path / 'weights.npz')))
+    expected = np.asarray(keras_model.predict_on_batch(crops))
+    np.testing.assert_allclose(model.predict_on_batch(crops), expected, atol=PARITY_TOLERANCE['numpy'])
+
+
+def test_tflite_backend_matches_keras(keras_model, crops, tmp_path):
+    from src.emotion_backends import TFLiteEmotionModel
+    from src.export_model import PARITY_TOLERANCE, export_tflite
+    model = TFLiteEmotionModel(export_tflite(keras_model, str(tmp_path / 'model.tflite')))
+    expected = np.asarray(keras_model.predict_on_batch(crops))
+    # Đổi kích thước lô giữa hai lần gọi
+    for batch in (crops, crops[:3]):
+        np.testing.assert_allclose(model.predict_on_batch(batch), expected[:len(batch)],
+                                   atol=PARITY_TOLERANCE['tflite'])
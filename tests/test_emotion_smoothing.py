@@ -0,0 +1,102 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from src.emotion_smoothing import ABNORMAL_TEXT, NORMAL_TEXT, EmotionSmoother, smooth_emotion
+
+HAPPY = np.eye(7)[3]
+ANGRY = np.eye(7)[0]
+
+
+class FakeAnalysis:
+    """Kết quả phân tích giả: một khuôn mặt với landmark đã chuẩn hóa cho trước"""
+
+    def __init__(self, features):
+        self._features = [] if features is None else [features]
+
+    def __len__(self):
+        return len(self._features)
+
+    def features(self):
+        return self._features
+
+
+class FakeProcessor:
+    def __init__(self, probabilities):
+        self.probabilities = probabilities
+        self.calls = 0
+
+    def predict_emotion_probabilities(self, image, analysis):
+        self.calls += 1
+        return self.probabilities
+
+
+@pytest.fixture
+def features():
+    return np.random.default_rng(0).random(136)
+
+
+def test_ema_blends_with_alpha():
+    smoother = EmotionSmoother(alpha=0.25)
+    smoother.update(HAPPY, now=0.0)
+    np.testing.assert_allclose(smoother.probabilities, HAPPY)
+    smoother.update(ANGRY, now=0.1)
+    np.testing.assert_allclose(smoother.probabilities, 0.25 * ANGRY + 0.75 * HAPPY)
+    assert smoother.emotion() == 3
+
+
+def test_skips_inference_until_motion_or_max_age(features):
+    smoother = EmotionSmoother(motion_threshold=0.02, max_age=1.0)
+    assert smoother.needs_inference(features, now=0.0)
+    smoother.update(HAPPY, features, now=0.0)
+
+    assert not smoother.needs_inference(features + 0.001, now=0.5)
+    assert smoother.needs_inference(features + 0.1, now=0.5)
+    assert smoother.needs_inference(features, now=1.0)
+    assert smoother.skipped == 1
+
+
+def test_abnormal_state_needs_hold_and_hysteresis():
+    smoother = EmotionSmoother(alpha=1.0, enter_threshold=0.6, exit_threshold=0.4, hold=3.0)
+    smoother.update(ANGRY, now=0.0)
+    assert smoother.state(now=0.0) == NORMAL_TEXT
+    assert smoother.state(now=2.9) == NORMAL_TEXT
+    assert smoother.state(now=3.0) == ABNORMAL_TEXT
+
+    # Giữa hai ngưỡng thì giữ nguyên trạng thái bất thường
+    smoother.update(0.5 * ANGRY + 0.5 * HAPPY, now=3.1)
+    assert smoother.state(now=3.1) == ABNORMAL_TEXT
+    smoother.update(HAPPY, now=3.2)
+    assert smoother.state(now=3.2) == NORMAL_TEXT
+
+
+def test_hold_restarts_when_probability_dips():
+    smoother = EmotionSmoother(alpha=1.0, hold=3.0)
+    smoother.update(ANGRY, now=0.0)
+    smoother.state(now=0.0)
+    smoother.update(HAPPY, now=2.0)
+    smoother.state(now=2.0)
+    smoother.update(ANGRY, now=2.5)
+    assert smoother.state(now=2.5) == NORMAL_TEXT
+    assert smoother.state(now=5.0) == NORMAL_TEXT
+    assert smoother.state(now=5.5) == ABNORMAL_TEXT
+
+
+def test_smooth_emotion_reuses_result_and_resets_without_face(features):
+    smoother = EmotionSmoother(max_age=1.0)
+    processor = FakeProcessor(HAPPY)
+    for i in range(5):
+        assert smooth_emotion(smoother, processor, None, FakeAnalysis(features), now=i * 0.1) == NORMAL_TEXT
+    assert processor.calls == 1
+    assert smoother.skipped == 4
+
+    assert smooth_emotion(smoother, processor, None, FakeAnalysis(None), now=0.5) is None
+    assert smoother.probabilities is None
+    smooth_emotion(smoother, processor, None, FakeAnalysis(features), now=0.6)
+    assert processor.calls == 2
+
+
+def test_smooth_emotion_without_probabilities(features):
+    smoother = EmotionSmoother()
+    assert smooth_emotion(smoother, FakeProcessor(None), None, FakeAnalysis(features), now=0.0) is None
+    assert smoother.inferences == 0
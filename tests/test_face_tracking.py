@@ -0,0 +1,74 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+dlib = pytest.importorskip('dlib')
+
+from src.face_tracking import FaceTracker
+
+
+class FakeDetector:
+    """Bộ phát hiện giả trả về các khung đặt sẵn và đếm số lần được gọi"""
+
+    def __init__(self, rects):
+        self.rects = rects
+        self.calls = 0
+
+    def detect(self, gray, depth=None):
+        self.calls += 1
+        return list(self.rects)
+
+
+@pytest.fixture
+def gray():
+    return np.random.default_rng(0).integers(0, 256, (240, 320), dtype=np.uint8)
+
+
+def test_redetects_every_detect_every_frames(gray):
+    detector = FakeDetector([dlib.rectangle(50, 50, 120, 120)])
+    # Bỏ qua ngưỡng độ tin cậy để chỉ kiểm tra nhịp phát hiện
+    tracker = FaceTracker(detector, detect_every=3, min_confidence=float('-inf'))
+    for _ in range(9):
+        assert len(tracker.update(gray)) == 1
+    # Khung 0, 4 và 8 chạy bộ phát hiện, các khung khác chỉ bám
+    assert detector.calls == 3
+
+
+def test_low_confidence_forces_redetection(gray):
+    detector = FakeDetector([dlib.rectangle(50, 50, 120, 120)])
+    tracker = FaceTracker(detector, detect_every=100, min_confidence=float('inf'))
+    for _ in range(4):
+        tracker.update(gray)
+    assert detector.calls == 4
+
+
+def test_matching_detection_keeps_track_id(gray):
+    detector = FakeDetector([dlib.rectangle(50, 50, 120, 120)])
+    tracker = FaceTracker(detector, detect_every=1, min_confidence=float('-inf'))
+    tracker.update(gray)
+    assert tracker.track_ids == [1]
+
+    detector.rects = [dlib.rectangle(55, 52, 125, 122), dlib.rectangle(200, 100, 260, 160)]
+    tracker.update(gray)
+    tracker.update(gray)
+    assert tracker.track_ids == [1, 2]
+
+
+def test_track_is_dropped_when_detector_loses_it(gray):
+    detector = FakeDetector([dlib.rectangle(50, 50, 120, 120), dlib.rectangle(200, 100, 260, 160)])
+    tracker = FaceTracker(detector, detect_every=1, min_confidence=float('-inf'))
+    tracker.update(gray)
+    assert tracker.track_ids == [1, 2]
+
+    detector.rects = [dlib.rectangle(200, 100, 260, 160)]
+    tracker.update(gray)
+    faces = tracker.update(gray)
+    assert tracker.track_ids == [2]
+    assert len(faces) == 1
+
+    detector.rects = []
+    tracker.update(gray)
+    assert len(tracker.update(gray)) == 0
+    # Khuôn mặt quay lại được cấp mã mới
+    detector.rects = [dlib.rectangle(50, 50, 120, 120)]
+    tracker.update(gray)
+    assert tracker.track_ids == [3]
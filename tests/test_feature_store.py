@@ -0,0 +1,49 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from src.feature_store import FeatureStore
+
+
+def test_replace_keeps_other_users(tmp_path):
+    store = FeatureStore(str(tmp_path), dim=4)
+    store.append('a', np.ones((3, 4)))
+    store.append('b', np.full((2, 4), 2.0))
+    store.replace('a', np.zeros((1, 4)))
+    reopened = FeatureStore(str(tmp_path), dim=4)
+    assert sorted(reopened.users()) == ['a', 'b']
+    assert reopened.features('a').tolist() == [[0.0] * 4]
+    assert len(reopened.features('b')) == 2
+
+
+def test_import_knn_restores_legacy_users(tmp_path):
+    joblib = pytest.importorskip('joblib')
+    neighbors = pytest.importorskip('sklearn.neighbors')
+    X = np.random.default_rng(0).random((6, 4)).astype(np.float32)
+    y = ['a', 'b', 'a', 'c', 'b', 'a']
+    path = tmp_path / 'knn_model.pkl'
+    joblib.dump(neighbors.KNeighborsClassifier(n_neighbors=3).fit(X, y), path)
+
+    store = FeatureStore(str(tmp_path), dim=4)
+    assert sorted(store.import_knn(str(path))) == ['a', 'b', 'c']
+    assert len(store) == 6
+    np.testing.assert_array_equal(store.features('a'), X[[0, 2, 5]])
+    np.testing.assert_array_equal(store.features('c'), X[[3]])
+
+
+def test_open_does_not_touch_uncommitted_rows(tmp_path):
+    store = FeatureStore(str(tmp_path), dim=4)
+    store.append('a', np.ones((2, 4)))
+    # Một bên ghi khác đã nối thêm dòng nhưng chưa ghi chỉ mục
+    with open(store.data_path, 'ab') as f:
+        f.write(np.full((3, 4), 9.0, dtype=np.float32).tobytes())
+    size = (tmp_path / FeatureStore.DATA_FILE).stat().st_size
+
+    reader = FeatureStore(str(tmp_path), dim=4)
+    assert len(reader) == 2
+    assert reader.load()[0].shape == (2, 4)
+    assert (tmp_path / FeatureStore.DATA_FILE).stat().st_size == size
+
+    # Lần ghi tiếp theo mới cắt phần chưa ghi nhận
+    reader.append('b', np.zeros((1, 4)))
+    np.testing.assert_array_equal(FeatureStore(str(tmp_path), dim=4).features('b'), np.zeros((1, 4)))
@@ -0,0 +1,58 @@
+import time
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from src.frame_hub import FrameHub
+
+
+class RotatingCamera:
+    """Camera giả ghi xoay vòng vào bộ đệm của nó như RealSenseCamera, ghi từng nửa ảnh"""
+
+    def __init__(self, buffers=2, shape=(1080, 1920, 3)):
+        self.buffers = [np.zeros(shape, dtype=np.uint8) for _ in range(buffers)]
+        self.index = 0
+        self.count = 0
+
+    def get_frames(self):
+        self.count += 1
+        color = self.buffers[self.index]
+        self.index = (self.index + 1) % len(self.buffers)
+        half = len(color) // 2
+        color[:half] = self.count % 256
+        time.sleep(0.0005)
+        color[half:] = self.count % 256
+        return True, color, np.full(color.shape[:2], self.count, dtype=np.uint16)
+
+    def release(self):
+        pass
+
+
+def test_copied_frames_are_never_torn():
+    hub = FrameHub(RotatingCamera(), buffer_size=1)
+    source = hub.subscribe("test", copy=True)
+    try:
+        received = 0
+        deadline = time.time() + 2
+        while received < 50 and time.time() < deadline:
+            frame = source.get_frame(timeout=0.5)
+            if frame is None:
+                continue
+            received += 1
+            assert frame.color.min() == frame.color.max()
+        assert received > 0
+    finally:
+        hub.release()
+
+
+def test_subscribers_skip_to_latest_frame():
+    hub = FrameHub(RotatingCamera(buffers=5), buffer_size=3)
+    source = hub.subscribe("test")
+    try:
+        first = source.get_frame(timeout=1)
+        time.sleep(0.05)
+        second = source.get_frame(timeout=1)
+        assert second.frame_id > first.frame_id
+        assert source.dropped == second.frame_id - first.frame_id - 1
+    finally:
+        hub.release()
@@ -0,0 +1,75 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from src.identity_index import IdentityIndex
+
+
+def cluster(rng, center, count, spread=0.01):
+    return center + rng.normal(scale=spread, size=(count, len(center))).astype(np.float32)
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+
+def test_identifies_known_and_rejects_strangers(rng):
+    a, b = rng.random(136).astype(np.float32), rng.random(136).astype(np.float32)
+    index = IdentityIndex.from_features(np.concatenate([cluster(rng, a, 30), cluster(rng, b, 30)]),
+                                        ['a'] * 30 + ['b'] * 30)
+    assert index.identify(cluster(rng, a, 1)[0]) == 'a'
+    assert index.identify(cluster(rng, b, 1)[0]) == 'b'
+    assert index.identify(a + 100) is None
+
+
+@pytest.mark.parametrize('samples', [
+    lambda rng, c: c[None],                # một mẫu
+    lambda rng, c: np.repeat(c[None], 5, 0),  # chỉ có mẫu trùng lặp
+])
+def test_uncalibrated_user_does_not_fail_open(rng, samples):
+    solo = rng.random(136).astype(np.float32)
+    index = IdentityIndex()
+    index.add_user('solo', samples(rng, solo))
+    assert np.isnan(index.thresholds[0])
+    assert index.effective_thresholds()[0] == IdentityIndex.DEFAULT_THRESHOLD
+    assert index.identify(solo) == 'solo'
+    assert index.identify(solo + 100 * rng.random(136).astype(np.float32)) is None
+
+
+def test_uncalibrated_user_borrows_median_threshold(rng):
+    index = IdentityIndex()
+    for label in 'abc':
+        index.add_user(label, cluster(rng, rng.random(136).astype(np.float32), 20))
+    index.add_user('solo', rng.random((1, 136)).astype(np.float32))
+    thresholds = index.effective_thresholds()
+    assert thresholds[3] == pytest.approx(np.median(thresholds[:3]))
+
+
+def test_remove_user_moves_last_into_slot(rng):
+    index = IdentityIndex()
+    centers = {label: rng.random(136).astype(np.float32) for label in 'abc'}
+    for label, center in centers.items():
+        index.add_user(label, cluster(rng, center, 10))
+    index.remove_user('a')
+    assert 'a' not in index and len(index) == 2
+    assert index.identify(centers['c']) == 'c'
+    assert index.identify(centers['a']) is None
+
+
+def test_self_distance_is_dropped_by_index_not_by_value(rng):
+    # Ở độ lớn này khoảng cách float32 của một mẫu tới chính nó khác 0 rõ rệt
+    features = (rng.random(136) * 50 + rng.normal(scale=0.05, size=(10, 136))).astype(np.float32)
+    index = IdentityIndex(quantile=0.0, margin=1.0)
+    index.add_user('a', features)
+    others = np.linalg.norm(features[:, None].astype(np.float64) - features[None], axis=2)
+    np.fill_diagonal(others, np.inf)
+    assert index.thresholds[0] == pytest.approx(others.min(axis=1).min(), rel=0.05)
+
+
+def test_exact_duplicates_count_towards_calibration():
+    a = np.zeros(136, dtype=np.float32)
+    b = np.full(136, 0.1, dtype=np.float32)
+    index = IdentityIndex(quantile=1.0, margin=1.0)
+    index.add_user('a', np.stack([a, a, b]))
+    assert index.thresholds[0] == pytest.approx(np.linalg.norm(b - a), rel=1e-4)
@@ -0,0 +1,83 @@
+import json
+import os
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from src.identity_index import IdentityIndex
+from src.recognition_bundle import (MANIFEST_FILE, BundleError, bundle_exists, load_bundle, read_manifest,
+                                    save_bundle)
+
+
+@pytest.fixture
+def training():
+    rng = np.random.default_rng(0)
+    X, y = [], []
+    for label in ('an', 'binh', 'chi'):
+        center = rng.random(136)
+        X.append(center + rng.normal(scale=0.01, size=(12, 136)))
+        y += [label] * 12
+    X = np.concatenate(X).astype(np.float32)
+    return X, y, IdentityIndex.from_features(X, y)
+
+
+def test_round_trip_is_memory_mapped(tmp_path, training):
+    X, y, index = training
+    assert not bundle_exists(str(tmp_path))
+    save_bundle(index, X, y, str(tmp_path))
+    loaded = load_bundle(str(tmp_path))
+
+    assert loaded.labels == index.labels
+    assert isinstance(loaded.centroids, np.memmap)
+    np.testing.assert_array_equal(loaded.thresholds, index.thresholds[:len(index)])
+    labels, _ = loaded.query(X)
+    assert labels == y
+
+    # Sửa chỉ mục đã nạp thì chép ra bộ nhớ, không ghi vào file
+    loaded.remove_user('an')
+    assert 'an' in load_bundle(str(tmp_path))
+
+
+def test_resave_replaces_previous_generation(tmp_path, training):
+    X, y, index = training
+    first = save_bundle(index, X, y, str(tmp_path))
+    second = save_bundle(index, X, y, str(tmp_path))
+    assert first['generation'] != second['generation']
+    assert sorted(os.listdir(tmp_path)) == sorted([MANIFEST_FILE] + list(second['files'].values()))
+
+
+def test_concurrent_writers_keep_each_others_arrays(tmp_path, training):
+    X, y, index = training
+    save_bundle(index, X, y, str(tmp_path))
+    # Một bên ghi khác đã ghi mảng nhưng chưa thay manifest
+    pending = tmp_path / 'features.other.npy'
+    np.save(pending, X)
+    save_bundle(index, X, y, str(tmp_path))
+    assert pending.exists()
+
+
+@pytest.mark.parametrize('field, value', [('schema', 'something-else'), ('version', 999)])
+def test_rejects_other_schema_or_version(tmp_path, training, field, value):
+    X, y, index = training
+    save_bundle(index, X, y, str(tmp_path))
+    path = tmp_path / MANIFEST_FILE
+    manifest = json.loads(path.read_text(encoding='utf-8'))
+    manifest[field] = value
+    path.write_text(json.dumps(manifest), encoding='utf-8')
+    with pytest.raises(BundleError):
+        load_bundle(str(tmp_path))
+
+
+def test_rejects_shape_mismatch(tmp_path, training):
+    X, y, index = training
+    save_bundle(index, X, y, str(tmp_path))
+    manifest = read_manifest(str(tmp_path))
+    manifest['samples'] += 1
+    (tmp_path / MANIFEST_FILE).write_text(json.dumps(manifest), encoding='utf-8')
+    with pytest.raises(BundleError):
+        load_bundle(str(tmp_path))
+
+
+def test_missing_bundle(tmp_path):
+    with pytest.raises(BundleError):
+        load_bundle(str(tmp_path))
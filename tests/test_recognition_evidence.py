@@ -0,0 +1,38 @@
+from src.recognition_evidence import ACCEPT, REJECT, RecognitionEvidence
+
+
+def feed(evidence, labels):
+    for label in labels:
+        evidence.add(label)
+    return evidence.decision()
+
+
+def test_empty_window_is_undecided():
+    assert RecognitionEvidence().decision() == (None, None)
+
+
+def test_accepts_after_enough_consistent_votes():
+    evidence = RecognitionEvidence(accept_votes=5, accept_ratio=0.8)
+    assert feed(evidence, ['an'] * 4) == (None, None)
+    assert feed(evidence, ['an']) == (ACCEPT, 'an')
+
+
+def test_mixed_labels_stay_undecided():
+    evidence = RecognitionEvidence(accept_votes=5, accept_ratio=0.8)
+    # 6/12 khung là 'an': đủ phiếu nhưng chưa đủ tỷ lệ
+    assert feed(evidence, ['an', 'binh', None] * 3 + ['an'] * 3) == (None, None)
+
+
+def test_rejects_persistent_stranger():
+    evidence = RecognitionEvidence(reject_votes=12, reject_ratio=0.8)
+    assert feed(evidence, [None] * 11) == (None, None)
+    assert feed(evidence, [None]) == (REJECT, None)
+
+
+def test_old_frames_leave_the_window():
+    evidence = RecognitionEvidence(window=10, accept_votes=5, accept_ratio=0.8, reject_votes=8, reject_ratio=0.8)
+    assert feed(evidence, [None] * 7 + ['an'] * 3) == (None, None)
+    # Các khung người lạ cũ bị đẩy ra, còn lại 8/10 khung là 'an'
+    assert feed(evidence, ['an'] * 5) == (ACCEPT, 'an')
+    evidence.reset()
+    assert evidence.decision() == (None, None)
@@ -0,0 +1,58 @@
+import json
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+
+from src.recording import MANIFEST_NAME, FrameRecorder, ReplayCamera
+
+
+def make_frames(count, shape=(24, 32)):
+    rng = np.random.default_rng(0)
+    colors = [rng.integers(0, 256, shape + (3,), dtype=np.uint8) for _ in range(count)]
+    depths = [rng.integers(0, 65536, shape, dtype=np.uint16) for _ in range(count)]
+    return colors, depths
+
+
+def record(path, colors, depths, **kwargs):
+    recorder = FrameRecorder(str(path), chunk_size=4, queue_size=len(colors) + 1, **kwargs)
+    for i, (color, depth) in enumerate(zip(colors, depths)):
+        assert recorder.write(color, depth, timestamp=100.0 + i / 30)
+    recorder.close()
+
+
+def test_png_round_trip_is_lossless(tmp_path):
+    colors, depths = make_frames(10)
+    record(tmp_path, colors, depths, depth_scale=0.00025, focal_px=610.0)
+    manifest = json.loads((tmp_path / MANIFEST_NAME).read_text())
+    assert manifest['frames'] == 10
+    assert [chunk['frames'] for chunk in manifest['chunks']] == [4, 4, 2]
+
+    camera = ReplayCamera(str(tmp_path), mode='fast')
+    assert (camera.depth_scale, camera.focal_px) == (0.00025, 610.0)
+    for color, depth in zip(colors, depths):
+        ret, replay_color, replay_depth = camera.get_frames()
+        assert ret
+        np.testing.assert_array_equal(replay_color, color)
+        np.testing.assert_array_equal(replay_depth, depth)
+    assert camera.get_frames()[0] is False
+    assert camera.finished
+
+
+def test_loop_restarts_from_first_frame(tmp_path):
+    colors, depths = make_frames(5)
+    record(tmp_path, colors, depths)
+    camera = ReplayCamera(str(tmp_path), mode='fast', loop=True)
+    frames = [camera.get_frames()[1] for _ in range(7)]
+    np.testing.assert_array_equal(frames[5], colors[0])
+    np.testing.assert_array_equal(frames[6], colors[1])
+
+
+def test_rejects_unknown_version(tmp_path):
+    colors, depths = make_frames(1)
+    record(tmp_path, colors, depths)
+    manifest = json.loads((tmp_path / MANIFEST_NAME).read_text())
+    manifest['version'] = 999
+    (tmp_path / MANIFEST_NAME).write_text(json.dumps(manifest))
+    with pytest.raises(ValueError):
+        ReplayCamera(str(tmp_path))
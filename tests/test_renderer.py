@@ -0,0 +1,79 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+pytest.importorskip('PIL')
+
+from src import renderer
+from src.renderer import FrameRenderer
+
+
+class RecordingPhoto:
+    """Thay cho ImageTk.PhotoImage: ghi lại nội dung mỗi lần paste"""
+
+    def __init__(self, mode, size):
+        self.mode = mode
+        self.size = size
+        self.pasted = []
+
+    def paste(self, image):
+        self.pasted.append(np.array(image))
+
+
+class FakeLabel:
+    def winfo_width(self):
+        return 1
+
+    def winfo_height(self):
+        return 1
+
+    def configure(self, **kwargs):
+        pass
+
+
+@pytest.fixture
+def recording(monkeypatch):
+    monkeypatch.setattr(renderer.ImageTk, 'PhotoImage', RecordingPhoto)
+
+
+def solid(height, width, bgr):
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = bgr
+    return frame
+
+
+@pytest.mark.parametrize('size', [(64, 48), (80, 48)])  # vừa khít và có viền đen
+def test_each_frame_reaches_photo(recording, size):
+    r = FrameRenderer(FakeLabel(), fps=None, size=size)
+    width, height = size
+    for bgr in [(255, 0, 0), (0, 0, 255)]:
+        r.render(solid(48, 64, bgr), force=True)
+        pasted = r.photo.pasted[-1]
+        assert pasted.shape == (height, width, 4)
+        # Điểm giữa mang màu của khung vừa hiển thị (RGB), không phải ảnh lúc cấp phát bộ đệm
+        assert tuple(pasted[height // 2, width // 2]) == (bgr[2], bgr[1], bgr[0], 255)
+    if width != 64:
+        assert tuple(r.photo.pasted[-1][0, 0]) == (0, 0, 0, 255)
+
+
+def test_depth_frame_reaches_photo(recording):
+    r = FrameRenderer(FakeLabel(), fps=None, size=(64, 48))
+    r.render(solid(48, 64, (0, 0, 0)), force=True)
+    r.render_depth(np.full((48, 64), 4000, dtype=np.uint16), force=True)
+    assert r.photo.pasted[-1][24, 32].tolist() != [0, 0, 0, 255]
+
+
+def test_tk_photo_shows_frame():
+    tk = pytest.importorskip('tkinter')
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        pytest.skip("Không có màn hình cho Tk")
+    try:
+        label = tk.Label(root)
+        r = FrameRenderer(label, fps=None, size=(32, 24))
+        r.render(solid(24, 32, (0, 0, 255)), force=True)
+        photo = label.imgtk._PhotoImage__photo
+        assert tuple(photo.get(16, 12)) == (255, 0, 0)
+    finally:
+        root.destroy()
@@ -0,0 +1,30 @@
+import time
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('dlib')
+
+from src.vision_worker import VisionWorker
+
+
+def wait_until(condition, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_startup_failure_frees_slots_and_reports_error():
+    worker = VisionWorker({'emotion_backend': 'khong-ton-tai'}, slots=2)
+    color = np.zeros((48, 64, 3), dtype=np.uint8)
+    depth = np.zeros((48, 64), dtype=np.uint16)
+    try:
+        assert worker.submit(0, color, depth)
+        assert wait_until(lambda: worker.poll() is None and worker.failed)
+        assert 'khong-ton-tai' in worker.error
+        assert sorted(worker.free_slots) == [0, 1]
+        assert not worker.submit(1, color, depth)
+    finally:
+        worker.close()